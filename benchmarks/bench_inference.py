@@ -0,0 +1,174 @@
+import argparse
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+import psutil
+import torch
+
+from benchmarks.results import save_results, load_results, compare_results, format_comparison
+from benchmarks.tiny_model import build_tiny_model, TINY_OVERRIDES
+
+DEFAULT_OUTPUT = os.path.join('benchmarks', 'results', 'latest.json')
+
+
+class PeakRSS:
+    """Пик RSS процесса за время блока: фоновый опрос каждые interval секунд."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def count_allocations(fn) -> Dict[str, float]:
+    """Число и объём выделений памяти тензоров за вызов fn по профайлеру torch."""
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    with torch.profiler.profile(activities=activities, profile_memory=True) as prof:
+        fn()
+    count, allocated = 0, 0
+    for event in prof.events():
+        size = max(getattr(event, 'cpu_memory_usage', 0), getattr(event, 'device_memory_usage', 0))
+        if event.name == '[memory]' and size > 0:
+            count += 1
+            allocated += size
+    return {'count': count, 'bytes': allocated}
+
+
+def _synchronize():
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+
+@torch.no_grad()
+def bench_case(model, batch_size: int, seq_len: int, decode_steps: int, repeats: int) -> Dict[str, Any]:
+    device = next(model.parameters()).device
+    generator = torch.Generator().manual_seed(batch_size * 10000 + seq_len)
+    input_ids = torch.randint(3, model.config.vocab_size, (batch_size, seq_len), generator=generator).to(device)
+
+    # Прогрев: ленивые аллокации и выбор ядер не должны попадать в замер
+    model(input_ids=input_ids, use_cache=True)
+
+    prefill_times = []
+    with PeakRSS() as rss:
+        for _ in range(repeats):
+            _synchronize()
+            start = time.perf_counter()
+            outputs = model(input_ids=input_ids, use_cache=True)
+            _synchronize()
+            prefill_times.append(time.perf_counter() - start)
+
+        past = outputs.past_key_values
+        next_ids = outputs.logits[:, -1].argmax(-1, keepdim=True)
+        decode_times = []
+        for _ in range(decode_steps):
+            _synchronize()
+            start = time.perf_counter()
+            outputs = model(input_ids=next_ids, past_key_values=past, use_cache=True)
+            _synchronize()
+            decode_times.append(time.perf_counter() - start)
+            past = outputs.past_key_values
+            next_ids = outputs.logits[:, -1].argmax(-1, keepdim=True)
+
+    allocations = count_allocations(lambda: model(input_ids=next_ids, past_key_values=past, use_cache=True))
+    prefill = sorted(prefill_times)[len(prefill_times) // 2]
+    decode = sorted(decode_times)[len(decode_times) // 2]
+    return {
+        'batch_size': batch_size,
+        'seq_len': seq_len,
+        'prefill_tokens_per_second': round(batch_size * seq_len / prefill, 1),
+        'prefill_ms': round(prefill * 1000, 3),
+        'decode_ms_per_token': round(decode * 1000, 3),
+        'peak_rss_mb': round(rss.peak / 1024 ** 2, 1),
+        'decode_allocations': allocations['count'],
+        'decode_allocated_mb': round(allocations['bytes'] / 1024 ** 2, 3),
+    }
+
+
+def run(batch_sizes: List[int], seq_lens: List[int], dtypes: List[str], decode_steps: int,
+        repeats: int) -> Dict[str, Any]:
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    results = []
+    for dtype in dtypes:
+        model = build_tiny_model(getattr(torch, dtype)).to(device)
+        for batch_size in batch_sizes:
+            for seq_len in seq_lens:
+                case = bench_case(model, batch_size, seq_len, decode_steps, repeats)
+                case['dtype'] = dtype
+                results.append(case)
+                print(f"{dtype} batch={batch_size} seq={seq_len}: prefill {case['prefill_tokens_per_second']} ток/с, "
+                      f"decode {case['decode_ms_per_token']} мс/ток, RSS {case['peak_rss_mb']} МБ, "
+                      f"аллокаций на шаг {case['decode_allocations']}", flush=True)
+        del model
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'torch': torch.__version__,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'device': str(device),
+            'threads': torch.get_num_threads(),
+            'model': TINY_OVERRIDES,
+            'decode_steps': decode_steps,
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк инференса на уменьшенной Deepseek со случайными весами')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--seq-lens', type=int, nargs='+', default=[32, 256])
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'bfloat16'])
+    parser.add_argument('--decode-steps', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=None, help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='допустимое ухудшение, доля')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    payload = run(args.batch_sizes, args.seq_lens, args.dtypes, args.decode_steps, args.repeats)
+    save_results(payload, args.output)
+    print(f'Результаты сохранены в {args.output}')
+
+    if args.baseline:
+        rows = compare_results(payload, load_results(args.baseline), args.tolerance)
+        print(format_comparison(rows))
+        regressions = [row for row in rows if row['regression']]
+        if regressions:
+            print(f'Регрессий: {len(regressions)} (порог {args.tolerance * 100:.0f}%)')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
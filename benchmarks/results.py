@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Dict, Any, List, Tuple
+
+# Направление метрики: True — больше значит лучше
+METRICS = {
+    'prefill_tokens_per_second': True,
+    'decode_ms_per_token': False,
+    'peak_rss_mb': False,
+    'decode_allocations': False,
+    'decode_allocated_mb': False,
+}
+
+
+def save_results(payload: Dict[str, Any], path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _key(case: Dict[str, Any]) -> Tuple:
+    return case['dtype'], case['batch_size'], case['seq_len']
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float = 0.1) -> List[Dict[str, Any]]:
+    """Сравнение с базовым прогоном по совпадающим (dtype, batch_size, seq_len).
+
+    Возвращает строки по каждой метрике; regression=True, если метрика
+    ухудшилась больше чем на tolerance (доля от базового значения).
+    """
+    baseline_cases = {_key(case): case for case in baseline.get('results', [])}
+    rows = []
+    for case in current.get('results', []):
+        base = baseline_cases.get(_key(case))
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            value, reference = case.get(metric), base.get(metric)
+            if value is None or not reference:
+                continue
+            change = (value - reference) / reference
+            worse = -change if higher_is_better else change
+            rows.append({
+                'dtype': case['dtype'],
+                'batch_size': case['batch_size'],
+                'seq_len': case['seq_len'],
+                'metric': metric,
+                'baseline': reference,
+                'current': value,
+                'change': round(change, 4),
+                'regression': worse > tolerance,
+            })
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = ['| dtype | batch | seq | метрика | база | сейчас | изменение |', '|---|---|---|---|---|---|---|']
+    for row in rows:
+        mark = ' ⚠' if row['regression'] else ''
+        lines.append(
+            f"| {row['dtype']} | {row['batch_size']} | {row['seq_len']} | {row['metric']} | "
+            f"{row['baseline']:.3f} | {row['current']:.3f} | {row['change'] * 100:+.1f}%{mark} |"
+        )
+    return '\n'.join(lines)
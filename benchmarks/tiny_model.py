@@ -0,0 +1,47 @@
+import json
+import os
+from typing import Any, Dict
+
+import torch
+
+from models.configuration_deepseek import DeepseekConfig
+from models.modelling_deepseek import DeepseekForCausalLM
+
+MODEL_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'models', 'config.json')
+
+# Размеры уменьшены, топология как у models/config.json: первый слой плотный,
+# остальные MoE с общими экспертами, GQA с отношением голов 2:1
+TINY_OVERRIDES = {
+    'hidden_size': 256,
+    'head_dim': 32,
+    'intermediate_size': 1024,
+    'moe_intermediate_size': 128,
+    'num_hidden_layers': 4,
+    'num_attention_heads': 8,
+    'num_key_value_heads': 4,
+    'n_routed_experts': 16,
+    'num_experts_per_tok': 4,
+    'n_shared_experts': 2,
+    'vocab_size': 4096,
+    'max_position_embeddings': 4096,
+    'bos_token_id': 1,
+    'eos_token_id': 2,
+    'pad_token_id': 0,
+}
+
+
+def build_tiny_config(**overrides) -> DeepseekConfig:
+    with open(MODEL_CONFIG, 'r', encoding='utf-8') as f:
+        values: Dict[str, Any] = json.load(f)
+    for key in ('architectures', 'auto_map', 'transformers_version', 'torch_dtype'):
+        values.pop(key, None)
+    values.update(TINY_OVERRIDES)
+    values.update(overrides)
+    return DeepseekConfig(**values)
+
+
+def build_tiny_model(dtype: torch.dtype = torch.float32, seed: int = 0, **overrides) -> DeepseekForCausalLM:
+    """DeepseekForCausalLM со случайными весами по уменьшенной конфигурации."""
+    torch.manual_seed(seed)
+    model = DeepseekForCausalLM(build_tiny_config(**overrides))
+    return model.to(dtype).eval()
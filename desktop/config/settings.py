@@ -156,6 +156,54 @@ class Settings:
             'database': {
                 'path': os.path.join(base_dir, 'data', 'database', 'app.db')
             },
+            'runtime': {
+                'warmup': True,
+                'compute_dtype': 'auto',
+                'num_threads': None,
+                'interop_threads': 1,
+                'reserve_ui_cores': 1,
+                'pin_threads': True,
+                'numa_node': None,
+                'autotune': True,
+                'prefill_threads': None,
+                'decode_threads': None,
+                'tuned_signature': None,
+                'out_of_process': False,
+                'heartbeat_interval': 2.0,
+                'heartbeat_timeout': 60.0,
+                'cancel_timeout': 5.0,
+                'max_worker_restarts': 3,
+                'expert_offload': False,
+                'resident_experts': 384,
+                'expert_prefetch': True,
+                'prefetch_margin': 2,
+                'adapter_cache_size': 4,
+                'batch_adapter_capacity': 8
+            },
+            'adapters': {
+                'available': {},
+                'active': None,
+                'merge': False,
+                'role_defaults': {}
+            },
+            'cache': {
+                'enabled': False,
+                'allow_sampled': False,
+                'memory_items': 256,
+                'ttl_seconds': 86400,
+                'max_entries': 5000,
+                'max_size_mb': 64,
+                'path': os.path.join(data_dir, 'cache', 'responses.db'),
+                'semantic_enabled': False,
+                'semantic_threshold': 0.92,
+                'semantic_max_entries': 2000,
+                'semantic_encoder_path': '',
+                'semantic_path': os.path.join(data_dir, 'cache', 'semantic.npz')
+            },
+            'metrics': {
+                'path': os.path.join(data_dir, 'metrics', 'metrics.json'),
+                'save_interval': 60
+            },
             'current_user_id': None
         }
             
@@ -267,6 +315,10 @@ class Settings:
         self.config['generation'] = data.get('generation', self.get_generation_config())
         if data.get('model_path'):
             self.config['model_path'] = data['model_path']
+        if 'adapter' in data:
+            adapters = self.get_adapter_config()
+            adapters['active'] = data['adapter']
+            self.config['adapters'] = adapters
         self.save_config()
 
     def get_history_config(self) -> Dict[str, Any]:
@@ -346,6 +398,63 @@ class Settings:
         self.config['updater'] = updater
         self.save_config()
 
+    def get_runtime_config(self) -> Dict[str, Any]:
+        defaults = self.default_config()['runtime']
+        runtime = self.config.get('runtime', defaults)
+        defaults.update(runtime)
+        self.config['runtime'] = defaults
+        self.save_config()
+        return defaults
+
+    def update_runtime_config(self, data: Dict[str, Any], immediate: bool = False):
+        runtime = self.config.get('runtime') or self.default_config()['runtime']
+        runtime.update(data)
+        self.config['runtime'] = runtime
+        if immediate:
+            # Вызывается из фонового потока, где QTimer отложенного сохранения не сработает
+            self._save_pending = True
+        self.save_config(immediate=immediate)
+
+    def get_cache_config(self) -> Dict[str, Any]:
+        defaults = self.default_config()['cache']
+        cache = self.config.get('cache', defaults)
+        defaults.update(cache)
+        self.config['cache'] = defaults
+        self.save_config()
+        return defaults
+
+    def update_cache_config(self, data: Dict[str, Any]):
+        cache = self.get_cache_config()
+        cache.update(data)
+        self.config['cache'] = cache
+        self.save_config()
+
+    def get_metrics_config(self) -> Dict[str, Any]:
+        defaults = self.default_config()['metrics']
+        metrics = self.config.get('metrics', defaults)
+        defaults.update(metrics)
+        self.config['metrics'] = defaults
+        return defaults
+
+    def get_adapter_config(self) -> Dict[str, Any]:
+        defaults = self.default_config()['adapters']
+        adapters = self.config.get('adapters', defaults)
+        defaults.update(adapters)
+        self.config['adapters'] = defaults
+        return defaults
+
+    def update_adapter_config(self, data: Dict[str, Any]):
+        adapters = self.get_adapter_config()
+        adapters.update(data)
+        self.config['adapters'] = adapters
+        self.save_config()
+
+    def register_adapter(self, name: str, path: str):
+        adapters = self.get_adapter_config()
+        adapters['available'][name] = path
+        self.config['adapters'] = adapters
+        self.save_config()
+
     def set_current_user_id(self, user_id: int):
         self.config['current_user_id'] = user_id
         self.save_config()
@@ -0,0 +1,121 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.adapters')
+
+
+class AdapterCache:
+    """LoRA-адаптеры PEFT поверх уже загруженной базовой модели.
+
+    Адаптеры загружаются в одну PeftModel и остаются в памяти (до capacity
+    штук, вытесняются по LRU, кроме только что загруженного), поэтому переключение между ними — это
+    set_adapter без чтения с диска и без перезагрузки базы. Активный
+    адаптер можно влить в веса (merge) — тогда генерация идёт без
+    накладных расходов LoRA; перед переключением он вычитается обратно.
+    Без активного адаптера слои LoRA отключены и модель отвечает как база.
+    """
+
+    def __init__(self, base_model, capacity: int = 4):
+        self.base_model = base_model
+        self.model = base_model
+        self.capacity = max(1, capacity)
+        self.active: Optional[str] = None
+        self.merged: Optional[str] = None
+        self._loaded: "OrderedDict[str, str]" = OrderedDict()
+
+    @property
+    def loaded(self) -> Dict[str, str]:
+        return dict(self._loaded)
+
+    def load(self, name: str, path: str) -> None:
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+            return
+        if not os.path.exists(os.path.join(path, 'adapter_config.json')):
+            raise FileNotFoundError(f'В {path} нет adapter_config.json')
+        from peft import PeftModel
+
+        if self.merged is not None:
+            # PEFT вычитает влитые веса при переключении на новый адаптер, но merged
+            # об этом не знает: повторный unmerge испортил бы базу
+            self.model.base_model.unmerge_adapter()
+            self.merged = None
+        if self._loaded:
+            self.model.load_adapter(path, adapter_name=name)
+        else:
+            self.model = PeftModel.from_pretrained(self.base_model, path, adapter_name=name)
+        self.model.eval()
+        self._loaded[name] = path
+        logger.info(f"Адаптер {name} загружен из {path}")
+        # PEFT делает активным только что загруженный адаптер — возвращаем прежнее состояние
+        self._apply(self.active)
+        self._evict(keep=name)
+
+    def _evict(self, keep: str) -> None:
+        # Вытесняется самый давно использованный, даже активный: загружаемый адаптер
+        # сейчас будет активирован, иначе при capacity=1 переключение невозможно
+        while len(self._loaded) > self.capacity:
+            victim = next(name for name in self._loaded if name != keep)
+            self.unload(victim)
+
+    def _apply(self, name: Optional[str]) -> None:
+        if not self._loaded:
+            return
+        tuner = self.model.base_model
+        if name is None:
+            tuner.disable_adapter_layers()
+        else:
+            tuner.enable_adapter_layers()
+            self.model.set_adapter(name)
+
+    def activate(self, name: Optional[str], merge: bool = False) -> None:
+        if name is not None and name not in self._loaded:
+            raise KeyError(f'Адаптер {name} не загружен')
+        if self.merged is not None and (self.merged != name or not merge):
+            self.model.base_model.unmerge_adapter()
+            self.merged = None
+        self._apply(name)
+        if name is not None:
+            self._loaded.move_to_end(name)
+            if merge and self.merged != name:
+                self.model.base_model.merge_adapter()
+                self.merged = name
+        self.active = name
+
+    def unload(self, name: str) -> None:
+        if name not in self._loaded:
+            return
+        if name == self.active:
+            self.activate(None)
+        if len(self._loaded) == 1:
+            # Последний адаптер: снимаем слои LoRA и возвращаем исходную модель
+            self.model = self.model.base_model.unload()
+            self.base_model = self.model
+        else:
+            self.model.delete_adapter(name)
+            self._apply(self.active)
+        del self._loaded[name]
+        logger.info(f"Адаптер {name} выгружен")
+
+    def fingerprint(self) -> str:
+        if self.active is None:
+            return 'adapter:none'
+        path = self._loaded[self.active]
+        parts = [f'adapter:{self.active}', os.path.abspath(path)]
+        for filename in ('adapter_config.json', 'adapter_model.safetensors', 'adapter_model.bin'):
+            file_path = os.path.join(path, filename)
+            if os.path.exists(file_path):
+                stat = os.stat(file_path)
+                parts.append(f'{filename}:{stat.st_size}:{int(stat.st_mtime)}')
+        return '|'.join(parts)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'merged': self.merged,
+            'loaded': list(self._loaded),
+            'capacity': self.capacity,
+        }
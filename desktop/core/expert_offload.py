@@ -0,0 +1,297 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from desktop.core.parallel.tensor_parallel import _weight_files, load_shard_weights
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.expert_offload')
+
+EXPERT_PROJECTIONS = ('gate_proj', 'up_proj', 'down_proj')
+
+
+class ExpertStore:
+    """Веса маршрутизируемых экспертов на диске и LRU-кэш резидентных экспертов.
+
+    Чтение идёт из safetensors через mmap. Предзагрузка выполняется в одном
+    фоновом I/O-потоке; если эксперт понадобился раньше, чем дочитан,
+    ожидание учитывается как простой.
+    """
+
+    def __init__(self, model_path: str, dtype: torch.dtype, capacity: int):
+        self.dtype = dtype
+        self.capacity = max(1, int(capacity))
+        self._files = _weight_files(model_path)
+        self._handles: Dict[str, Any] = {}
+        self._cache: 'OrderedDict[Tuple[int, int], Dict[str, torch.Tensor]]' = OrderedDict()
+        self._pending: Dict[Tuple[int, int], Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='expert-io')
+        self.stall_seconds = 0.0
+        self.hits = 0
+        self.on_demand_loads = 0
+        self.prefetch_loads = 0
+        self.prefetch_waits = 0
+
+    def _handle(self, file: str):
+        from safetensors import safe_open
+        handle = self._handles.get(file)
+        if handle is None:
+            handle = safe_open(file, framework='pt')
+            self._handles[file] = handle
+        return handle
+
+    def _read(self, key: Tuple[int, int]) -> Dict[str, torch.Tensor]:
+        layer, expert = key
+        weights = {}
+        for projection in EXPERT_PROJECTIONS:
+            name = f'model.layers.{layer}.mlp.experts.{expert}.{projection}.weight'
+            file = self._files.get(name)
+            if file is None:
+                raise KeyError(f'Вес эксперта не найден в чекпоинте: {name}')
+            weights[projection] = self._handle(file).get_tensor(name).to(self.dtype)
+        return weights
+
+    def _insert(self, key: Tuple[int, int], weights: Dict[str, torch.Tensor]) -> None:
+        with self._lock:
+            self._cache[key] = weights
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                # Вытесненный эксперт остаётся жив, пока на него ссылается текущий слой
+                self._cache.popitem(last=False)
+
+    def _load_async(self, key: Tuple[int, int]) -> Dict[str, torch.Tensor]:
+        try:
+            weights = self._read(key)
+            self._insert(key, weights)
+            return weights
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def is_resident(self, layer: int, expert: int) -> bool:
+        with self._lock:
+            return (layer, expert) in self._cache
+
+    def prefetch(self, layer: int, experts: Iterable[int]) -> int:
+        """Ставит чтение экспертов в очередь фонового потока; возвращает число новых задач."""
+        submitted = 0
+        with self._lock:
+            for expert in experts:
+                key = (layer, int(expert))
+                if key in self._cache or key in self._pending:
+                    continue
+                self._pending[key] = self._executor.submit(self._load_async, key)
+                submitted += 1
+        self.prefetch_loads += submitted
+        return submitted
+
+    def get(self, layer: int, expert: int) -> Dict[str, torch.Tensor]:
+        key = (layer, expert)
+        with self._lock:
+            weights = self._cache.get(key)
+            if weights is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return weights
+            future = self._pending.get(key)
+        start = time.perf_counter()
+        if future is not None:
+            weights = future.result()
+            self.prefetch_waits += 1
+        else:
+            weights = self._read(key)
+            self._insert(key, weights)
+            self.on_demand_loads += 1
+        self.stall_seconds += time.perf_counter() - start
+        return weights
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._cache.clear()
+        self._handles.clear()
+
+
+class OffloadedMoE(nn.Module):
+    """DeepseekMoE, веса маршрутизируемых экспертов которого читаются из ExpertStore.
+
+    Роутер и общие эксперты остаются в памяти. Только для инференса.
+    """
+
+    def __init__(self, moe: nn.Module, layer_idx: int, store: ExpertStore,
+                 compute_dtype: Optional[torch.dtype] = None):
+        super().__init__()
+        self.config = moe.config
+        self.gate = moe.gate
+        self.shared_experts = getattr(moe, 'shared_experts', None)
+        self.layer_idx = layer_idx
+        self.store = store
+        self.compute_dtype = compute_dtype
+        self.prefetcher: Optional['ExpertPrefetcher'] = None
+        from transformers.activations import ACT2FN
+        self.act_fn = ACT2FN[moe.config.hidden_act]
+
+    def _expert_forward(self, weights: Dict[str, torch.Tensor], x: torch.Tensor) -> torch.Tensor:
+        gate_proj = weights['gate_proj'].to(x.dtype)
+        up_proj = weights['up_proj'].to(x.dtype)
+        down_proj = weights['down_proj'].to(x.dtype)
+        return F.linear(self.act_fn(F.linear(x, gate_proj)) * F.linear(x, up_proj), down_proj)
+
+    @torch.no_grad()
+    def forward(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        orig_shape = hidden_states.shape
+        topk_idx, topk_weight, _ = self.gate(hidden_states)
+        x = hidden_states.reshape(-1, orig_shape[-1])
+        if self.compute_dtype is not None:
+            x = x.to(self.compute_dtype)
+        flat_idx = topk_idx.reshape(-1)
+        flat_weight = topk_weight.reshape(-1, 1).to(x.dtype)
+        token_idx = torch.arange(x.shape[0], device=x.device).repeat_interleave(topk_idx.shape[-1])
+
+        experts = flat_idx.unique().tolist()
+        if self.prefetcher is not None:
+            self.prefetcher.record_routing(self.layer_idx, experts)
+
+        y = torch.zeros_like(x)
+        order = flat_idx.argsort()
+        counts = torch.bincount(flat_idx, minlength=self.config.n_routed_experts).tolist()
+        start = 0
+        for expert, count in enumerate(counts):
+            if not count:
+                continue
+            rows = order[start:start + count]
+            start += count
+            tokens = token_idx[rows]
+            out = self._expert_forward(self.store.get(self.layer_idx, expert), x[tokens])
+            y.index_add_(0, tokens, out * flat_weight[rows])
+
+        y = y.to(hidden_states.dtype).view(*orig_shape)
+        if self.shared_experts is not None:
+            y = y + self.shared_experts(hidden_states)
+        return y
+
+
+class ExpertPrefetcher:
+    """Предсказывает экспертов слоя L+1 по скрытому состоянию на входе слоя L.
+
+    Остаточный поток между соседними слоями меняется мало, поэтому роутер
+    слоя L+1, применённый к post_attention_layernorm(L+1) от входа слоя L,
+    обычно выбирает тех же экспертов. Чтение начинается до внимания слоя L
+    и идёт параллельно всему его вычислению.
+    """
+
+    def __init__(self, model: nn.Module, store: ExpertStore, margin: int = 2):
+        self.store = store
+        self.margin = max(0, int(margin))
+        self.layers = model.model.layers
+        self._predicted: Dict[int, set] = {}
+        self._handles = []
+        self.predicted_total = 0
+        self.routed_total = 0
+        self.routed_hits = 0
+        for index in range(len(self.layers) - 1):
+            if isinstance(getattr(self.layers[index + 1], 'mlp', None), OffloadedMoE):
+                self._handles.append(self.layers[index].register_forward_pre_hook(
+                    lambda module, args, kwargs, index=index: self._predict(index + 1, args, kwargs),
+                    with_kwargs=True
+                ))
+        for layer in self.layers:
+            if isinstance(getattr(layer, 'mlp', None), OffloadedMoE):
+                layer.mlp.prefetcher = self
+
+    @torch.no_grad()
+    def predict_experts(self, layer_idx: int, hidden_states: torch.Tensor) -> List[int]:
+        layer = self.layers[layer_idx]
+        gate = layer.mlp.gate
+        x = layer.post_attention_layernorm(hidden_states).reshape(-1, hidden_states.shape[-1])
+        logits = F.linear(x.to(gate.weight.dtype), gate.weight)
+        k = min(gate.top_k + self.margin, logits.shape[-1])
+        experts = logits.topk(k, dim=-1).indices.unique()
+        if experts.numel() > self.store.capacity:
+            # На префилле объединение по токенам может не поместиться в кэш — берём самых частых
+            votes = torch.bincount(logits.topk(k, dim=-1).indices.reshape(-1), minlength=logits.shape[-1])
+            experts = votes.topk(self.store.capacity).indices
+        return experts.tolist()
+
+    def _predict(self, layer_idx: int, args, kwargs) -> None:
+        hidden_states = args[0] if args else kwargs.get('hidden_states')
+        if hidden_states is None:
+            return
+        experts = self.predict_experts(layer_idx, hidden_states)
+        self._predicted[layer_idx] = set(experts)
+        self.predicted_total += len(experts)
+        self.store.prefetch(layer_idx, experts)
+
+    def record_routing(self, layer_idx: int, experts: List[int]) -> None:
+        predicted = self._predicted.pop(layer_idx, None)
+        if predicted is None:
+            return
+        self.routed_total += len(experts)
+        self.routed_hits += sum(1 for expert in experts if expert in predicted)
+
+    def stats(self) -> Dict[str, Any]:
+        store = self.store
+        return {
+            'accuracy': self.routed_hits / self.routed_total if self.routed_total else None,
+            'precision': self.routed_hits / self.predicted_total if self.predicted_total else None,
+            'stall_seconds': round(store.stall_seconds, 3),
+            'cache_hits': store.hits,
+            'prefetch_loads': store.prefetch_loads,
+            'prefetch_waits': store.prefetch_waits,
+            'on_demand_loads': store.on_demand_loads,
+            'resident_experts': len(store._cache),
+            'capacity': store.capacity,
+        }
+
+    def reset_stats(self) -> None:
+        self.predicted_total = self.routed_total = self.routed_hits = 0
+        self.store.stall_seconds = 0.0
+        self.store.hits = self.store.prefetch_loads = self.store.prefetch_waits = self.store.on_demand_loads = 0
+
+    def close(self) -> None:
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        self.store.close()
+
+
+def convert_to_offloaded(model: nn.Module, store: ExpertStore, compute_dtype: Optional[torch.dtype] = None,
+                         prefetch: bool = True, margin: int = 2) -> Optional[ExpertPrefetcher]:
+    """Заменяет MoE-блоки на OffloadedMoE; при prefetch подключает предсказание экспертов."""
+    converted = 0
+    for layer_idx, layer in enumerate(model.model.layers):
+        if hasattr(layer.mlp, 'experts') and hasattr(layer.mlp, 'gate'):
+            layer.mlp = OffloadedMoE(layer.mlp, layer_idx, store, compute_dtype)
+            converted += 1
+    model.expert_offload = {'layers': converted, 'capacity': store.capacity, 'prefetch': prefetch}
+    logger.info(f"Эксперты {converted} MoE-слоёв вынесены на диск, в памяти до {store.capacity}")
+    return ExpertPrefetcher(model, store, margin) if prefetch else None
+
+
+def load_offloaded_model(model_path: str, dtype: torch.dtype, capacity: int,
+                         compute_dtype: Optional[torch.dtype] = None, prefetch: bool = True,
+                         margin: int = 2):
+    """Собирает модель на meta-устройстве и читает всё, кроме маршрутизируемых экспертов.
+
+    Возвращает (model, prefetcher); prefetcher равен None без предзагрузки.
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=dtype)
+    store = ExpertStore(model_path, dtype, capacity)
+    prefetcher = convert_to_offloaded(model, store, compute_dtype, prefetch, margin)
+    load_shard_weights(model, model_path, 0, 1, dtype, rule=lambda name: None)
+    if config.tie_word_embeddings:
+        model.tie_weights()
+    model.eval()
+    return model, prefetcher
@@ -1,7 +1,14 @@
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from enum import Enum
+from typing import Dict, Any, List, Optional, Callable, Sequence
 
 from desktop.utils.logger import get_logger
+from desktop.core.runtime import InferenceRuntime, DecodePhaseSwitcher, StageTimer, StopOnEvent, autotune_thread_counts
+from desktop.core.precision import select_dtypes, to_torch_dtype, apply_compute_dtype
+from desktop.core.adapters import AdapterCache
 
 # Импорт logger после проверки torch, чтобы избежать проблем с DLL
 TRANSFORMERS_AVAILABLE = False
@@ -13,7 +20,7 @@ try:
     # Пытаемся импортировать torch отдельно
     import torch
     # Если torch импортирован успешно, пробуем transformers
-    from transformers import AutoTokenizer, AutoModelForCausalLM, GenerationConfig
+    from transformers import AutoTokenizer, AutoModelForCausalLM, GenerationConfig, LogitsProcessorList, StoppingCriteriaList
     from transformers.generation import GenerationMixin
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
@@ -27,7 +34,7 @@ except Exception as e:
         # Пробуем еще раз - иногда это ложное срабатывание
         try:
             import torch
-            from transformers import AutoTokenizer, AutoModelForCausalLM, GenerationConfig
+            from transformers import AutoTokenizer, AutoModelForCausalLM, GenerationConfig, LogitsProcessorList, StoppingCriteriaList
             from transformers.generation import GenerationMixin
             TRANSFORMERS_AVAILABLE = True
         except:
@@ -43,10 +50,47 @@ if not TRANSFORMERS_AVAILABLE:
                    f"Модель не будет загружаться до решения проблемы с torch/transformers.")
 
 
+WARMUP_PROMPT = 'Пользователь: Привет! Ответь одним словом.\nАссистент:'
+
+
+def make_token_streamer(tokenizer, on_token: Callable[[str], None]):
+    """TextStreamer, отдающий готовые фрагменты ответа в on_token (без промпта)."""
+    from transformers import TextStreamer
+
+    class CallbackStreamer(TextStreamer):
+        def on_finalized_text(self, text: str, stream_end: bool = False):
+            if text:
+                on_token(text)
+
+    return CallbackStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+
+class ModelState(str, Enum):
+    LOADING = 'loading'
+    WARMING = 'warming'
+    READY = 'ready'
+    DEGRADED = 'degraded'
+
+
 class ModelManager:
-    def __init__(self, model_path: str, generation_params: Dict[str, Any]):
+    def __init__(self, model_path: str, generation_params: Dict[str, Any],
+                 runtime_config: Optional[Dict[str, Any]] = None,
+                 on_runtime_tuned: Optional[Callable[[Dict[str, Any]], None]] = None):
         self.model_path = model_path
         self.generation_params = generation_params or {}
+        self.runtime_config = runtime_config or {}
+        self.on_runtime_tuned = on_runtime_tuned
+        self.runtime = InferenceRuntime(self.runtime_config)
+        self.storage_dtype: Optional[str] = None
+        self.compute_dtype: Optional[str] = None
+        self.expert_prefetcher = None
+        self.adapters: Optional[AdapterCache] = None
+        self.multi_lora = None
+        self.state = ModelState.LOADING
+        self.state_message: Optional[str] = None
+        self._generation_lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._warmup_thread: Optional[threading.Thread] = None
         self.device: Optional[torch.device] = None
         self.tokenizer = None
         self.model: Optional[GenerationMixin] = None
@@ -54,8 +98,11 @@ class ModelManager:
         self.fallback_history: list = []
         self.load_error: Optional[str] = None
         self.partial_model_warning: Optional[str] = None
+        self.last_generation_error: Optional[str] = None
+        self.last_generation_timings: Dict[str, float] = {}
         
         if not self.is_fallback:
+            self.runtime.apply()
             try:
                 validation_result = self._validate_model()
                 if not validation_result['valid']:
@@ -74,6 +121,115 @@ class ModelManager:
         else:
             logger.warning("Используется fallback режим - transformers недоступны")
 
+        if self.is_fallback:
+            self.set_state(ModelState.DEGRADED, self.load_error or 'fallback режим')
+        elif self.runtime_config.get('warmup', True):
+            self.start_warmup()
+        else:
+            self._set_ready_state()
+
+    def set_state(self, state: ModelState, message: Optional[str] = None) -> None:
+        if state != self.state:
+            logger.info(f"Состояние модели: {self.state.value} -> {state.value}")
+        self.state = state
+        self.state_message = message
+
+    def _set_ready_state(self) -> None:
+        if self.partial_model_warning:
+            self.set_state(ModelState.DEGRADED, self.partial_model_warning)
+        else:
+            self.set_state(ModelState.READY)
+
+    def start_warmup(self) -> None:
+        if self.is_fallback or not self.model:
+            self.set_state(ModelState.DEGRADED, self.load_error or 'модель не загружена')
+            return
+        if self._warmup_thread and self._warmup_thread.is_alive():
+            return
+        self.set_state(ModelState.WARMING)
+        self._warmup_thread = threading.Thread(target=self.warm_up, name='model-warmup', daemon=True)
+        self._warmup_thread.start()
+
+    def warm_up(self) -> None:
+        # Первый запрос иначе платит за ленивые аллокации, пул потоков и page faults по mmap-весам
+        with self._generation_lock:
+            self.set_state(ModelState.WARMING)
+            self.runtime.pin_inference_thread()
+            start = time.time()
+            try:
+                inputs = self.tokenizer(WARMUP_PROMPT, return_tensors='pt').to(self.device)
+                with torch.no_grad():
+                    self.model.generate(
+                        **inputs,
+                        max_new_tokens=2,
+                        do_sample=False,
+                        pad_token_id=self.tokenizer.pad_token_id
+                    )
+                touched = self._touch_experts()
+                logger.info(f"Прогрев модели завершён за {time.time() - start:.1f}с, экспертов затронуто: {touched}")
+                self._set_ready_state()
+            except Exception as e:
+                logger.exception(f"Ошибка прогрева модели: {e}")
+                self.set_state(ModelState.DEGRADED, f'прогрев не удался: {e}')
+                return
+        # Автонастройка идёт уже в состоянии READY и берёт блокировку по одному замеру,
+        # так что чат доступен сразу после прогрева
+        self._autotune_threads()
+
+    def select_dtypes(self, device_type: str = 'cpu'):
+        return select_dtypes(
+            self.runtime_config.get('compute_dtype', 'auto'),
+            device_type=device_type,
+            model_path=os.path.abspath(self.model_path)
+        )
+
+    def _runtime_signature(self) -> str:
+        return f'{self.runtime.signature()}|{os.path.abspath(self.model_path)}'
+
+    def _autotune_threads(self) -> None:
+        if not self.runtime_config.get('autotune', True):
+            return
+        signature = self._runtime_signature()
+        if self.runtime_config.get('tuned_signature') == signature:
+            return
+        try:
+            tuned = autotune_thread_counts(self.model, self.tokenizer, self.device, self.runtime,
+                                           lock=self._generation_lock)
+        except Exception as e:
+            logger.warning(f"Автонастройка потоков не удалась: {e}")
+            return
+        tuned['tuned_signature'] = signature
+        with self._generation_lock:
+            self.runtime_config.update(tuned)
+            self.runtime.config.update(tuned)
+            self.runtime.set_phase('prefill')
+        if self.on_runtime_tuned:
+            try:
+                self.on_runtime_tuned(tuned)
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить результаты автонастройки: {e}")
+
+    def _touch_experts(self) -> int:
+        touched = 0
+        with torch.no_grad():
+            for module in self.model.modules():
+                experts = getattr(module, 'experts', None)
+                if not isinstance(experts, torch.nn.ModuleList):
+                    continue
+                for expert in experts:
+                    weight = next(expert.parameters(), None)
+                    if weight is None:
+                        continue
+                    dummy = torch.zeros(1, weight.shape[-1], dtype=weight.dtype, device=weight.device)
+                    expert(dummy)
+                    touched += 1
+        return touched
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        if self._warmup_thread is not None:
+            self._warmup_thread.join(timeout)
+        return self.state == ModelState.READY
+
     def _validate_model(self) -> Dict[str, Any]:
         resolved_path = os.path.abspath(self.model_path)
         logger.debug(f"Валидация модели по пути: {resolved_path}")
@@ -194,10 +350,10 @@ class ModelManager:
             total_memory_gb = psutil.virtual_memory().total / (1024**3)
             logger.info(f"Доступная память: {available_memory_gb:.2f} GB из {total_memory_gb:.2f} GB")
             
-            # Для модели ~20B параметров в float16 нужно ~40GB
+            # Для модели ~20B параметров в 16 битах нужно ~40GB
             # С оффлоадингом можно работать с меньшей памятью (минимум 4GB для системы)
-            # Рекомендуем использовать float16 и оффлоадинг на диск
-            dtype = torch.float16
+            self.storage_dtype, self.compute_dtype = self.select_dtypes('cuda' if torch.cuda.is_available() else 'cpu')
+            dtype = to_torch_dtype(self.storage_dtype)
             device_map = 'auto' if torch.cuda.is_available() else 'cpu'
             
             # Параметры для экономии памяти
@@ -220,71 +376,310 @@ class ModelManager:
             logger.debug(f"Параметры загрузки: {load_kwargs}")
             logger.info("Начало загрузки модели... Это может занять много времени и памяти!")
             
-            self.model = AutoModelForCausalLM.from_pretrained(
-                resolved_path,
-                **load_kwargs
-            )
+            prefetcher = None
+            if self.runtime_config.get('expert_offload') and not torch.cuda.is_available():
+                model, prefetcher = self._load_offloaded(resolved_path, dtype)
+            else:
+                model = AutoModelForCausalLM.from_pretrained(
+                    resolved_path,
+                    **load_kwargs
+                )
+            apply_compute_dtype(model, self.storage_dtype, self.compute_dtype)
         except Exception as e:
             logger.exception(f"Ошибка загрузки модели: {e}")
             raise
         
-        if not torch.cuda.is_available() or (hasattr(self.model, 'device') and self.model.device.type == 'cpu'):
-            self.device = torch.device('cpu')
-            if not hasattr(self.model, 'device') or self.model.device.type != 'cpu':
+        if not torch.cuda.is_available() or (hasattr(model, 'device') and model.device.type == 'cpu'):
+            device = torch.device('cpu')
+            if not hasattr(model, 'device') or model.device.type != 'cpu':
                 # Модель может использовать device_map с оффлоадингом
                 logger.info("Модель загружена на CPU с оффлоадингом")
             else:
                 logger.info("Модель загружена на CPU")
         else:
-            self.device = next(self.model.parameters()).device if hasattr(self.model, 'parameters') else torch.device('cpu')
-            logger.info(f"Модель загружена на устройство: {self.device}")
+            device = next(model.parameters()).device if hasattr(model, 'parameters') else torch.device('cpu')
+            logger.info(f"Модель загружена на устройство: {device}")
         
-        self.model.eval()
+        self.install_model(model, device, expert_prefetcher=prefetcher)
         logger.info(f"Модель успешно загружена и готова к использованию на {self.device}")
 
-    def generate(self, prompt: str) -> str:
+    def install_model(self, model, device, expert_prefetcher=None) -> None:
+        """Подключает загруженную модель вместо прежней.
+
+        Всё, что держит ссылки на прежнюю модель (кэш адаптеров, хуки
+        пакетных LoRA, предзагрузчик экспертов), пересоздаётся, после чего
+        заново применяется адаптер из настроек.
+        """
+        with self._generation_lock:
+            if self.multi_lora is not None:
+                self.multi_lora.close()
+                self.multi_lora = None
+            if self.expert_prefetcher is not None and self.expert_prefetcher is not expert_prefetcher:
+                self.expert_prefetcher.close()
+            self.expert_prefetcher = expert_prefetcher
+            model.eval()
+            self.model = model
+            self.device = device
+            self.adapters = AdapterCache(model, capacity=self.runtime_config.get('adapter_cache_size', 4))
+            self.is_fallback = False
+            self.load_error = None
+        adapter = self.runtime_config.get('adapter')
+        if adapter:
+            self.set_adapter(adapter['name'], adapter['path'], merge=adapter.get('merge', False))
+
+    def _load_offloaded(self, resolved_path: str, dtype):
+        from desktop.core.expert_offload import load_offloaded_model
+
+        compute = None
+        if self.compute_dtype != self.storage_dtype:
+            compute = to_torch_dtype(self.compute_dtype)
+        return load_offloaded_model(
+            resolved_path,
+            dtype,
+            capacity=self.runtime_config.get('resident_experts', 384),
+            compute_dtype=compute,
+            prefetch=self.runtime_config.get('expert_prefetch', True),
+            margin=self.runtime_config.get('prefetch_margin', 2)
+        )
+
+    def _generation_config(self):
+        return GenerationConfig(
+            max_new_tokens=self.generation_params.get('max_new_tokens', 200),
+            temperature=self.generation_params.get('temperature', 0.8),
+            top_p=self.generation_params.get('top_p', 0.95),
+            do_sample=self.generation_params.get('do_sample', True),
+            repetition_penalty=self.generation_params.get('repetition_penalty', 1.05),
+            eos_token_id=self.tokenizer.eos_token_id,
+            pad_token_id=self.tokenizer.pad_token_id,
+        )
+
+    def generate(self, prompt: str, streamer=None, stop_event: Optional[threading.Event] = None,
+                 on_token: Optional[Callable[[str], None]] = None, adapter: Optional[str] = None,
+                 adapter_paths: Optional[Dict[str, str]] = None) -> str:
+        """Ответ на промпт; adapter — LoRA-адаптер только для этого запроса (через MultiLoraRuntime)."""
         if not prompt:
             logger.warning("Попытка генерации с пустым промптом")
             return 'Пожалуйста, введите вопрос.'
         
+        self.last_generation_timings = {}
         if self.is_fallback or not TRANSFORMERS_AVAILABLE:
             logger.debug("Использование fallback генерации")
             return self._fallback_generate(prompt)
         
         logger.debug(f"Генерация ответа для промпта длиной {len(prompt)} символов")
+        self.last_generation_error = None
+        # Стадии в секундах; ttft считается от входа в generate, включая токенизацию и ожидание блокировки
+        timings: Dict[str, float] = {}
+        self.last_generation_timings = timings
+        if stop_event is None:
+            # Своё событие на каждый запрос: начало генерации не стирает уже пришедшую отмену
+            stop_event = self._cancel_event = threading.Event()
 
+        started = time.perf_counter()
         inputs = self.tokenizer(prompt, return_tensors='pt').to(self.device)
-        gen_config = GenerationConfig(
-            max_new_tokens=self.generation_params.get('max_new_tokens', 200),
-            temperature=self.generation_params.get('temperature', 0.8),
-            top_p=self.generation_params.get('top_p', 0.95),
-            do_sample=self.generation_params.get('do_sample', True),
-            repetition_penalty=self.generation_params.get('repetition_penalty', 1.05),
-            eos_token_id=self.tokenizer.eos_token_id,
-            pad_token_id=self.tokenizer.pad_token_id,
-        )
+        gen_config = self._generation_config()
+        if streamer is None and on_token is not None:
+            streamer = make_token_streamer(self.tokenizer, on_token)
+        timings['tokenize'] = time.perf_counter() - started
+        timings['prompt_tokens'] = inputs.input_ids.shape[1]
+        timer = StageTimer()
 
         try:
-            with torch.no_grad():
-                output_ids = self.model.generate(
-                    **inputs,
-                    generation_config=gen_config
-                )
+            with self._generation_lock, torch.no_grad():
+                acquired = time.perf_counter()
+                timings['lock_wait'] = acquired - started - timings['tokenize']
+                with self._request_adapters([adapter], adapter_paths) if adapter is not None else nullcontext():
+                    timer.start()
+                    if adapter is not None:
+                        timings['adapter_switch'] = timer.started - acquired
+                    self.runtime.pin_inference_thread()
+                    self.runtime.set_phase('prefill')
+                    output_ids = self.model.generate(
+                        **inputs,
+                        generation_config=gen_config,
+                        logits_processor=LogitsProcessorList([timer, DecodePhaseSwitcher(self.runtime)]),
+                        stopping_criteria=StoppingCriteriaList([StopOnEvent(stop_event)]),
+                        streamer=streamer
+                    )
+                    self.runtime.set_phase('prefill')
+            timings.update(timer.stages())
+            if timer.stamps:
+                timings['ttft'] = timer.stamps[0] - started
+            if stop_event.is_set():
+                # Оборванный ответ не должен попасть в кэш
+                self.last_generation_error = 'генерация отменена'
 
+            detokenize_start = time.perf_counter()
             generated_part = output_ids[0][inputs.input_ids.shape[1]:]
             text = self.tokenizer.decode(generated_part, skip_special_tokens=True)
+            timings['detokenize'] = time.perf_counter() - detokenize_start
             result = text.strip() or 'Модель не смогла сформировать ответ.'
             logger.debug(f"Сгенерирован ответ длиной {len(result)} символов")
+            if self.state == ModelState.DEGRADED and not self.partial_model_warning:
+                self.set_state(ModelState.READY)
             return result
         except Exception as e:
             logger.exception(f"Ошибка при генерации: {e}")
+            self.last_generation_error = str(e)
+            self.set_state(ModelState.DEGRADED, f'ошибка генерации: {e}')
             return f'Произошла ошибка при генерации ответа: {str(e)}'
 
+    def set_adapter(self, name: Optional[str], path: Optional[str] = None, merge: bool = False) -> bool:
+        """Переключает LoRA-адаптер на загруженной базе; None — чистая базовая модель."""
+        if self.is_fallback or self.adapters is None:
+            return False
+        try:
+            with self._generation_lock:
+                if name is not None and path:
+                    self.adapters.load(name, path)
+                self.adapters.activate(name, merge=merge)
+                self.model = self.adapters.model
+                # Его же применит install_model после перезагрузки модели
+                self.runtime_config['adapter'] = (
+                    {'name': name, 'path': self.adapters.loaded[name], 'merge': merge} if name is not None else None
+                )
+        except Exception as e:
+            logger.warning(f"Не удалось переключить адаптер на {name}: {e}")
+            return False
+        logger.info(f"Активный адаптер: {name or 'нет'}{' (влит в веса)' if self.adapters.merged else ''}")
+        return True
+
+    def _multi_lora_runtime(self):
+        if self.multi_lora is None:
+            from desktop.core.multi_lora import MultiLoraRuntime
+            self.multi_lora = MultiLoraRuntime(
+                self.adapters.base_model,
+                capacity=self.runtime_config.get('batch_adapter_capacity', 8)
+            )
+        return self.multi_lora
+
+    @contextmanager
+    def _request_adapters(self, adapters: Sequence[Optional[str]], adapter_paths: Optional[Dict[str, str]]):
+        # Вызывается под _generation_lock: адаптер AdapterCache снимается на время запроса
+        runtime = self._multi_lora_runtime()
+        runtime.ensure([name for name in dict.fromkeys(adapters) if name is not None], adapter_paths or {})
+        active, merged = self.adapters.active, self.adapters.merged
+        self.adapters.activate(None)
+        try:
+            with runtime.use(adapters):
+                yield
+        finally:
+            self.adapters.activate(active, merge=merged is not None)
+
+    def generate_batch(self, prompts: Sequence[str], adapters: Sequence[Optional[str]],
+                       adapter_paths: Optional[Dict[str, str]] = None) -> List[str]:
+        """Пакетная генерация, где у каждого промпта свой LoRA-адаптер (None — база).
+
+        Все строки проходят через один прямой проход базовой модели, дельты
+        адаптеров считает MultiLoraRuntime. Адаптер AdapterCache на время
+        генерации снимается и затем восстанавливается.
+        """
+        if len(prompts) != len(adapters):
+            raise ValueError('Число промптов и адаптеров должно совпадать')
+        if self.is_fallback or not TRANSFORMERS_AVAILABLE:
+            return [self._fallback_generate(prompt) for prompt in prompts]
+        if not prompts:
+            return []
+        adapter_paths = adapter_paths or {}
+        needed = [name for name in dict.fromkeys(adapters) if name is not None]
+        runtime = self._multi_lora_runtime()
+        if len(needed) > runtime.capacity:
+            raise ValueError(f'В батче {len(needed)} адаптеров, допустимо не больше {runtime.capacity}')
+        self.last_generation_error = None
+        self.last_generation_timings = {}
+        gen_config = self._generation_config()
+        padding_side = self.tokenizer.padding_side
+        try:
+            with self._generation_lock, torch.no_grad(), self._request_adapters(adapters, adapter_paths):
+                self.tokenizer.padding_side = 'left'
+                try:
+                    inputs = self.tokenizer(list(prompts), return_tensors='pt', padding=True).to(self.device)
+                    self.runtime.pin_inference_thread()
+                    self.runtime.set_phase('prefill')
+                    output_ids = self.model.generate(
+                        **inputs,
+                        generation_config=gen_config,
+                        logits_processor=LogitsProcessorList([DecodePhaseSwitcher(self.runtime)])
+                    )
+                    self.runtime.set_phase('prefill')
+                finally:
+                    self.tokenizer.padding_side = padding_side
+        except Exception as e:
+            logger.exception(f"Ошибка пакетной генерации: {e}")
+            self.last_generation_error = str(e)
+            return [f'Произошла ошибка при генерации ответа: {str(e)}'] * len(prompts)
+
+        prompt_length = inputs.input_ids.shape[1]
+        return [
+            self.tokenizer.decode(ids[prompt_length:], skip_special_tokens=True).strip()
+            or 'Модель не смогла сформировать ответ.'
+            for ids in output_ids
+        ]
+
+    def unload_adapter(self, name: str) -> bool:
+        if self.is_fallback or self.adapters is None:
+            return False
+        try:
+            with self._generation_lock:
+                self.adapters.unload(name)
+                self.model = self.adapters.model
+                if (self.runtime_config.get('adapter') or {}).get('name') == name:
+                    self.runtime_config['adapter'] = None
+        except Exception as e:
+            logger.warning(f"Не удалось выгрузить адаптер {name}: {e}")
+            return False
+        return True
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def shutdown(self) -> None:
+        if self.multi_lora is not None:
+            self.multi_lora.close()
+            self.multi_lora = None
+        if self.expert_prefetcher is not None:
+            self.expert_prefetcher.close()
+            self.expert_prefetcher = None
+
+    def embed(self, text: str):
+        if self.is_fallback or not self.model or not text:
+            return None
+        # Средние скрытые состояния последнего слоя DeepseekModel без LM-головы
+        decoder = self.model.get_decoder() if hasattr(self.model, 'get_decoder') else self.model
+        inputs = self.tokenizer(text, return_tensors='pt', truncation=True, max_length=512).to(self.device)
+        try:
+            with self._generation_lock, torch.no_grad():
+                hidden = decoder(
+                    input_ids=inputs.input_ids,
+                    attention_mask=inputs.attention_mask,
+                    use_cache=False
+                ).last_hidden_state
+        except Exception as e:
+            logger.warning(f"Не удалось получить эмбеддинг промпта: {e}")
+            return None
+        mask = inputs.attention_mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return pooled[0].float().cpu().numpy()
+
     def update_generation_params(self, params: Dict[str, Any]) -> None:
         if params:
             self.generation_params.update(params)
             logger.debug(f"Обновлены параметры генерации: {params}")
 
+    def get_fingerprint(self) -> Optional[str]:
+        if self.is_fallback or not self.model:
+            return None
+        resolved_path = os.path.abspath(self.model_path)
+        parts = [resolved_path, str(getattr(self.model, 'dtype', 'unknown')), str(self.compute_dtype)]
+        for name in ('config.json', 'model.safetensors.index.json', 'generation_config.json'):
+            file_path = os.path.join(resolved_path, name)
+            if os.path.exists(file_path):
+                stat = os.stat(file_path)
+                parts.append(f'{name}:{stat.st_size}:{int(stat.st_mtime)}')
+        if self.adapters is not None:
+            parts.append(self.adapters.fingerprint())
+        return '|'.join(parts)
+
     def get_metadata(self) -> Dict[str, Any]:
         if self.is_fallback or not self.model:
             return {
@@ -294,6 +689,7 @@ class ModelManager:
                 'context_length': 0,
                 'vocab_size': 0,
                 'fallback': True,
+                'state': self.state.value,
                 'partial_model': bool(self.partial_model_warning),
                 'warning': self.partial_model_warning
             }
@@ -305,9 +701,16 @@ class ModelManager:
             'model_path': os.path.abspath(self.model_path),
             'device': str(self.device),
             'dtype': str(getattr(self.model, 'dtype', 'unknown')),
+            'storage_dtype': self.storage_dtype,
+            'compute_dtype': self.compute_dtype,
             'context_length': context,
             'vocab_size': getattr(config, 'vocab_size', None),
             'fallback': False,
+            'state': self.state.value,
+            'runtime': self.runtime.describe(),
+            'expert_offload': self.expert_prefetcher.stats() if self.expert_prefetcher else None,
+            'adapters': self.adapters.describe() if self.adapters else None,
+            'batch_adapters': self.multi_lora.describe() if self.multi_lora else None,
             'partial_model': bool(self.partial_model_warning),
             'warning': self.partial_model_warning
         }
@@ -0,0 +1,451 @@
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable
+
+from desktop.core.model_manager import ModelState
+from desktop.core.runtime import InferenceRuntime
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.model_worker')
+
+
+def _worker_main(conn, model_path: str, generation_params: Dict[str, Any],
+                 runtime_config: Dict[str, Any]) -> None:
+    """Точка входа процесса модели.
+
+    Протокол — кортежи через Pipe. От GUI: generate, cancel, embed,
+    update_params, warmup, set_adapter, unload_adapter, generate_batch,
+    shutdown. К GUI: heartbeat со статусом,
+    token, done, error, result, runtime_tuned.
+    """
+    from desktop.core.model_manager import ModelManager
+
+    send_lock = threading.Lock()
+    tasks: "queue.Queue" = queue.Queue()
+    stop_events: Dict[str, threading.Event] = {}
+    holder: Dict[str, Any] = {'manager': None}
+    alive = threading.Event()
+    alive.set()
+
+    def send(*message) -> None:
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError):
+                alive.clear()
+
+    def status() -> Dict[str, Any]:
+        manager = holder['manager']
+        if manager is None:
+            return {'state': ModelState.LOADING.value, 'state_message': 'загрузка модели в процессе'}
+        return {
+            'state': manager.state.value,
+            'state_message': manager.state_message,
+            'is_fallback': manager.is_fallback,
+            'load_error': manager.load_error,
+            'partial_model_warning': manager.partial_model_warning,
+            'fingerprint': manager.get_fingerprint(),
+            'metadata': manager.get_metadata(),
+        }
+
+    def heartbeat() -> None:
+        interval = float(runtime_config.get('heartbeat_interval', 2.0))
+        while alive.is_set():
+            send('heartbeat', status())
+            time.sleep(interval)
+
+    def reader() -> None:
+        while alive.is_set():
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'cancel':
+                stop_events.setdefault(message[1], threading.Event()).set()
+            elif message[0] == 'shutdown':
+                break
+            else:
+                tasks.put(message)
+        tasks.put(None)
+
+    threading.Thread(target=heartbeat, name='worker-heartbeat', daemon=True).start()
+    threading.Thread(target=reader, name='worker-reader', daemon=True).start()
+
+    manager = ModelManager(
+        model_path=model_path,
+        generation_params=generation_params,
+        runtime_config=runtime_config,
+        on_runtime_tuned=lambda tuned: send('runtime_tuned', tuned)
+    )
+    holder['manager'] = manager
+    send('heartbeat', status())
+
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        kind = message[0]
+        if kind == 'generate':
+            request_id, prompt = message[1], message[2]
+            stop_event = stop_events.setdefault(request_id, threading.Event())
+            try:
+                text = manager.generate(prompt, stop_event=stop_event,
+                                        on_token=lambda token: send('token', request_id, token),
+                                        adapter=message[3], adapter_paths=message[4])
+                send('done', request_id, text, manager.last_generation_error, stop_event.is_set(),
+                     manager.last_generation_timings)
+            except Exception as e:
+                send('error', request_id, str(e))
+            finally:
+                stop_events.pop(request_id, None)
+        elif kind == 'embed':
+            try:
+                send('result', message[1], manager.embed(message[2]))
+            except Exception as e:
+                send('error', message[1], str(e))
+        elif kind == 'update_params':
+            manager.update_generation_params(message[1])
+        elif kind == 'warmup':
+            manager.start_warmup()
+        elif kind == 'generate_batch':
+            try:
+                texts = manager.generate_batch(message[2], message[3], message[4])
+                send('result', message[1], {'texts': texts, 'error': manager.last_generation_error})
+            except Exception as e:
+                send('error', message[1], str(e))
+        elif kind in ('set_adapter', 'unload_adapter'):
+            try:
+                if kind == 'set_adapter':
+                    ok = manager.set_adapter(message[2], message[3], merge=message[4])
+                else:
+                    ok = manager.unload_adapter(message[2])
+                send('result', message[1], {'ok': ok, 'status': status(),
+                                            'adapter': manager.runtime_config.get('adapter')})
+            except Exception as e:
+                send('error', message[1], str(e))
+
+    manager.shutdown()
+    alive.clear()
+    conn.close()
+
+
+class RemoteModelManager:
+    """ModelManager в отдельном процессе.
+
+    Интерфейс совпадает с ModelManager, поэтому NeuralNetwork и UI не
+    различают режимы. Сбой torch не роняет GUI, а зависшую после отмены
+    генерацию можно безопасно остановить вместе с процессом.
+    """
+
+    is_remote = True
+
+    def __init__(self, model_path: str, generation_params: Dict[str, Any],
+                 runtime_config: Optional[Dict[str, Any]] = None,
+                 on_runtime_tuned: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.model_path = model_path
+        self.generation_params = generation_params or {}
+        self.runtime_config = runtime_config or {}
+        self.on_runtime_tuned = on_runtime_tuned
+        # Только для привязки GUI-потока: потоки torch настраивает процесс модели
+        self.runtime = InferenceRuntime(self.runtime_config)
+        self.model = None
+        self.tokenizer = None
+        self.device = None
+        self.state = ModelState.LOADING
+        self.state_message: Optional[str] = None
+        self.is_fallback = False
+        self.load_error: Optional[str] = None
+        self.partial_model_warning: Optional[str] = None
+        self.last_generation_error: Optional[str] = None
+        self.last_generation_timings: Dict[str, float] = {}
+        self.storage_dtype: Optional[str] = None
+        self.compute_dtype: Optional[str] = None
+        self._fingerprint: Optional[str] = None
+        self._metadata: Dict[str, Any] = {}
+
+        self.heartbeat_interval = float(self.runtime_config.get('heartbeat_interval', 2.0))
+        self.heartbeat_timeout = float(self.runtime_config.get('heartbeat_timeout', 60.0))
+        self.cancel_timeout = float(self.runtime_config.get('cancel_timeout', 5.0))
+        self.max_restarts = int(self.runtime_config.get('max_worker_restarts', 3))
+
+        self._context = multiprocessing.get_context('spawn')
+        self._worker_lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[str, "queue.Queue"] = {}
+        self._pending_lock = threading.Lock()
+        self._active_request: Optional[str] = None
+        self._process = None
+        self._conn = None
+        self._last_heartbeat = 0.0
+        self._restarts = 0
+        self._closing = False
+
+        self._start_worker()
+        self._monitor_thread = threading.Thread(target=self._monitor_loop, name='model-worker-monitor', daemon=True)
+        self._monitor_thread.start()
+
+    def _start_worker(self) -> None:
+        with self._worker_lock:
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(child_conn, self.model_path, dict(self.generation_params), dict(self.runtime_config)),
+                name='model-worker',
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._process = process
+            self._conn = parent_conn
+            self._last_heartbeat = time.time()
+            self.set_state(ModelState.LOADING, 'запуск процесса модели')
+            threading.Thread(
+                target=self._reader_loop, args=(parent_conn,), name='model-worker-reader', daemon=True
+            ).start()
+            logger.info(f"Процесс модели запущен (pid {process.pid})")
+
+    def _stop_worker(self) -> None:
+        with self._worker_lock:
+            process, conn = self._process, self._conn
+            self._process, self._conn = None, None
+            if process is not None and process.is_alive():
+                process.terminate()
+                process.join(3)
+                if process.is_alive():
+                    process.kill()
+                    process.join(1)
+            if conn is not None:
+                conn.close()
+
+    def _send(self, *message) -> bool:
+        with self._send_lock:
+            conn = self._conn
+            if conn is None:
+                return False
+            try:
+                conn.send(message)
+                return True
+            except (OSError, EOFError):
+                return False
+
+    def _reader_loop(self, conn) -> None:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == 'heartbeat':
+                self._last_heartbeat = time.time()
+                self._apply_status(message[1])
+            elif kind == 'runtime_tuned':
+                self.runtime_config.update(message[1])
+                if self.on_runtime_tuned:
+                    try:
+                        self.on_runtime_tuned(message[1])
+                    except Exception as e:
+                        # Поток чтения не должен умирать: без него ответы generate не дойдут
+                        logger.exception(f"Ошибка обработчика runtime_tuned: {e}")
+            else:
+                with self._pending_lock:
+                    pending = self._pending.get(message[1])
+                if pending is not None:
+                    pending.put(message)
+
+    def _apply_status(self, status: Dict[str, Any]) -> None:
+        self.set_state(ModelState(status['state']), status.get('state_message'))
+        if self.state == ModelState.READY:
+            self._restarts = 0
+        self.is_fallback = status.get('is_fallback', False)
+        self.load_error = status.get('load_error')
+        self.partial_model_warning = status.get('partial_model_warning')
+        self._fingerprint = status.get('fingerprint')
+        self._metadata = status.get('metadata') or {}
+        self.storage_dtype = self._metadata.get('storage_dtype')
+        self.compute_dtype = self._metadata.get('compute_dtype')
+
+    def _monitor_loop(self) -> None:
+        while not self._closing:
+            time.sleep(self.heartbeat_interval)
+            if self._closing:
+                break
+            process = self._process
+            if process is None:
+                continue
+            if not process.is_alive():
+                self._handle_worker_failure(f'процесс завершился с кодом {process.exitcode}')
+            elif time.time() - self._last_heartbeat > self.heartbeat_timeout:
+                self._handle_worker_failure(f'нет heartbeat {self.heartbeat_timeout:.0f}с')
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._pending_lock:
+            for request_id, pending in self._pending.items():
+                pending.put(('error', request_id, reason))
+
+    def _handle_worker_failure(self, reason: str, count: bool = True) -> None:
+        logger.error(f"Сбой процесса модели: {reason}")
+        with self._worker_lock:
+            self._stop_worker()
+            self._fail_pending(f'процесс модели остановлен: {reason}')
+            if self._closing:
+                return
+            if count:
+                if self._restarts >= self.max_restarts:
+                    self.set_state(ModelState.DEGRADED, f'процесс модели остановлен: {reason}')
+                    return
+                self._restarts += 1
+            self._start_worker()
+
+    def set_state(self, state: ModelState, message: Optional[str] = None) -> None:
+        if state != self.state:
+            logger.info(f"Состояние модели (процесс): {self.state.value} -> {state.value}")
+        self.state = state
+        self.state_message = message
+
+    def _request(self, message: tuple, on_token: Optional[Callable[[str], None]] = None):
+        request_id = message[1]
+        pending: "queue.Queue" = queue.Queue()
+        with self._pending_lock:
+            self._pending[request_id] = pending
+        try:
+            if not self._send(*message):
+                return ('error', request_id, 'процесс модели недоступен')
+            while True:
+                reply = pending.get()
+                if reply[0] == 'token':
+                    if on_token:
+                        on_token(reply[2])
+                    continue
+                return reply
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+    def generate(self, prompt: str, stop_event: Optional[threading.Event] = None,
+                 on_token: Optional[Callable[[str], None]] = None, adapter: Optional[str] = None,
+                 adapter_paths: Optional[Dict[str, str]] = None) -> str:
+        if not prompt:
+            logger.warning("Попытка генерации с пустым промптом")
+            return 'Пожалуйста, введите вопрос.'
+        self.last_generation_error = None
+        self.last_generation_timings = {}
+        request_id = uuid.uuid4().hex
+        self._active_request = request_id
+        try:
+            if stop_event is not None and stop_event.is_set():
+                # Отменён до отправки: cancel() мог прийти раньше, чем появился request_id
+                reply = ('done', request_id, '', None, True, {})
+            else:
+                reply = self._request(('generate', request_id, prompt, adapter, adapter_paths or {}), on_token)
+        finally:
+            self._active_request = None
+        if reply[0] == 'error':
+            self.last_generation_error = reply[2]
+            return f'Произошла ошибка при генерации ответа: {reply[2]}'
+        _, _, text, error, cancelled, timings = reply
+        self.last_generation_timings = timings
+        self.last_generation_error = error or ('генерация отменена' if cancelled else None)
+        return text
+
+    def generate_batch(self, prompts, adapters, adapter_paths: Optional[Dict[str, str]] = None):
+        self.last_generation_error = None
+        reply = self._request(('generate_batch', uuid.uuid4().hex, list(prompts), list(adapters), adapter_paths or {}))
+        if reply[0] == 'error':
+            self.last_generation_error = reply[2]
+            return [f'Произошла ошибка при генерации ответа: {reply[2]}'] * len(prompts)
+        self.last_generation_error = reply[2]['error']
+        return reply[2]['texts']
+
+    def cancel(self) -> None:
+        request_id = self._active_request
+        if request_id is None:
+            return
+        self._send('cancel', request_id)
+
+        def enforce():
+            with self._pending_lock:
+                still_running = request_id in self._pending
+            if still_running:
+                self._handle_worker_failure('генерация не остановилась после отмены', count=False)
+
+        timer = threading.Timer(self.cancel_timeout, enforce)
+        timer.daemon = True
+        timer.start()
+
+    def embed(self, text: str):
+        if not text:
+            return None
+        reply = self._request(('embed', uuid.uuid4().hex, text))
+        if reply[0] == 'error':
+            logger.warning(f"Не удалось получить эмбеддинг промпта: {reply[2]}")
+            return None
+        return reply[2]
+
+    def update_generation_params(self, params: Dict[str, Any]) -> None:
+        if params:
+            self.generation_params.update(params)
+            self._send('update_params', params)
+
+    def start_warmup(self) -> None:
+        self._send('warmup')
+
+    def _adapter_request(self, message: tuple) -> bool:
+        reply = self._request(message)
+        if reply[0] == 'error':
+            logger.warning(f"Операция с адаптером не выполнена: {reply[2]}")
+            return False
+        # Статус сразу, не дожидаясь heartbeat: от него зависит отпечаток кэша ответов
+        self._apply_status(reply[2]['status'])
+        if reply[2]['ok']:
+            # Перезапущенный после сбоя процесс применит при старте текущий адаптер, а не стартовый
+            self.runtime_config['adapter'] = reply[2].get('adapter')
+        return reply[2]['ok']
+
+    def set_adapter(self, name: Optional[str], path: Optional[str] = None, merge: bool = False) -> bool:
+        return self._adapter_request(('set_adapter', uuid.uuid4().hex, name, path, merge))
+
+    def unload_adapter(self, name: str) -> bool:
+        return self._adapter_request(('unload_adapter', uuid.uuid4().hex, name))
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.time() + timeout
+        while self.state in (ModelState.LOADING, ModelState.WARMING):
+            if deadline is not None and time.time() > deadline:
+                break
+            time.sleep(0.1)
+        return self.state == ModelState.READY
+
+    def restart(self) -> None:
+        self._handle_worker_failure('перезапуск по запросу', count=False)
+
+    def get_fingerprint(self) -> Optional[str]:
+        return self._fingerprint
+
+    def get_metadata(self) -> Dict[str, Any]:
+        metadata = dict(self._metadata) or {
+            'model_path': self.model_path,
+            'device': 'N/A',
+            'dtype': 'N/A',
+            'context_length': 0,
+            'vocab_size': 0,
+            'fallback': self.is_fallback,
+            'partial_model': False,
+            'warning': None
+        }
+        metadata['state'] = self.state.value
+        metadata['out_of_process'] = True
+        metadata['worker_pid'] = self._process.pid if self._process is not None else None
+        return metadata
+
+    def shutdown(self) -> None:
+        self._closing = True
+        with self._worker_lock:
+            process = self._process
+            self._send('shutdown')
+            if process is not None:
+                process.join(5)
+            self._stop_worker()
+            self._fail_pending('приложение закрывается')
@@ -0,0 +1,203 @@
+import json
+import math
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.multi_lora')
+
+
+def load_lora_weights(path: str) -> Dict[str, Dict[str, torch.Tensor]]:
+    """Веса адаптера PEFT по именам модулей: {'model.layers.0.self_attn.q_proj': {'A', 'B', 'scaling'}}."""
+    with open(os.path.join(path, 'adapter_config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    safetensors_file = os.path.join(path, 'adapter_model.safetensors')
+    if os.path.exists(safetensors_file):
+        from safetensors.torch import load_file
+        state = load_file(safetensors_file)
+    else:
+        state = torch.load(os.path.join(path, 'adapter_model.bin'), map_location='cpu', weights_only=True)
+
+    alpha = config.get('lora_alpha', 8)
+    alpha_pattern = config.get('alpha_pattern') or {}
+    modules: Dict[str, Dict[str, torch.Tensor]] = {}
+    for key, tensor in state.items():
+        for kind in ('A', 'B'):
+            suffix = f'.lora_{kind}.weight'
+            if key.endswith(suffix):
+                name = key[:-len(suffix)]
+                if name.startswith('base_model.model.'):
+                    name = name[len('base_model.model.'):]
+                modules.setdefault(name, {})[kind] = tensor
+    for name, weights in modules.items():
+        rank = weights['A'].shape[0]
+        module_alpha = next((value for pattern, value in alpha_pattern.items() if name.endswith(pattern)), alpha)
+        denominator = math.sqrt(rank) if config.get('use_rslora') else rank
+        weights['scaling'] = module_alpha / denominator
+    return modules
+
+
+class _LoraBank:
+    """Стек весов всех адаптеров для одного линейного слоя; слот 0 — нулевой (без адаптера)."""
+
+    def __init__(self, module: torch.nn.Linear):
+        self.module = module
+        self.slots: Dict[int, Dict[str, torch.Tensor]] = {}
+        self.A: Optional[torch.Tensor] = None
+        self.B: Optional[torch.Tensor] = None
+        self.scaling: Optional[torch.Tensor] = None
+
+    def rebuild(self, num_slots: int) -> None:
+        if not self.slots:
+            self.A = self.B = self.scaling = None
+            return
+        weight = self.module.weight
+        rank = max(weights['A'].shape[0] for weights in self.slots.values())
+        # Ранги разных адаптеров дополняются нулями до общего — дельта от этого не меняется
+        A = torch.zeros(num_slots, rank, self.module.in_features, dtype=weight.dtype, device=weight.device)
+        B = torch.zeros(num_slots, self.module.out_features, rank, dtype=weight.dtype, device=weight.device)
+        scaling = torch.zeros(num_slots, dtype=weight.dtype, device=weight.device)
+        for slot, weights in self.slots.items():
+            r = weights['A'].shape[0]
+            A[slot, :r] = weights['A'].to(A.dtype)
+            B[slot, :, :r] = weights['B'].to(B.dtype)
+            scaling[slot] = weights['scaling']
+        self.A, self.B, self.scaling = A, B, scaling
+
+
+class MultiLoraRuntime:
+    """LoRA-адаптер на каждую строку батча при одном прямом проходе базы.
+
+    На целевые линейные слои вешаются forward-хуки: выход базового слоя
+    дополняется дельтой x·A_iᵀ·B_iᵀ·s_i, где A_i и B_i выбраны индексом
+    адаптера строки из стека весов (gather) и перемножены батчевым bmm.
+    Строки без адаптера ссылаются на нулевой слот. Хуки остаются на
+    исходных nn.Linear, поэтому совместимы с обёртками PEFT из AdapterCache,
+    если у того нет активного адаптера.
+    """
+
+    def __init__(self, model: torch.nn.Module, capacity: int = 8):
+        self.model = model
+        self.capacity = max(1, capacity)
+        self._banks: Dict[str, _LoraBank] = {}
+        self._hooks = []
+        self._adapters: "OrderedDict[str, int]" = OrderedDict()
+        self._paths: Dict[str, str] = {}
+        self._ids: Optional[torch.Tensor] = None
+
+    @property
+    def loaded(self) -> Dict[str, str]:
+        return {name: self._paths[name] for name in self._adapters}
+
+    def _resolve_module(self, name: str) -> torch.nn.Linear:
+        modules = dict(self.model.named_modules())
+        module = modules.get(name)
+        if not isinstance(module, torch.nn.Linear):
+            # Слой уже обёрнут PEFT (AdapterCache): хук вешаем на исходный base_layer
+            module = modules.get(f'{name}.base_layer')
+        if not isinstance(module, torch.nn.Linear):
+            raise ValueError(f'Слой {name} не найден или не является nn.Linear')
+        return module
+
+    def _free_slot(self) -> int:
+        used = set(self._adapters.values())
+        return next(slot for slot in range(1, self.capacity + 2) if slot not in used)
+
+    def load(self, name: str, path: str, keep: Sequence[str] = ()) -> None:
+        if name in self._adapters:
+            self._adapters.move_to_end(name)
+            return
+        if len(self._adapters) >= self.capacity:
+            victim = next((loaded for loaded in self._adapters if loaded not in keep), None)
+            if victim is None:
+                raise ValueError(f'Все {self.capacity} слотов заняты нужными адаптерами')
+            self.unload(victim)
+        weights = load_lora_weights(path)
+        slot = self._free_slot()
+        for module_name, tensors in weights.items():
+            bank = self._banks.get(module_name)
+            if bank is None:
+                module = self._resolve_module(module_name)
+                bank = _LoraBank(module)
+                self._banks[module_name] = bank
+                self._hooks.append(module.register_forward_hook(self._make_hook(bank)))
+            bank.slots[slot] = tensors
+        self._adapters[name] = slot
+        self._paths[name] = path
+        self._rebuild()
+        logger.info(f"Адаптер {name} загружен для пакетной генерации (слот {slot}, слоёв {len(weights)})")
+
+    def ensure(self, names: Sequence[str], paths: Dict[str, str]) -> None:
+        """Загружает адаптеры батча, не вытесняя ни один из них."""
+        needed = list(dict.fromkeys(names))
+        if len(needed) > self.capacity:
+            raise ValueError(f'В батче {len(needed)} адаптеров, допустимо не больше {self.capacity}')
+        for name in needed:
+            if name in self._adapters:
+                self._adapters.move_to_end(name)
+        for name in needed:
+            if name not in self._adapters:
+                if name not in paths:
+                    raise KeyError(f'Не указан путь к адаптеру {name}')
+                self.load(name, paths[name], keep=needed)
+
+    def unload(self, name: str) -> None:
+        slot = self._adapters.pop(name, None)
+        if slot is None:
+            return
+        self._paths.pop(name, None)
+        for bank in self._banks.values():
+            bank.slots.pop(slot, None)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        num_slots = max(self._adapters.values(), default=0) + 1
+        for bank in self._banks.values():
+            bank.rebuild(num_slots)
+
+    def close(self) -> None:
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        self._banks.clear()
+        self._adapters.clear()
+
+    @contextmanager
+    def use(self, adapter_names: Sequence[Optional[str]]):
+        """Назначает адаптеры строкам батча на время генерации; None — базовая модель."""
+        missing = [name for name in adapter_names if name is not None and name not in self._adapters]
+        if missing:
+            raise KeyError(f"Адаптеры не загружены: {', '.join(sorted(set(missing)))}")
+        ids = [self._adapters[name] if name is not None else 0 for name in adapter_names]
+        for name in adapter_names:
+            if name is not None:
+                self._adapters.move_to_end(name)
+        self._ids = torch.tensor(ids, dtype=torch.long) if any(ids) else None
+        try:
+            yield
+        finally:
+            self._ids = None
+
+    def _make_hook(self, bank: _LoraBank):
+        def hook(module, inputs, output):
+            ids = self._ids
+            if ids is None or bank.A is None:
+                return None
+            x = inputs[0]
+            if x.shape[0] != ids.shape[0]:
+                raise RuntimeError(f'Размер батча {x.shape[0]} не совпадает с числом адаптеров {ids.shape[0]}')
+            ids = ids.to(x.device)
+            flat = x.reshape(x.shape[0], -1, x.shape[-1]).to(bank.A.dtype)
+            down = torch.bmm(flat, bank.A.index_select(0, ids).transpose(1, 2))
+            up = torch.bmm(down, bank.B.index_select(0, ids).transpose(1, 2))
+            up = up * bank.scaling.index_select(0, ids).view(-1, 1, 1)
+            return output + up.reshape(output.shape).to(output.dtype)
+        return hook
+
+    def describe(self) -> Dict[str, List[str]]:
+        return {'loaded': list(self._adapters), 'capacity': self.capacity, 'layers': len(self._banks)}
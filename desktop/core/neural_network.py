@@ -1,35 +1,232 @@
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
 from desktop.config.settings import Settings
 from desktop.core.model_manager import ModelManager
+from desktop.core.model_worker import RemoteModelManager
+from desktop.core.response_cache import ResponseCache
+from desktop.core.semantic_cache import SemanticCache, PromptEmbedder, NUMPY_AVAILABLE
+from desktop.utils.logger import get_logger
+from desktop.utils.metrics import get_metrics_collector
+
+logger = get_logger('desktop.core.neural_network')
 
 
 class NeuralNetwork:
     def __init__(self, settings: Optional[Settings] = None):
         self.settings = settings or Settings()
+        self.response_cache: Optional[ResponseCache] = None
+        self.semantic_cache: Optional[SemanticCache] = None
+        self.prompt_embedder: Optional[PromptEmbedder] = None
+        self.allow_sampled_cache = False
+        self.last_timings: Dict[str, float] = {}
+        self.user_adapter: Optional[str] = None
         self._init_model_manager()
+        self._init_response_cache()
 
     def _init_model_manager(self):
-        self.model_manager = ModelManager(
+        runtime_config = dict(self.settings.get_runtime_config())
+        # Адаптер применяется сразу после загрузки базы, в том числе в процессе модели
+        runtime_config['adapter'] = self._active_adapter()
+        manager_class = RemoteModelManager if runtime_config.get('out_of_process') else ModelManager
+        self.model_manager = manager_class(
             model_path=self.settings.get_model_path(),
-            generation_params=self.settings.get_generation_config()
+            generation_params=self.settings.get_generation_config(),
+            runtime_config=runtime_config,
+            on_runtime_tuned=lambda tuned: self.settings.update_runtime_config(tuned, immediate=True)
+        )
+
+    def _active_adapter(self) -> Optional[Dict[str, Any]]:
+        adapters = self.settings.get_adapter_config()
+        name = adapters.get('active')
+        if name is None:
+            return None
+        path = adapters['available'].get(name)
+        if not path:
+            logger.warning(f"Адаптер {name} не зарегистрирован в настройках")
+            return None
+        return {'name': name, 'path': path, 'merge': adapters.get('merge', False)}
+
+    def _apply_adapter(self) -> bool:
+        adapter = self._active_adapter()
+        current = self.model_manager.get_metadata().get('adapters') or {}
+        if adapter is None:
+            if current.get('active') is None:
+                return True
+            return self.model_manager.set_adapter(None)
+        if current.get('active') == adapter['name'] and bool(current.get('merged')) == bool(adapter['merge']):
+            return True
+        return self.model_manager.set_adapter(**adapter)
+
+    def set_user_adapter(self, name: Optional[str]) -> None:
+        """Адаптер текущего пользователя (UserRepository.resolve_adapter); None — общий адаптер из настроек."""
+        if name is not None and name not in self.settings.get_adapter_config()['available']:
+            logger.warning(f"Адаптер пользователя {name} не зарегистрирован в настройках")
+            name = None
+        self.user_adapter = name
+
+    def _request_adapter(self) -> Optional[str]:
+        # Адаптер пользователя, отличный от общего, идёт через MultiLoraRuntime без переключения базы
+        if self.user_adapter is None or self.user_adapter == self.settings.get_adapter_config().get('active'):
+            return None
+        return self.user_adapter
+
+    def _shutdown_model_manager(self):
+        shutdown = getattr(getattr(self, 'model_manager', None), 'shutdown', None)
+        if shutdown:
+            shutdown()
+
+    def _init_response_cache(self):
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
+            self.semantic_cache = None
+            self.prompt_embedder = None
+        cache_cfg = self.settings.get_cache_config()
+        # Читается здесь, а не на каждый запрос: get_cache_config сохраняет настройки через QTimer,
+        # а запросы идут из ResponseThread
+        self.allow_sampled_cache = cache_cfg.get('allow_sampled', False)
+        if not cache_cfg.get('enabled'):
+            return
+        self.response_cache = ResponseCache(
+            db_path=cache_cfg.get('path'),
+            memory_items=cache_cfg.get('memory_items', 256),
+            ttl_seconds=cache_cfg.get('ttl_seconds', 86400),
+            max_entries=cache_cfg.get('max_entries', 5000),
+            max_size_mb=cache_cfg.get('max_size_mb', 64)
         )
+        logger.info("Кэш ответов включён")
+        if cache_cfg.get('semantic_enabled'):
+            self._init_semantic_cache(cache_cfg)
+
+    def _init_semantic_cache(self, cache_cfg: Dict[str, Any]):
+        if not NUMPY_AVAILABLE:
+            logger.warning("Семантический кэш отключён: numpy недоступен")
+            return
+        self.semantic_cache = SemanticCache(
+            threshold=cache_cfg.get('semantic_threshold', 0.92),
+            max_entries=cache_cfg.get('semantic_max_entries', 2000),
+            path=cache_cfg.get('semantic_path')
+        )
+        self.prompt_embedder = PromptEmbedder(
+            fallback=self.model_manager.embed,
+            encoder_path=cache_cfg.get('semantic_encoder_path') or None
+        )
+        logger.info(f"Семантический кэш включён (порог {self.semantic_cache.threshold})")
 
     def _build_prompt(self, user_input: str) -> str:
         system_prompt = self.settings.get_prompt().strip()
         return f'{system_prompt}\nПользователь: {user_input}\nАссистент:'
 
-    def generate_response(self, user_input: str) -> str:
+    def _cache_keys(self, user_input: str) -> Tuple[Optional[str], Optional[str]]:
+        if self.response_cache is None:
+            return None, None
+        fingerprint = self.model_manager.get_fingerprint()
+        if fingerprint is None:
+            return None, None
+        params = dict(self.model_manager.generation_params)
+        if params.get('do_sample', True) and not self.allow_sampled_cache:
+            return None, None
+        system_prompt = self.settings.get_prompt()
+        adapter = self._request_adapter()
+        if adapter is not None:
+            fingerprint = f'{fingerprint}|user-adapter:{adapter}'
+        key = ResponseCache.make_key(user_input, system_prompt, params, fingerprint)
+        context = ResponseCache.make_key('', system_prompt, params, fingerprint)
+        return key, context
+
+    def generate_response(self, user_input: str, on_token: Optional[Callable[[str], None]] = None,
+                          stop_event: Optional[threading.Event] = None) -> str:
+        """Ответ на запрос; on_token получает фрагменты по мере генерации (кроме ответов из кэша).
+
+        stop_event создаёт вызывающий вместе с запросом, чтобы отмена, пришедшая
+        до начала генерации, не терялась.
+        """
+        self.last_timings = {}
+        cache_key, context = self._cache_keys(user_input)
+        embedding = None
+        if cache_key is not None:
+            metrics = get_metrics_collector()
+            cached, tier = self.response_cache.get(cache_key)
+            if cached is not None:
+                metrics.record_cache_hit(tier)
+                logger.debug(f"Ответ взят из кэша ({tier})")
+                return cached
+            if self.semantic_cache is not None:
+                embedding = self.prompt_embedder.embed(ResponseCache.normalize_prompt(user_input))
+                if embedding is not None:
+                    cached, similarity = self.semantic_cache.lookup(embedding, context)
+                    if cached is not None:
+                        metrics.record_cache_hit('semantic')
+                        logger.debug(f"Ответ взят из семантического кэша (похожесть {similarity:.3f})")
+                        self.response_cache.put(cache_key, cached)
+                        return cached
+            metrics.record_cache_miss()
+
+        started = time.perf_counter()
         prompt = self._build_prompt(user_input)
-        return self.model_manager.generate(prompt)
+        prompt_build = time.perf_counter() - started
+        # Адаптер пользователя включается только на этот запрос; стриминг, отмена и стадии те же
+        adapter = self._request_adapter()
+        available = self.settings.get_adapter_config()['available']
+        adapter_paths = {adapter: available[adapter]} if adapter in available else {}
+        response = self.model_manager.generate(prompt, stop_event=stop_event, on_token=on_token,
+                                               adapter=adapter, adapter_paths=adapter_paths)
+        self.last_timings = {'prompt_build': prompt_build, **self.model_manager.last_generation_timings}
+        if cache_key is not None and not self.model_manager.last_generation_error:
+            self.response_cache.put(cache_key, response)
+            if embedding is not None:
+                self.semantic_cache.add(embedding, context, user_input, response)
+        return response
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        stats = get_metrics_collector().get_cache_stats()
+        stats['enabled'] = self.response_cache is not None
+        stats['semantic_enabled'] = self.semantic_cache is not None
+        if self.response_cache is not None:
+            stats.update(self.response_cache.stats())
+        if self.semantic_cache is not None:
+            stats.update(self.semantic_cache.stats())
+        return stats
+
+    def clear_response_cache(self):
+        if self.response_cache is not None:
+            self.response_cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+
+    def cancel_generation(self):
+        self.model_manager.cancel()
+
+    def shutdown(self):
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        self._shutdown_model_manager()
 
     def refresh_from_settings(self):
         self.settings.reload()
         self.model_manager.update_generation_params(self.settings.get_generation_config())
+        self._apply_adapter()
+        self._init_response_cache()
 
     def reload_model(self):
         self.settings.reload()
+        self._shutdown_model_manager()
         self._init_model_manager()
+        self._init_response_cache()
+
+    def switch_adapter(self, name: Optional[str], merge: Optional[bool] = None) -> bool:
+        """Переключает LoRA-адаптер без перезагрузки базовой модели."""
+        data: Dict[str, Any] = {'active': name}
+        if merge is not None:
+            data['merge'] = merge
+        self.settings.update_adapter_config(data)
+        return self._apply_adapter()
 
     def update_prompt(self, prompt: str):
         self.settings.set_prompt(prompt)
@@ -0,0 +1,124 @@
+from typing import List
+
+import torch
+import torch.distributed as dist
+from torch import nn
+
+from desktop.core.parallel.tensor_parallel import load_shard_weights
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.parallel.expert_parallel')
+
+
+def expert_range(num_experts: int, rank: int, world_size: int) -> range:
+    if num_experts % world_size:
+        raise ValueError(f'Число экспертов {num_experts} не делится на число процессов {world_size}')
+    per_rank = num_experts // world_size
+    return range(rank * per_rank, (rank + 1) * per_rank)
+
+
+class ExpertParallelMoE(nn.Module):
+    """DeepseekMoE, у которого процесс хранит только свою долю экспертов.
+
+    Каждый процесс обрабатывает свои токены: после роутера пары
+    (токен, эксперт) отправляются владельцу эксперта через all_to_all,
+    результаты возвращаются тем же путём. Общие эксперты считаются
+    локально, пока токены в пути. Только для инференса.
+    """
+
+    def __init__(self, moe: nn.Module, rank: int, world_size: int):
+        super().__init__()
+        self.config = moe.config
+        self.gate = moe.gate
+        self.top_k = moe.num_experts_per_tok
+        self.num_experts = len(moe.experts)
+        self.rank = rank
+        self.world_size = world_size
+        self.local_range = expert_range(self.num_experts, rank, world_size)
+        self.experts_per_rank = len(self.local_range)
+        # ModuleDict с глобальными номерами сохраняет имена параметров чекпоинта: experts.<i>.*
+        self.experts = nn.ModuleDict({str(i): moe.experts[i] for i in self.local_range})
+        self.shared_experts = getattr(moe, 'shared_experts', None)
+
+    def _run_local_experts(self, tokens: torch.Tensor, expert_ids: torch.Tensor) -> torch.Tensor:
+        output = torch.empty_like(tokens)
+        if not tokens.shape[0]:
+            return output
+        order = expert_ids.argsort()
+        counts = torch.bincount(expert_ids - self.local_range.start, minlength=self.experts_per_rank).tolist()
+        start = 0
+        for offset, count in enumerate(counts):
+            if not count:
+                continue
+            rows = order[start:start + count]
+            output[rows] = self.experts[str(self.local_range.start + offset)](tokens[rows])
+            start += count
+        return output
+
+    @torch.no_grad()
+    def forward(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        orig_shape = hidden_states.shape
+        topk_idx, topk_weight, _ = self.gate(hidden_states)
+        x = hidden_states.reshape(-1, orig_shape[-1])
+
+        flat_idx = topk_idx.reshape(-1)
+        token_idx = torch.arange(x.shape[0], device=x.device).repeat_interleave(self.top_k)
+        owner = flat_idx // self.experts_per_rank
+        order = owner.argsort(stable=True)
+        send_counts = torch.bincount(owner, minlength=self.world_size)
+        send_tokens = x[token_idx[order]].contiguous()
+        send_experts = flat_idx[order].contiguous()
+
+        recv_counts = torch.empty_like(send_counts)
+        dist.all_to_all_single(recv_counts, send_counts)
+        send_splits: List[int] = send_counts.tolist()
+        recv_splits: List[int] = recv_counts.tolist()
+
+        recv_tokens = x.new_empty((sum(recv_splits), x.shape[-1]))
+        recv_experts = flat_idx.new_empty((sum(recv_splits),))
+        token_work = dist.all_to_all_single(recv_tokens, send_tokens, recv_splits, send_splits, async_op=True)
+        expert_work = dist.all_to_all_single(recv_experts, send_experts, recv_splits, send_splits, async_op=True)
+
+        shared = self.shared_experts(hidden_states) if self.shared_experts is not None else None
+
+        token_work.wait()
+        expert_work.wait()
+        local_output = self._run_local_experts(recv_tokens, recv_experts)
+
+        returned = torch.empty_like(send_tokens)
+        dist.all_to_all_single(returned, local_output, send_splits, recv_splits)
+        weights = topk_weight.reshape(-1)[order].unsqueeze(-1).to(returned.dtype)
+        y = torch.zeros_like(x).index_add_(0, token_idx[order], returned * weights)
+        y = y.view(*orig_shape)
+        if shared is not None:
+            y = y + shared
+        return y
+
+
+def convert_to_expert_parallel(model: nn.Module, rank: int, world_size: int) -> nn.Module:
+    """Заменяет MoE-блоки модели на ExpertParallelMoE; остальное реплицируется."""
+    converted = 0
+    for layer in model.model.layers:
+        if hasattr(layer.mlp, 'experts') and hasattr(layer.mlp, 'gate'):
+            layer.mlp = ExpertParallelMoE(layer.mlp, rank, world_size)
+            converted += 1
+    model.parallel = {'mode': 'expert', 'rank': rank, 'world_size': world_size}
+    logger.info(f"Процесс {rank}: {converted} MoE-слоёв, эксперты {list(expert_range(model.config.n_routed_experts, rank, world_size))}")
+    return model
+
+
+def load_expert_parallel_model(model_path: str, rank: int, world_size: int,
+                               dtype: torch.dtype = torch.bfloat16):
+    """Собирает модель на meta-устройстве и читает только свои эксперты."""
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=dtype)
+    convert_to_expert_parallel(model, rank, world_size)
+    load_shard_weights(model, model_path, rank, world_size, dtype, rule=lambda name: None)
+    if config.tie_word_embeddings:
+        model.tie_weights()
+    model.eval()
+    return model
@@ -0,0 +1,205 @@
+import time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import torch
+import torch.distributed as dist
+from torch import nn
+
+from desktop.core.parallel.tensor_parallel import load_shard_weights
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.parallel.pipeline')
+
+
+def profile_layer_times(model: nn.Module, input_ids: torch.Tensor, repeats: int = 3) -> List[float]:
+    """Среднее время прямого прохода каждого декодер-слоя на полном промпте."""
+    layers = model.model.layers
+    totals = [0.0] * len(layers)
+    starts: Dict[int, float] = {}
+    handles = []
+    for index, layer in enumerate(layers):
+        handles.append(layer.register_forward_pre_hook(lambda module, args, index=index: starts.__setitem__(index, time.perf_counter())))
+        handles.append(layer.register_forward_hook(
+            lambda module, args, output, index=index: totals.__setitem__(index, totals[index] + time.perf_counter() - starts[index])
+        ))
+    try:
+        with torch.no_grad():
+            model(input_ids=input_ids, use_cache=False)
+            totals[:] = [0.0] * len(layers)
+            for _ in range(repeats):
+                model(input_ids=input_ids, use_cache=False)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return [total / repeats for total in totals]
+
+
+def prune_to_stage(model: nn.Module, start: int, end: int, is_first: bool, is_last: bool) -> nn.Module:
+    """Оставляет в модели только слои стадии [start, end).
+
+    Чужие слои заменяются пустыми модулями, чтобы имена параметров совпадали
+    с чекпоинтом. Слоям стадии выдаются локальные номера для KV-кэша.
+    """
+    layers = model.model.layers
+    for index in range(len(layers)):
+        if not start <= index < end:
+            layers[index] = nn.Module()
+    for local_index, index in enumerate(range(start, end)):
+        layers[index].self_attn.layer_idx = local_index
+    tied = getattr(model.config, 'tie_word_embeddings', False)
+    if not is_first and not (tied and is_last):
+        model.model.embed_tokens = None
+    if not is_last:
+        model.lm_head = None
+    model.parallel = {'mode': 'pipeline', 'layers': (start, end)}
+    return model
+
+
+class PipelineStage:
+    """Одна стадия конвейера: свои слои декодера плюс эмбеддинги или lm_head на краях."""
+
+    def __init__(self, model: nn.Module, rank: int, bounds: Sequence[Tuple[int, int]]):
+        self.rank = rank
+        self.num_stages = len(bounds)
+        self.start, self.end = bounds[rank]
+        self.is_first = rank == 0
+        self.is_last = rank == self.num_stages - 1
+        self.decoder = model.model
+        self.lm_head = model.lm_head
+        self.layers = [self.decoder.layers[index] for index in range(self.start, self.end)]
+        self.hidden_size = model.config.hidden_size
+        self.dtype = next(self.layers[0].parameters()).dtype
+        self._sends: list = []
+
+    def _send(self, tensor: torch.Tensor, dst: int) -> None:
+        self._sends = [work for work in self._sends if not work.is_completed()]
+        self._sends.append(dist.isend(tensor.contiguous(), dst))
+
+    def _run_layers(self, hidden: torch.Tensor, attention_mask: torch.Tensor, cache) -> torch.Tensor:
+        seq_len = hidden.shape[1]
+        past = cache.get_seq_length()
+        cache_position = torch.arange(past, past + seq_len, device=hidden.device)
+        position_ids = attention_mask.long().cumsum(-1) - 1
+        position_ids = position_ids.masked_fill(attention_mask == 0, 1)[:, -seq_len:]
+        causal_mask = self.decoder._update_causal_mask(attention_mask, hidden, cache_position, cache, False)
+        position_embeddings = self.decoder.rotary_emb(hidden, position_ids)
+        for layer in self.layers:
+            hidden = layer(
+                hidden,
+                attention_mask=causal_mask,
+                position_ids=position_ids,
+                past_key_value=cache,
+                use_cache=True,
+                cache_position=cache_position,
+                position_embeddings=position_embeddings,
+            )[0]
+        return hidden
+
+    def _next_tokens(self, hidden: torch.Tensor, temperature: float) -> torch.Tensor:
+        logits = self.lm_head(self.decoder.norm(hidden[:, -1:, :]))[:, -1, :].float()
+        if temperature > 0:
+            probs = torch.softmax(logits / temperature, dim=-1)
+            return torch.multinomial(probs, 1)
+        return logits.argmax(dim=-1, keepdim=True)
+
+    @torch.no_grad()
+    def generate(self, micro_batches: List[Dict[str, torch.Tensor]], max_new_tokens: int,
+                 temperature: float = 0.0) -> Optional[List[torch.Tensor]]:
+        """Генерирует для всех микробатчей; результат (новые токены) есть только у последней стадии.
+
+        Расписание одинаково на всех стадиях: шаг за шагом, внутри шага —
+        микробатчи по кругу. Пока стадия считает микробатч m, следующая
+        считает m-1, поэтому при числе микробатчей не меньше числа стадий
+        конвейер не простаивает.
+        """
+        from transformers.cache_utils import DynamicCache
+
+        states = [{
+            'mask': batch['attention_mask'].clone(),
+            'cache': DynamicCache(),
+            'tokens': None,
+            'generated': [],
+        } for batch in micro_batches]
+        last_rank = self.num_stages - 1
+
+        for step in range(max_new_tokens):
+            for index, batch in enumerate(micro_batches):
+                state = states[index]
+                batch_size = batch['input_ids'].shape[0]
+                if step > 0:
+                    state['mask'] = torch.cat([state['mask'], state['mask'].new_ones((batch_size, 1))], dim=1)
+                seq_len = batch['input_ids'].shape[1] if step == 0 else 1
+
+                if self.is_first:
+                    if step == 0:
+                        ids = batch['input_ids']
+                    elif self.is_last:
+                        ids = state['tokens']
+                    else:
+                        ids = torch.empty((batch_size, 1), dtype=torch.long)
+                        dist.recv(ids, src=last_rank)
+                    hidden = self.decoder.embed_tokens(ids)
+                else:
+                    hidden = torch.empty((batch_size, seq_len, self.hidden_size), dtype=self.dtype)
+                    dist.recv(hidden, src=self.rank - 1)
+
+                hidden = self._run_layers(hidden, state['mask'], state['cache'])
+
+                if not self.is_last:
+                    self._send(hidden, self.rank + 1)
+                    continue
+                tokens = self._next_tokens(hidden, temperature)
+                state['generated'].append(tokens)
+                state['tokens'] = tokens
+                if step < max_new_tokens - 1 and not self.is_first:
+                    self._send(tokens, 0)
+
+        for work in self._sends:
+            work.wait()
+        self._sends = []
+        if not self.is_last:
+            return None
+        return [torch.cat(state['generated'], dim=1) for state in states]
+
+
+def build_micro_batches(tokenizer, prompts: List[str], micro_batch_size: int) -> Tuple[List[Dict[str, torch.Tensor]], List[List[int]]]:
+    """Микробатчи с левым паддингом; промпты сортируются по длине, чтобы меньше паддить.
+
+    Возвращает микробатчи и индексы исходных промптов в каждом из них.
+    """
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    lengths = [len(tokenizer(prompt).input_ids) for prompt in prompts]
+    order = sorted(range(len(prompts)), key=lambda index: lengths[index])
+    batches, indices = [], []
+    for offset in range(0, len(order), micro_batch_size):
+        chunk = order[offset:offset + micro_batch_size]
+        encoded = tokenizer([prompts[index] for index in chunk], return_tensors='pt', padding=True)
+        batches.append({'input_ids': encoded.input_ids, 'attention_mask': encoded.attention_mask})
+        indices.append(chunk)
+    return batches, indices
+
+
+def load_pipeline_stage(model_path: str, rank: int, bounds: Sequence[Tuple[int, int]],
+                        dtype: torch.dtype = torch.bfloat16) -> PipelineStage:
+    """Собирает на meta-устройстве модель и читает с диска только веса своей стадии."""
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=dtype)
+    start, end = bounds[rank]
+    prune_to_stage(model, start, end, rank == 0, rank == len(bounds) - 1)
+    load_shard_weights(model, model_path, rank, len(bounds), dtype, rule=lambda name: None)
+    model.eval()
+    logger.info(f"Стадия {rank}: слои {start}-{end - 1}")
+    return PipelineStage(model, rank, bounds)
+
+
+def describe_bounds(bounds: Sequence[Tuple[int, int]], costs: Sequence[float]) -> List[Dict[str, Any]]:
+    return [
+        {'stage': stage, 'layers': [start, end - 1], 'cost': float(sum(costs[start:end]))}
+        for stage, (start, end) in enumerate(bounds)
+    ]
@@ -0,0 +1,72 @@
+from typing import List, Sequence, Tuple
+
+
+def estimate_layer_costs(config) -> Tuple[List[float], float, float]:
+    """Оценка стоимости слоёв в умножениях на токен по конфигурации.
+
+    Возвращает (стоимости слоёв, добавка первой стадии за эмбеддинги,
+    добавка последней стадии за lm_head). Первые first_k_dense_replace
+    слоёв — плотные MLP, остальные — MoE с top-k и общими экспертами.
+    """
+    hidden = config.hidden_size
+    head_dim = getattr(config, 'head_dim', None) or hidden // config.num_attention_heads
+    attention = hidden * head_dim * (2 * config.num_attention_heads + 2 * config.num_key_value_heads)
+    dense_mlp = 3 * hidden * config.intermediate_size
+    costs = []
+    for layer_idx in range(config.num_hidden_layers):
+        is_moe = (
+            config.n_routed_experts is not None
+            and layer_idx >= config.first_k_dense_replace
+            and layer_idx % config.moe_layer_freq == 0
+        )
+        if is_moe:
+            active = config.num_experts_per_tok + (config.n_shared_experts or 0)
+            mlp = 3 * hidden * config.moe_intermediate_size * active + hidden * config.n_routed_experts
+        else:
+            mlp = dense_mlp
+        costs.append(float(attention + mlp))
+    return costs, float(hidden), float(hidden * config.vocab_size)
+
+
+def balance_stages(layer_costs: Sequence[float], num_stages: int,
+                   first_extra: float = 0.0, last_extra: float = 0.0) -> List[Tuple[int, int]]:
+    """Делит слои на num_stages непрерывных стадий с минимальной самой медленной стадией.
+
+    Стоимости — измеренное время слоёв или оценка estimate_layer_costs.
+    Возвращает границы [start, end) для каждой стадии.
+    """
+    n = len(layer_costs)
+    if not 1 <= num_stages <= n:
+        raise ValueError(f'Число стадий {num_stages} должно быть от 1 до числа слоёв {n}')
+    prefix = [0.0]
+    for cost in layer_costs:
+        prefix.append(prefix[-1] + float(cost))
+
+    def stage_cost(start: int, end: int, stage: int) -> float:
+        cost = prefix[end] - prefix[start]
+        if stage == 0:
+            cost += first_extra
+        if stage == num_stages - 1:
+            cost += last_extra
+        return cost
+
+    inf = float('inf')
+    # best[s][j] — минимальная максимальная стоимость, если первые j слоёв разбиты на s стадий
+    best = [[inf] * (n + 1) for _ in range(num_stages + 1)]
+    split = [[0] * (n + 1) for _ in range(num_stages + 1)]
+    best[0][0] = 0.0
+    for stages in range(1, num_stages + 1):
+        for end in range(stages, n - (num_stages - stages) + 1):
+            for start in range(stages - 1, end):
+                candidate = max(best[stages - 1][start], stage_cost(start, end, stages - 1))
+                if candidate < best[stages][end]:
+                    best[stages][end] = candidate
+                    split[stages][end] = start
+
+    bounds = []
+    end = n
+    for stages in range(num_stages, 0, -1):
+        start = split[stages][end]
+        bounds.append((start, end))
+        end = start
+    return list(reversed(bounds))
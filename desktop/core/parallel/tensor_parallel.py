@@ -0,0 +1,184 @@
+import json
+import os
+import re
+from typing import Dict, Any, Optional, Tuple, Callable
+
+import torch
+import torch.distributed as dist
+from torch import nn
+
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.parallel.tensor_parallel')
+
+# Megatron-схема: q/k/v, gate/up режутся по выходам, o/down — по входам;
+# после o_proj и после всего MLP/MoE-блока частичные суммы складываются all_reduce
+COLUMN_PATTERN = re.compile(r'\.(q_proj|k_proj|v_proj|gate_proj|up_proj)\.(weight|bias)$')
+ROW_PATTERN = re.compile(r'\.(o_proj|down_proj)\.weight$')
+
+
+def init_process_group(rank: int, world_size: int, init_method: Optional[str] = None,
+                       backend: str = 'gloo') -> None:
+    """Инициализирует группу процессов; по умолчанию адрес берётся из MASTER_ADDR/MASTER_PORT."""
+    if dist.is_initialized():
+        return
+    dist.init_process_group(
+        backend=backend,
+        init_method=init_method or 'env://',
+        rank=rank,
+        world_size=world_size
+    )
+    logger.info(f"Процесс {rank}/{world_size} подключён к группе ({backend})")
+
+
+def check_divisible(config, world_size: int) -> None:
+    sizes = {
+        'num_attention_heads': config.num_attention_heads,
+        'num_key_value_heads': config.num_key_value_heads,
+        'intermediate_size': config.intermediate_size,
+    }
+    if config.n_routed_experts:
+        sizes['moe_intermediate_size'] = config.moe_intermediate_size
+    bad = [f'{name}={value}' for name, value in sizes.items() if value % world_size]
+    if bad:
+        raise ValueError(f'Размеры модели не делятся на число процессов {world_size}: {", ".join(bad)}')
+
+
+def shard_rule(name: str) -> Optional[int]:
+    """Измерение, по которому режется параметр, или None для реплицируемых."""
+    if COLUMN_PATTERN.search(name):
+        return 0
+    if ROW_PATTERN.search(name):
+        return 1
+    return None
+
+
+def shard_range(size: int, rank: int, world_size: int) -> Tuple[int, int]:
+    part = size // world_size
+    return rank * part, (rank + 1) * part
+
+
+def _all_reduce_output(module, inputs, output):
+    hidden = output[0] if isinstance(output, tuple) else output
+    dist.all_reduce(hidden)
+    return output
+
+
+def _shard_parameter(module: nn.Module, param_name: str, dim: int, rank: int, world_size: int) -> None:
+    param = getattr(module, param_name)
+    start, end = shard_range(param.shape[dim], rank, world_size)
+    shard = param.detach().narrow(dim, start, end - start).clone()
+    setattr(module, param_name, nn.Parameter(shard, requires_grad=False))
+
+
+def shard_model(model: nn.Module, rank: int, world_size: int) -> nn.Module:
+    """Оставляет в модели долю весов текущего процесса.
+
+    Работает и с материализованными весами, и с модулями на meta-устройстве
+    (тогда веса потом подгружаются load_shard_weights). Внимание делится по
+    головам, MLP и эксперты — по промежуточному измерению; роутер, нормы,
+    эмбеддинги и lm_head реплицируются.
+    """
+    check_divisible(model.config, world_size)
+    for name, module in model.named_modules():
+        if not isinstance(module, nn.Linear):
+            continue
+        dim = shard_rule(f'{name}.weight')
+        if dim is None:
+            continue
+        _shard_parameter(module, 'weight', dim, rank, world_size)
+        if module.bias is not None:
+            if dim == 0:
+                _shard_parameter(module, 'bias', 0, rank, world_size)
+            elif rank != 0:
+                # Смещение row-слоя добавляется один раз — после all_reduce оно войдёт в сумму от rank 0
+                module.bias = nn.Parameter(torch.zeros_like(module.bias), requires_grad=False)
+        module.in_features = module.weight.shape[1]
+        module.out_features = module.weight.shape[0]
+
+    for layer in model.model.layers:
+        attention = layer.self_attn
+        attention.num_heads //= world_size
+        attention.num_key_value_heads //= world_size
+        attention.register_forward_hook(_all_reduce_output)
+        # Один all_reduce на весь MLP/MoE: взвешенная сумма экспертов линейна по частичным суммам
+        layer.mlp.register_forward_hook(_all_reduce_output)
+    model.parallel = {'mode': 'tensor', 'rank': rank, 'world_size': world_size}
+    logger.info(f"Модель разрезана: процесс {rank} из {world_size}")
+    return model
+
+
+def _weight_files(model_path: str) -> Dict[str, str]:
+    index_path = os.path.join(model_path, 'model.safetensors.index.json')
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            weight_map = json.load(f)['weight_map']
+        return {name: os.path.join(model_path, file) for name, file in weight_map.items()}
+    single = os.path.join(model_path, 'model.safetensors')
+    from safetensors import safe_open
+    with safe_open(single, framework='pt') as f:
+        return {name: single for name in f.keys()}
+
+
+def load_shard_weights(model: nn.Module, model_path: str, rank: int, world_size: int,
+                       dtype: torch.dtype, rule: Callable[[str], Optional[int]] = shard_rule) -> None:
+    """Читает из safetensors только свою долю каждого тензора.
+
+    Тензоры, которых нет в модели (чужие эксперты), не читаются вовсе.
+    """
+    from safetensors import safe_open
+
+    files = _weight_files(model_path)
+    by_file: Dict[str, list] = {}
+    for name, file in files.items():
+        by_file.setdefault(file, []).append(name)
+
+    params = dict(model.named_parameters())
+    loaded = 0
+    for file, names in by_file.items():
+        with safe_open(file, framework='pt') as f:
+            for name in names:
+                if name not in params:
+                    continue
+                tensor_slice = f.get_slice(name)
+                dim = rule(name)
+                if dim is None:
+                    tensor = tensor_slice[:]
+                else:
+                    start, end = shard_range(tensor_slice.get_shape()[dim], rank, world_size)
+                    tensor = tensor_slice[start:end] if dim == 0 else tensor_slice[:, start:end]
+                module_name, _, param_name = name.rpartition('.')
+                module = model.get_submodule(module_name)
+                setattr(module, param_name, nn.Parameter(tensor.to(dtype), requires_grad=False))
+                loaded += 1
+    missing = [name for name, param in model.named_parameters() if param.device.type == 'meta']
+    if missing:
+        raise RuntimeError(f'Веса не найдены в чекпоинте: {", ".join(missing[:5])}')
+    logger.info(f"Процесс {rank}: загружено {loaded} тензоров")
+
+
+def load_tensor_parallel_model(model_path: str, rank: int, world_size: int,
+                               dtype: torch.dtype = torch.bfloat16):
+    """Собирает модель на meta-устройстве, режет её и подгружает свою долю весов.
+
+    Каждый процесс держит в памяти только 1/world_size весов внимания и MLP,
+    поэтому процессы на разных сокетах читают каждый свою память.
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=dtype)
+    shard_model(model, rank, world_size)
+    load_shard_weights(model, model_path, rank, world_size, dtype)
+    if config.tie_word_embeddings:
+        model.tie_weights()
+    model.eval()
+    return model
+
+
+def describe(model: nn.Module) -> Dict[str, Any]:
+    info = dict(getattr(model, 'parallel', {}) or {})
+    info['parameters'] = sum(param.numel() for param in model.parameters())
+    return info
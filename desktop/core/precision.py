@@ -0,0 +1,126 @@
+import json
+import os
+from typing import Dict, Any, Optional, Set, Tuple
+
+from desktop.utils.logger import get_logger
+
+try:
+    import torch
+    import torch.nn.functional as F
+    TORCH_AVAILABLE = True
+except (ImportError, OSError):
+    torch = None
+    F = None
+    TORCH_AVAILABLE = False
+
+logger = get_logger('desktop.core.precision')
+
+COMPUTE_DTYPE_CHOICES = ('auto', 'bfloat16', 'float16', 'float32', 'mixed')
+BF16_CPU_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+
+def detect_cpu_flags() -> Set[str]:
+    """Флаги набора инструкций CPU.
+
+    На Linux читается /proc/cpuinfo; на остальных системах берётся
+    уровень, с которым torch собрал ядра (AVX2/AVX512), в нижнем регистре.
+    """
+    flags: Set[str] = set()
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    flags.update(line.split(':', 1)[1].split())
+                    break
+    except OSError:
+        pass
+    if TORCH_AVAILABLE:
+        try:
+            capability = torch.backends.cpu.get_cpu_capability()
+            if capability:
+                flags.add(capability.lower())
+        except AttributeError:
+            pass
+    return flags
+
+
+def cpu_supports_bf16(flags: Optional[Set[str]] = None) -> bool:
+    flags = detect_cpu_flags() if flags is None else flags
+    return any(flag in flags for flag in BF16_CPU_FLAGS)
+
+
+def checkpoint_dtype(model_path: str) -> Optional[str]:
+    """Тип весов, в котором сохранён чекпоинт (torch_dtype из config.json)."""
+    try:
+        with open(os.path.join(model_path, 'config.json'), 'r', encoding='utf-8') as f:
+            return json.load(f).get('torch_dtype')
+    except (OSError, ValueError):
+        return None
+
+
+def select_dtypes(override: Optional[str] = 'auto', device_type: str = 'cpu',
+                  model_path: Optional[str] = None,
+                  flags: Optional[Set[str]] = None) -> Tuple[str, str]:
+    """Возвращает (тип хранения весов, тип вычислений) строками.
+
+    На GPU остаётся float16. На CPU с AVX512-BF16/AMX веса и вычисления
+    идут в bfloat16; без них веса хранятся в 16 битах, а матричные
+    умножения выполняются в float32 — fp16/bf16 matmul на таких CPU
+    медленнее fp32.
+    """
+    override = (override or 'auto').lower()
+    if override not in COMPUTE_DTYPE_CHOICES:
+        logger.warning(f"Неизвестный тип вычислений '{override}', используется auto")
+        override = 'auto'
+
+    if override in ('bfloat16', 'float16', 'float32'):
+        return override, override
+
+    # Хранение: формат чекпоинта, если он 16-битный, иначе bfloat16 (без потерь расширяется до fp32)
+    stored = checkpoint_dtype(model_path) if model_path else None
+    storage = stored if stored in ('bfloat16', 'float16') else 'bfloat16'
+
+    if override == 'mixed':
+        return storage, 'float32'
+    if device_type == 'cuda':
+        return 'float16', 'float16'
+    if cpu_supports_bf16(flags):
+        return 'bfloat16', 'bfloat16'
+    return storage, 'float32'
+
+
+def to_torch_dtype(name: str):
+    return getattr(torch, name)
+
+
+def _upcast_forward(module, compute_dtype):
+    def forward(input):
+        weight = module.weight.to(compute_dtype)
+        bias = module.bias.to(compute_dtype) if module.bias is not None else None
+        return F.linear(input.to(compute_dtype), weight, bias).to(input.dtype)
+    return forward
+
+
+def enable_upcast_compute(model, compute_dtype: str = 'float32') -> int:
+    """Переводит умножения nn.Linear в compute_dtype, не трогая хранение весов.
+
+    Веса расширяются на время вызова, результат возвращается в тип
+    активаций, поэтому остальная модель работает без изменений.
+    Возвращает число пропатченных слоёв.
+    """
+    target = to_torch_dtype(compute_dtype)
+    patched = 0
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and module.weight.dtype != target:
+            module.forward = _upcast_forward(module, target)
+            patched += 1
+    return patched
+
+
+def apply_compute_dtype(model, storage_dtype: str, compute_dtype: str) -> Dict[str, Any]:
+    """Применяет выбранную схему точности к загруженной модели."""
+    patched = 0
+    if compute_dtype != storage_dtype:
+        patched = enable_upcast_compute(model, compute_dtype)
+    logger.info(f"Точность: хранение {storage_dtype}, вычисления {compute_dtype}, слоёв с расширением: {patched}")
+    return {'storage_dtype': storage_dtype, 'compute_dtype': compute_dtype, 'upcast_layers': patched}
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from desktop.utils.logger import get_logger
+
+logger = get_logger('desktop.core.response_cache')
+
+
+class ResponseCache:
+    """Двухуровневый кэш ответов: LRU в памяти и SQLite на диске.
+
+    Ключ строится из нормализованного промпта, системного промпта,
+    параметров генерации и отпечатка модели, поэтому смена модели или
+    настроек автоматически делает старые записи недостижимыми.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, memory_items: int = 256,
+                 ttl_seconds: int = 86400, max_entries: int = 5000, max_size_mb: float = 64.0):
+        self.db_path = db_path
+        self.memory_items = max(0, int(memory_items))
+        self.ttl_seconds = max(0, int(ttl_seconds))
+        self.max_entries = max(0, int(max_entries))
+        self.max_size_bytes = int(max(0.0, float(max_size_mb)) * 1024 * 1024)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        if self.db_path:
+            self._open_database()
+
+    def _open_database(self) -> None:
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Генерация идёт в QThread, поэтому соединение разделяется между потоками под блокировкой
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+            )
+            self._connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось открыть дисковый кэш ответов {self.db_path}: {e}")
+            self._connection = None
+
+    @staticmethod
+    def normalize_prompt(text: str) -> str:
+        normalized = unicodedata.normalize('NFKC', text or '')
+        return ' '.join(normalized.casefold().split())
+
+    @classmethod
+    def make_key(cls, prompt: str, system_prompt: str, params: Dict[str, Any],
+                 fingerprint: Optional[str]) -> str:
+        payload = {
+            'prompt': cls.normalize_prompt(prompt),
+            'system_prompt': (system_prompt or '').strip(),
+            'params': params or {},
+            'model': fingerprint or '',
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Возвращает (ответ, уровень) где уровень — 'memory' или 'disk'."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    return response, 'memory'
+                del self._memory[key]
+
+            if self._connection is None:
+                return None, None
+            try:
+                row = self._connection.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None, None
+                response, created_at = row
+                if self._is_expired(created_at, now):
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._connection.commit()
+                    return None, None
+                self._connection.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Ошибка чтения дискового кэша: {e}")
+                return None, None
+            self._remember(key, response, created_at)
+            return response, 'disk'
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, last_access, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, response, now, now, len(response.encode('utf-8')))
+                )
+                self._evict_disk(now)
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Ошибка записи в дисковый кэш: {e}")
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        if not self.memory_items:
+            return
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        if self.ttl_seconds:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        if self.max_entries:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_size_bytes:
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_size_bytes:
+                rows = self._connection.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC"
+                ).fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_size_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                try:
+                    self._connection.execute("DELETE FROM responses")
+                    self._connection.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Не удалось очистить дисковый кэш: {e}")
+        logger.info("Кэш ответов очищен")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            disk_entries = 0
+            disk_bytes = 0
+            if self._connection is not None:
+                try:
+                    disk_entries, disk_bytes = self._connection.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                    ).fetchone()
+                except sqlite3.Error:
+                    pass
+            return {
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
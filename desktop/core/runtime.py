@@ -0,0 +1,311 @@
+import glob
+import os
+import platform
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+
+from desktop.utils.logger import get_logger
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except (ImportError, OSError):
+    torch = None
+    TORCH_AVAILABLE = False
+
+logger = get_logger('desktop.core.runtime')
+
+AUTOTUNE_PREFILL_TOKENS = 128
+AUTOTUNE_DECODE_STEPS = 8
+
+
+def _parse_cpulist(raw: str) -> List[int]:
+    cpus: List[int] = []
+    for part in raw.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def detect_cpu_topology() -> Dict[str, Any]:
+    """Логические/физические ядра и NUMA-узлы.
+
+    На Linux топология читается из sysfs; на остальных системах считается,
+    что есть один узел, а физические ядра берутся из psutil.
+    """
+    try:
+        import psutil
+        logical = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+        physical = psutil.cpu_count(logical=False) or logical
+    except ImportError:
+        logical = os.cpu_count() or 1
+        physical = logical
+
+    available = list(range(logical))
+    if hasattr(os, 'sched_getaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+
+    numa_nodes: List[List[int]] = []
+    for node_dir in sorted(glob.glob('/sys/devices/system/node/node[0-9]*')):
+        raw = _read_file(os.path.join(node_dir, 'cpulist'))
+        if raw:
+            cpus = [cpu for cpu in _parse_cpulist(raw) if cpu in available]
+            if cpus:
+                numa_nodes.append(cpus)
+    if not numa_nodes:
+        numa_nodes = [available]
+
+    # Одно логическое ядро на физическое: SMT-соседи только мешают матричным умножениям
+    primary_cpus: List[int] = []
+    seen_siblings = set()
+    has_sysfs = False
+    for cpu in available:
+        raw = _read_file(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list')
+        if raw:
+            has_sysfs = True
+        siblings = tuple(_parse_cpulist(raw)) if raw else (cpu,)
+        if siblings in seen_siblings:
+            continue
+        seen_siblings.add(siblings)
+        primary_cpus.append(cpu)
+    if not has_sysfs and logical > physical:
+        # Windows/macOS нумеруют SMT-соседей подряд
+        primary_cpus = available[::max(1, logical // physical)][:physical]
+
+    return {
+        'logical_cores': logical,
+        'physical_cores': physical,
+        'available_cpus': available,
+        'primary_cpus': primary_cpus,
+        'numa_nodes': numa_nodes,
+        'platform': platform.system(),
+    }
+
+
+class InferenceRuntime:
+    """Настройка потоков torch и привязки к ядрам для инференса."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, topology: Optional[Dict[str, Any]] = None):
+        self.config = config or {}
+        self.topology = topology or detect_cpu_topology()
+        self.inference_cpus: List[int] = []
+        self.ui_cpus: List[int] = []
+        self.num_threads = 1
+        self.interop_threads = max(1, int(self.config.get('interop_threads') or 1))
+        self._plan()
+
+    def _plan(self) -> None:
+        nodes = self.topology['numa_nodes']
+        node_index = self.config.get('numa_node')
+        if node_index is None or not (0 <= int(node_index) < len(nodes)):
+            # Без явного выбора берём самый большой узел: веса и потоки остаются на одной памяти
+            node_index = max(range(len(nodes)), key=lambda idx: len(nodes[idx]))
+        node_cpus = set(nodes[int(node_index)])
+        candidates = [cpu for cpu in self.topology['primary_cpus'] if cpu in node_cpus] or sorted(node_cpus)
+
+        reserve = max(0, int(self.config.get('reserve_ui_cores', 1) or 0))
+        if reserve and len(candidates) > reserve:
+            self.ui_cpus = candidates[:reserve]
+            self.inference_cpus = candidates[reserve:]
+        else:
+            self.ui_cpus = []
+            self.inference_cpus = candidates
+
+        requested = self.config.get('num_threads')
+        if requested:
+            self.num_threads = max(1, int(requested))
+        else:
+            self.num_threads = max(1, len(self.inference_cpus))
+
+    @property
+    def prefill_threads(self) -> int:
+        return int(self.config.get('prefill_threads') or self.num_threads)
+
+    @property
+    def decode_threads(self) -> int:
+        return int(self.config.get('decode_threads') or self.num_threads)
+
+    def apply(self) -> None:
+        if not TORCH_AVAILABLE:
+            return
+        torch.set_num_threads(self.num_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            # Можно вызвать только до первой параллельной операции; повторная настройка не нужна
+            pass
+        logger.info(
+            f"Инференс: {self.num_threads} потоков (prefill {self.prefill_threads}, decode {self.decode_threads}), "
+            f"interop {torch.get_num_interop_threads()}, ядра {self.inference_cpus}, ядра UI {self.ui_cpus}"
+        )
+
+    def _pin(self, cpus: List[int]) -> None:
+        if not cpus or not self.config.get('pin_threads', True):
+            return
+        if not hasattr(os, 'sched_setaffinity'):
+            return
+        try:
+            # pid 0 — текущий поток; потоки OpenMP, созданные им, унаследуют маску
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.debug(f"Не удалось привязать поток к ядрам {cpus}: {e}")
+
+    def pin_inference_thread(self) -> None:
+        self._pin(self.inference_cpus)
+
+    def pin_ui_thread(self) -> None:
+        # UI получает зарезервированные ядра плюс все остальные, кроме ядер инференса
+        if not self.ui_cpus:
+            return
+        others = [cpu for cpu in self.topology['available_cpus'] if cpu not in self.inference_cpus]
+        self._pin(sorted(set(self.ui_cpus) | set(others)))
+
+    def set_phase(self, phase: str) -> None:
+        if not TORCH_AVAILABLE:
+            return
+        threads = self.prefill_threads if phase == 'prefill' else self.decode_threads
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+
+    def signature(self) -> str:
+        return f"{platform.processor() or platform.machine()}:{len(self.inference_cpus)}:{self.topology['logical_cores']}"
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'num_threads': self.num_threads,
+            'prefill_threads': self.prefill_threads,
+            'decode_threads': self.decode_threads,
+            'interop_threads': self.interop_threads,
+            'inference_cpus': list(self.inference_cpus),
+            'ui_cpus': list(self.ui_cpus),
+            'numa_nodes': len(self.topology['numa_nodes']),
+            'physical_cores': self.topology['physical_cores'],
+        }
+
+
+try:
+    from transformers import LogitsProcessor, StoppingCriteria
+except (ImportError, OSError):
+    LogitsProcessor = object
+    StoppingCriteria = object
+
+
+class DecodePhaseSwitcher(LogitsProcessor):
+    """Переключает число потоков после prefill.
+
+    Логиты обрабатываются впервые сразу после прямого прохода по
+    промпту, поэтому первый вызов — это граница prefill/decode.
+    """
+
+    def __init__(self, runtime: InferenceRuntime):
+        self.runtime = runtime
+        self._switched = False
+
+    def __call__(self, input_ids, scores):
+        if not self._switched:
+            self.runtime.set_phase('decode')
+            self._switched = True
+        return scores
+
+
+class StageTimer(LogitsProcessor):
+    """Отметки времени шагов generate.
+
+    Логиты обрабатываются после каждого прямого прохода: первая отметка —
+    конец prefill, остальные — концы шагов decode, по одной на токен.
+    """
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.stamps: List[float] = []
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self.stamps = []
+
+    def __call__(self, input_ids, scores):
+        self.stamps.append(time.perf_counter())
+        return scores
+
+    def stages(self) -> Dict[str, float]:
+        if self.started is None or not self.stamps:
+            return {}
+        steps = len(self.stamps)
+        decode = self.stamps[-1] - self.stamps[0]
+        return {
+            'prefill': self.stamps[0] - self.started,
+            'decode': decode,
+            'decode_per_token': decode / (steps - 1) if steps > 1 else 0.0,
+            'new_tokens': steps,
+        }
+
+
+class StopOnEvent(StoppingCriteria):
+    """Прерывает generate между шагами декодирования по threading.Event."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def _thread_candidates(max_threads: int) -> List[int]:
+    candidates = {max_threads, max(1, max_threads * 3 // 4), max(1, max_threads // 2), max(1, max_threads // 4)}
+    return sorted(candidates, reverse=True)
+
+
+def autotune_thread_counts(model, tokenizer, device, runtime: InferenceRuntime,
+                           candidates: Optional[List[int]] = None, lock=None) -> Dict[str, int]:
+    """Микробенчмарк: лучшее число потоков отдельно для prefill и decode.
+
+    lock (блокировка генерации) берётся на каждый кандидат отдельно, чтобы
+    запрос пользователя ждал не весь бенчмарк, а не больше одного замера.
+    """
+    candidates = candidates or _thread_candidates(max(1, len(runtime.inference_cpus) or runtime.num_threads))
+    vocab_size = getattr(tokenizer, 'vocab_size', None) or 1000
+    input_ids = torch.randint(10, min(vocab_size, 30000), (1, AUTOTUNE_PREFILL_TOKENS), device=device)
+    results: Dict[str, Dict[int, float]] = {'prefill': {}, 'decode': {}}
+    for threads in candidates:
+        with lock or nullcontext(), torch.no_grad():
+            previous = torch.get_num_threads()
+            try:
+                torch.set_num_threads(threads)
+                model(input_ids=input_ids[:, :16], use_cache=False)
+                start = time.perf_counter()
+                outputs = model(input_ids=input_ids, use_cache=True)
+                results['prefill'][threads] = time.perf_counter() - start
+
+                past = outputs.past_key_values
+                next_token = outputs.logits[:, -1:].argmax(dim=-1)
+                start = time.perf_counter()
+                for _ in range(AUTOTUNE_DECODE_STEPS):
+                    outputs = model(input_ids=next_token, past_key_values=past, use_cache=True)
+                    past = outputs.past_key_values
+                    next_token = outputs.logits[:, -1:].argmax(dim=-1)
+                results['decode'][threads] = (time.perf_counter() - start) / AUTOTUNE_DECODE_STEPS
+            finally:
+                torch.set_num_threads(previous)
+
+    best = {phase: min(timings, key=timings.get) for phase, timings in results.items()}
+    logger.info(
+        "Автонастройка потоков: "
+        + ', '.join(f"{phase}: {', '.join(f'{n}={t * 1000:.0f}мс' for n, t in sorted(timings.items()))}"
+                    for phase, timings in results.items())
+        + f" -> prefill {best['prefill']}, decode {best['decode']}"
+    )
+    return {'prefill_threads': best['prefill'], 'decode_threads': best['decode']}
@@ -0,0 +1,181 @@
+import os
+import threading
+from typing import Optional, Tuple, Callable, Dict, Any
+
+from desktop.utils.logger import get_logger
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = get_logger('desktop.core.semantic_cache')
+
+
+class SemanticCache:
+    """Кэш ответов на перефразированные вопросы.
+
+    Эмбеддинги промптов хранятся в нормированной матрице NumPy, поиск —
+    скалярное произведение с порогом похожести. Записи разделяются по
+    контексту (системный промпт, параметры, модель), чтобы ответ одной
+    модели не выдавался для другой. Матрица выделяется один раз на
+    max_entries строк и заполняется по кругу: новая запись затирает самую
+    старую, вставка не копирует остальные.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 2000, path: Optional[str] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError('Для семантического кэша требуется numpy')
+        self.threshold = float(threshold)
+        self.max_entries = max(1, int(max_entries))
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _reset(self, dim: Optional[int] = None) -> None:
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32) if dim else None
+        self._contexts: list = []
+        self._prompts: list = []
+        self._responses: list = []
+        # Слот, в который пойдёт следующая запись; после заполнения — самая старая запись
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def _order(self) -> list:
+        # Слоты от самой старой записи к самой новой
+        size = len(self)
+        if size < self.max_entries:
+            return list(range(size))
+        return list(range(self._next, size)) + list(range(self._next))
+
+    @staticmethod
+    def _normalize(vector) -> "np.ndarray":
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return vector
+        return vector / norm
+
+    def lookup(self, embedding, context: str) -> Tuple[Optional[str], float]:
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None or not len(self):
+                return None, 0.0
+            if self._vectors.shape[1] != query.shape[0]:
+                return None, 0.0
+            scores = self._vectors[:len(self)] @ query
+            mask = np.fromiter((ctx == context for ctx in self._contexts), dtype=bool, count=len(self._contexts))
+            if not mask.any():
+                return None, 0.0
+            scores = np.where(mask, scores, -1.0)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None, similarity
+            return self._responses[best], similarity
+
+    def add(self, embedding, context: str, prompt: str, response: str) -> None:
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._reset(vector.shape[0])
+            slot = self._next
+            self._vectors[slot] = vector
+            if slot < len(self):
+                self._contexts[slot], self._prompts[slot], self._responses[slot] = context, prompt, response
+            else:
+                self._contexts.append(context)
+                self._prompts.append(prompt)
+                self._responses.append(response)
+            self._next = (slot + 1) % self.max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if self._vectors is None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{self.path}.tmp.npz'
+            order = self._order()
+            np.savez_compressed(
+                tmp_path,
+                vectors=self._vectors[order],
+                contexts=np.array([self._contexts[slot] for slot in order], dtype=str),
+                prompts=np.array([self._prompts[slot] for slot in order], dtype=str),
+                responses=np.array([self._responses[slot] for slot in order], dtype=str)
+            )
+            os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                # Записи сохранены от старых к новым; при уменьшенном max_entries остаются новые
+                vectors = data['vectors'][-self.max_entries:].astype(np.float32)
+                self._reset(vectors.shape[1])
+                self._vectors[:len(vectors)] = vectors
+                self._contexts = [str(item) for item in data['contexts'][-self.max_entries:]]
+                self._prompts = [str(item) for item in data['prompts'][-self.max_entries:]]
+                self._responses = [str(item) for item in data['responses'][-self.max_entries:]]
+                self._next = len(self._responses) % self.max_entries
+            logger.info(f"Загружен семантический кэш: {len(self)} записей")
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить семантический кэш {self.path}: {e}")
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'semantic_entries': len(self),
+                'semantic_threshold': self.threshold,
+                'embedding_dim': int(self._vectors.shape[1]) if self._vectors is not None else 0
+            }
+
+
+class PromptEmbedder:
+    """Эмбеддинги промптов: отдельный локальный энкодер или скрытые состояния основной модели."""
+
+    def __init__(self, fallback: Callable[[str], Optional["np.ndarray"]], encoder_path: Optional[str] = None):
+        self.fallback = fallback
+        self.encoder_path = encoder_path
+        self._tokenizer = None
+        self._encoder = None
+        if encoder_path:
+            self._load_encoder()
+
+    def _load_encoder(self) -> None:
+        try:
+            from transformers import AutoTokenizer, AutoModel
+            self._tokenizer = AutoTokenizer.from_pretrained(self.encoder_path)
+            self._encoder = AutoModel.from_pretrained(self.encoder_path)
+            self._encoder.eval()
+            logger.info(f"Загружен энкодер для семантического кэша: {self.encoder_path}")
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить энкодер {self.encoder_path}, используется основная модель: {e}")
+            self._tokenizer = None
+            self._encoder = None
+
+    def embed(self, text: str) -> Optional["np.ndarray"]:
+        if self._encoder is None:
+            return self.fallback(text)
+        import torch
+        inputs = self._tokenizer(text, return_tensors='pt', truncation=True, max_length=512)
+        with torch.no_grad():
+            hidden = self._encoder(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return pooled[0].float().cpu().numpy()
@@ -9,6 +9,7 @@ class UserRepository:
         self.db = db
         self._ensure_table()
         self._ensure_role_column()
+        self._ensure_adapter_column()
 
     def _ensure_table(self):
         self.db.execute(
@@ -28,6 +29,11 @@ class UserRepository:
         if not any(col['name'] == 'role' for col in columns):
             self.db.execute("ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'user'", commit=True)
 
+    def _ensure_adapter_column(self):
+        columns = self.db.execute("PRAGMA table_info(users)").fetchall()
+        if not any(col['name'] == 'adapter' for col in columns):
+            self.db.execute("ALTER TABLE users ADD COLUMN adapter TEXT", commit=True)
+
     def add_user(self, full_name: str, email: str, organization: str, role: str) -> int:
         cursor = self.db.execute(
             "INSERT INTO users (full_name, email, organization, role, created_at) VALUES (?, ?, ?, ?, ?)",
@@ -38,13 +44,13 @@ class UserRepository:
 
     def list_users(self) -> List[Dict]:
         cursor = self.db.execute(
-            "SELECT id, full_name, email, organization, role, created_at FROM users ORDER BY created_at DESC"
+            "SELECT id, full_name, email, organization, role, adapter, created_at FROM users ORDER BY created_at DESC"
         )
         return [dict(row) for row in cursor.fetchall()]
 
     def get_user(self, user_id: int) -> Optional[Dict]:
         cursor = self.db.execute(
-            "SELECT id, full_name, email, organization, role, created_at FROM users WHERE id = ?",
+            "SELECT id, full_name, email, organization, role, adapter, created_at FROM users WHERE id = ?",
             (user_id,)
         )
         row = cursor.fetchone()
@@ -57,4 +63,16 @@ class UserRepository:
             commit=True
         )
 
+    def set_adapter(self, user_id: int, adapter: Optional[str]):
+        self.db.execute(
+            "UPDATE users SET adapter = ? WHERE id = ?",
+            (adapter, user_id),
+            commit=True
+        )
 
+    def resolve_adapter(self, user_id: Optional[int], role_defaults: Dict[str, str]) -> Optional[str]:
+        """LoRA-адаптер пользователя: личный, иначе адаптер по умолчанию для его роли."""
+        user = self.get_user(user_id) if user_id else None
+        if user is None:
+            return None
+        return user.get('adapter') or role_defaults.get(user.get('role'))
@@ -0,0 +1,41 @@
+from typing import Dict, Any, List, Optional
+
+import torch
+
+from desktop.training.packing import IGNORE_INDEX
+
+
+class DynamicPaddingCollator:
+    """Дополняет батч справа до самой длинной последовательности в нём.
+
+    Метки на паддинге равны IGNORE_INDEX, поэтому loss по pad-токенам не
+    считается. Вместе с group_by_length в батч попадают образцы похожей
+    длины, и паддинга почти не остаётся.
+    """
+
+    def __init__(self, pad_token_id: int, pad_to_multiple_of: Optional[int] = None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.real_tokens = 0
+        self.total_tokens = 0
+
+    @property
+    def efficiency(self) -> float:
+        return self.real_tokens / self.total_tokens if self.total_tokens else 0.0
+
+    def __call__(self, features: List[Dict[str, Any]]) -> Dict[str, torch.Tensor]:
+        batch_size = len(features)
+        width = max(len(feature['input_ids']) for feature in features)
+        if self.pad_to_multiple_of:
+            width = -(-width // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        input_ids = torch.full((batch_size, width), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((batch_size, width), dtype=torch.long)
+        labels = torch.full((batch_size, width), IGNORE_INDEX, dtype=torch.long)
+        for row, feature in enumerate(features):
+            ids = feature['input_ids']
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+            labels[row, :len(ids)] = torch.tensor(feature.get('labels', ids), dtype=torch.long)
+            self.real_tokens += len(ids)
+        self.total_tokens += batch_size * width
+        return {'input_ids': input_ids, 'attention_mask': attention_mask, 'labels': labels}
@@ -0,0 +1,193 @@
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+import psutil
+import torch
+from transformers import TrainerCallback
+
+from desktop.training.status import TrainingStatusWriter
+
+
+class StatusProgressCallback(TrainerCallback):
+    """Пишет шаг, loss, токены в секунду и ETA в статус обучения при каждом логировании.
+
+    token_counter возвращает число настоящих токенов, прошедших через
+    коллатор; скорость и ETA считаются от шага, с которого начат (или
+    продолжен) запуск.
+    """
+
+    def __init__(self, status_writer: TrainingStatusWriter, token_counter: Optional[Callable[[], int]] = None):
+        self.status_writer = status_writer
+        self.token_counter = token_counter
+        self._start_time = None
+        self._start_step = 0
+        self._start_tokens = 0
+
+    def _tokens(self) -> int:
+        return self.token_counter() if self.token_counter else 0
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._start_time = time.time()
+        self._start_step = state.global_step
+        self._start_tokens = self._tokens()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if not state.is_world_process_zero or self._start_time is None:
+            return
+        logs = logs or {}
+        elapsed = time.time() - self._start_time
+        steps_done = state.global_step - self._start_step
+        fields = {
+            'step': state.global_step,
+            'max_steps': state.max_steps,
+            'epoch': round(state.epoch, 4) if state.epoch is not None else None,
+            'elapsed_seconds': round(elapsed, 1),
+        }
+        for key in ('loss', 'eval_loss', 'learning_rate', 'grad_norm'):
+            if key in logs:
+                fields[key] = logs[key]
+        if elapsed > 0:
+            fields['tokens_per_second'] = round((self._tokens() - self._start_tokens) / elapsed, 1)
+        if steps_done > 0 and state.max_steps:
+            fields['eta_seconds'] = round(elapsed / steps_done * (state.max_steps - state.global_step), 1)
+        self.status_writer.progress(**fields)
+
+
+class ThroughputCallback(TrainerCallback):
+    """Производительность обучения по интервалам логирования.
+
+    Для каждого интервала записываются токены в секунду без паддинга,
+    среднее время шага по фазам (ожидание даталоадера, прямой проход,
+    обратный проход, шаг оптимизатора), пиковый RSS и, если известна
+    пиковая производительность железа, MFU. Прямой проход замеряется
+    хуками на модели, обратный — от конца прямого прохода до конца
+    микрошага. Время оценки и сохранения чекпоинтов в интервалы не входит.
+    """
+
+    PHASES = ('dataloader', 'forward', 'backward', 'optimizer')
+
+    def __init__(self, token_counter: Callable[[], int], flops_per_token: Optional[float] = None,
+                 peak_tflops: Optional[float] = None):
+        self.token_counter = token_counter
+        self.flops_per_token = flops_per_token
+        self.peak_tflops = peak_tflops
+        self.records: List[Dict[str, Any]] = []
+        self._process = psutil.Process()
+        self._hooks = []
+        self._last_event: Optional[float] = None
+        self._forward_start: Optional[float] = None
+        self._forward_end: Optional[float] = None
+        self._optimizer_start: Optional[float] = None
+        self._reset_interval()
+
+    def _reset_interval(self):
+        self._interval_start = time.perf_counter()
+        self._interval_tokens = self.token_counter()
+        self._steps = 0
+        self._phases = {phase: 0.0 for phase in self.PHASES}
+        self._peak_rss = self._process.memory_info().rss
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def _before_forward(self, module, args):
+        if not module.training:
+            return
+        now = time.perf_counter()
+        if self._last_event is not None:
+            self._phases['dataloader'] += now - self._last_event
+            self._last_event = None
+        self._forward_start = now
+
+    def _after_forward(self, module, args, output):
+        if not module.training or self._forward_start is None:
+            return
+        now = time.perf_counter()
+        self._phases['forward'] += now - self._forward_start
+        self._forward_start = None
+        self._forward_end = now
+
+    def _end_backward(self, now: float):
+        if self._forward_end is not None:
+            self._phases['backward'] += now - self._forward_end
+            self._forward_end = None
+
+    def _skip_pause(self):
+        # Оценка и сохранение идут между шагами — сдвигаем начало интервала на их длительность
+        now = time.perf_counter()
+        if self._last_event is not None:
+            self._interval_start += now - self._last_event
+            self._last_event = now
+
+    def on_train_begin(self, args, state, control, model=None, **kwargs):
+        if model is not None and not self._hooks:
+            self._hooks = [
+                model.register_forward_pre_hook(self._before_forward),
+                model.register_forward_hook(self._after_forward),
+            ]
+        self._reset_interval()
+        self._last_event = time.perf_counter()
+
+    def on_substep_end(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._end_backward(now)
+        self._last_event = now
+
+    def on_pre_optimizer_step(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._end_backward(now)
+        self._optimizer_start = now
+
+    def on_step_end(self, args, state, control, **kwargs):
+        now = time.perf_counter()
+        self._end_backward(now)
+        if self._optimizer_start is not None:
+            self._phases['optimizer'] += now - self._optimizer_start
+            self._optimizer_start = None
+        self._steps += 1
+        self._peak_rss = max(self._peak_rss, self._process.memory_info().rss)
+        self._last_event = time.perf_counter()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._skip_pause()
+
+    def on_save(self, args, state, control, **kwargs):
+        self._skip_pause()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if not self._steps or not state.is_world_process_zero:
+            return
+        elapsed = max(time.perf_counter() - self._interval_start, 1e-9)
+        tokens = self.token_counter() - self._interval_tokens
+        record: Dict[str, Any] = {
+            'step': state.global_step,
+            'tokens_per_second': round(tokens / elapsed, 2),
+            'seconds_per_step': round(elapsed / self._steps, 4),
+            'peak_rss_gb': round(self._peak_rss / 1024 ** 3, 3),
+        }
+        for phase, total in self._phases.items():
+            record[f'{phase}_seconds'] = round(total / self._steps, 4)
+        if torch.cuda.is_available():
+            record['peak_gpu_gb'] = round(torch.cuda.max_memory_allocated() / 1024 ** 3, 3)
+        if self.flops_per_token and self.peak_tflops:
+            record['mfu'] = round(tokens / elapsed * self.flops_per_token / (self.peak_tflops * 1e12), 4)
+        self.records.append(record)
+        self._reset_interval()
+        self._last_event = time.perf_counter()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.records:
+            return {}
+        keys = [key for key in self.records[-1] if key not in ('step', 'peak_rss_gb', 'peak_gpu_gb')]
+        summary = {
+            key: round(sum(record.get(key, 0.0) for record in self.records) / len(self.records), 4)
+            for key in keys
+        }
+        summary['peak_rss_gb'] = max(record['peak_rss_gb'] for record in self.records)
+        if 'peak_gpu_gb' in self.records[-1]:
+            summary['peak_gpu_gb'] = max(record.get('peak_gpu_gb', 0.0) for record in self.records)
+        return summary
@@ -20,10 +20,25 @@ class TrainingConfig:
     lora_r: int = 8
     lora_alpha: int = 16
     lora_dropout: float = 0.05
+    lora_target: str = 'attention'
+    lora_target_modules: Optional[List[str]] = None
+    memory_profile: str = 'default'
+    gradient_checkpointing: Optional[bool] = None
+    quantization: Optional[str] = None
     max_seq_length: int = 1024
+    packing: bool = True
+    group_by_length: bool = True
+    pad_to_multiple_of: Optional[int] = 8
+    streaming: bool = False
+    dataset_cache_dir: Optional[str] = None
+    eval_holdout: int = 500
+    prompt_template: Optional[str] = None
+    tokenization_num_proc: Optional[int] = None
     report_dir: Optional[str] = None
     evaluation_metric: str = 'perplexity'
     status_file: Optional[str] = None
+    resume: bool = True
+    peak_tflops: Optional[float] = None
 
     @classmethod
     def from_dict(cls, values: Dict[str, Any]) -> "TrainingConfig":
@@ -44,9 +59,24 @@ class TrainingConfig:
             lora_r=values.get("lora_r", 8),
             lora_alpha=values.get("lora_alpha", 16),
             lora_dropout=values.get("lora_dropout", 0.05),
+            lora_target=values.get("lora_target", 'attention'),
+            lora_target_modules=values.get("lora_target_modules"),
+            memory_profile=values.get("memory_profile", 'default'),
+            gradient_checkpointing=values.get("gradient_checkpointing"),
+            quantization=values.get("quantization"),
             max_seq_length=values.get("max_seq_length", 1024),
+            packing=values.get("packing", True),
+            group_by_length=values.get("group_by_length", True),
+            pad_to_multiple_of=values.get("pad_to_multiple_of", 8),
+            streaming=values.get("streaming", False),
+            dataset_cache_dir=values.get("dataset_cache_dir"),
+            eval_holdout=values.get("eval_holdout", 500),
+            prompt_template=values.get("prompt_template"),
+            tokenization_num_proc=values.get("tokenization_num_proc"),
             report_dir=values.get("report_dir"),
             evaluation_metric=values.get("evaluation_metric", 'perplexity'),
             status_file=values.get("status_file"),
+            resume=values.get("resume", True),
+            peak_tflops=values.get("peak_tflops"),
         )
 
@@ -1,49 +1,102 @@
+import hashlib
 import json
+import os
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Iterator, Union
 
-from datasets import Dataset, DatasetDict
+from datasets import Dataset, DatasetDict, IterableDataset, Features, Sequence, Value, concatenate_datasets
+from datasets.arrow_writer import ArrowWriter
+
+# Версия формата кэша: меняется вместе с FEATURES и _normalize
+CACHE_VERSION = 1
+FEATURES = Features({
+    "instruction": Value("string"),
+    "input": Value("string"),
+    "output": Value("string"),
+    "tags": Sequence(Value("string")),
+})
+
+
+def _normalize(sample: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "instruction": sample.get("instruction") or "",
+        "input": sample.get("input") or "",
+        "output": sample.get("output") or "",
+        "tags": [str(tag) for tag in sample.get("tags") or []],
+    }
+
+
+def _iter_jsonl(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield _normalize(json.loads(line))
 
 
 class ConversationDataset:
+    """JSONL-диалоги, один раз переведённые в Arrow-кэш и читаемые через mmap.
+
+    Кэш лежит рядом с файлом (или в cache_dir) и привязан к пути, размеру
+    и времени изменения JSONL, поэтому повторный запуск не разбирает
+    корпус заново. В режиме streaming файлы читаются построчно как
+    IterableDataset, по шарду на файл.
+    """
+
     def __init__(self, dataset_path: Optional[str] = None, dataset_paths: Optional[List[str]] = None,
-                 max_samples: int = 0):
+                 max_samples: int = 0, cache_dir: Optional[str] = None, streaming: bool = False):
         self.dataset_paths = [Path(dataset_path)] if dataset_path else []
         if dataset_paths:
             self.dataset_paths.extend([Path(path) for path in dataset_paths])
         self.max_samples = max_samples
-        self.records: List[Dict[str, Any]] = []
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.streaming = streaming
 
-    def load(self) -> Dataset:
+    def load(self) -> Union[Dataset, IterableDataset]:
         if not self.dataset_paths:
             raise ValueError("Не указан путь к датасету")
         for path in self.dataset_paths:
             if not path.exists():
                 raise FileNotFoundError(f"Файл датасета {path} не найден")
-            self._append_from_file(path)
-        if not self.records:
+        if self.streaming:
+            dataset = IterableDataset.from_generator(
+                _iter_jsonl,
+                features=FEATURES,
+                gen_kwargs={"paths": [str(path) for path in self.dataset_paths]},
+            )
+            return dataset.take(self.max_samples) if self.max_samples else dataset
+
+        parts = [self._load_cached(path) for path in self.dataset_paths]
+        dataset = parts[0] if len(parts) == 1 else concatenate_datasets(parts)
+        if not len(dataset):
             raise ValueError("Датасет не содержит записей")
-        return Dataset.from_list(self.records)
+        if self.max_samples and len(dataset) > self.max_samples:
+            dataset = dataset.select(range(self.max_samples))
+        return dataset
 
-    def _append_from_file(self, path: Path):
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                sample = json.loads(line)
-                self.records.append(
-                    {
-                        "instruction": sample.get("instruction", ""),
-                        "input": sample.get("input", ""),
-                        "output": sample.get("output", ""),
-                        "tags": sample.get("tags", []),
-                    }
-                )
-                if self.max_samples and len(self.records) >= self.max_samples:
-                    break
+    def cache_path(self, path: Path) -> Path:
+        stat = path.stat()
+        key = f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{CACHE_VERSION}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        cache_dir = self.cache_dir or path.parent / ".arrow_cache"
+        return cache_dir / f"{path.stem}-{digest}.arrow"
+
+    def _load_cached(self, path: Path) -> Dataset:
+        cache_path = self.cache_path(path)
+        if not cache_path.exists():
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".arrow.tmp")
+            writer = ArrowWriter(features=FEATURES, path=str(tmp_path))
+            try:
+                for sample in _iter_jsonl([str(path)]):
+                    writer.write(sample)
+                writer.finalize()
+            finally:
+                writer.close()
+            os.replace(tmp_path, cache_path)
+        return Dataset.from_file(str(cache_path))
 
     def create_splits(self, eval_ratio: float = 0.1) -> DatasetDict:
         dataset = self.load()
         return dataset.train_test_split(test_size=eval_ratio)
-
@@ -5,12 +5,17 @@ import math
 
 
 class EvaluationRunner:
-    def __init__(self, trainer: Trainer, metric: str = 'perplexity'):
+    def __init__(self, trainer: Trainer, metric: str = 'perplexity', group_by_length: bool = False):
         self.trainer = trainer
         self.metric = metric
+        self.group_by_length = group_by_length
 
     def run(self) -> Dict[str, Any]:
-        results = self.trainer.evaluate()
+        eval_dataset = self.trainer.eval_dataset
+        if self.group_by_length and eval_dataset is not None and 'length' in eval_dataset.column_names:
+            # Оценка идёт по порядку, поэтому сортировка по длине даёт батчи из образцов близкой длины
+            eval_dataset = eval_dataset.sort('length')
+        results = self.trainer.evaluate(eval_dataset=eval_dataset)
         metrics = {}
         if 'eval_loss' in results and self.metric == 'perplexity':
             metrics['perplexity'] = math.exp(results['eval_loss'])
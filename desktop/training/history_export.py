@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+
+# Простое число Мерсенна 2^61 - 1 для универсального хэширования MinHash
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Сколько сессий с неотвеченным сообщением пользователя держать одновременно
+MAX_PENDING_SESSIONS = 64
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text.strip().lower())
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def history_files(history_dir: str) -> List[Path]:
+    """Архивы chat-*.json в хронологическом порядке, затем текущий chat_history.json."""
+    base = Path(history_dir)
+    files = sorted((base / 'archives').glob('chat-*.json'))
+    current = base / 'chat_history.json'
+    if current.exists():
+        files.append(current)
+    return files
+
+
+def iter_messages(paths: List[Path]) -> Iterator[Dict[str, Any]]:
+    # Каждый файл истории ограничен max_records, поэтому в памяти не больше одного файла
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                messages = json.load(f)
+            except json.JSONDecodeError:
+                continue
+        for message in messages:
+            if isinstance(message, dict) and message.get('content'):
+                yield message
+
+
+def iter_turn_pairs(messages: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Пары «пользователь → ответ ассистента» внутри одной сессии.
+
+    Сообщение пользователя ждёт ответа и через границу файлов; повторное
+    сообщение пользователя без ответа заменяет предыдущее.
+    """
+    pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for message in messages:
+        session = message.get('session_id') or ''
+        role = message.get('role')
+        if role == 'user':
+            pending.pop(session, None)
+            pending[session] = message
+            if len(pending) > MAX_PENDING_SESSIONS:
+                pending.popitem(last=False)
+        elif role == 'assistant' and session in pending:
+            question = pending.pop(session)
+            yield {
+                'instruction': question['content'],
+                'input': '',
+                'output': message['content'],
+                'tags': sorted(set(question.get('tags') or []) | set(message.get('tags') or [])),
+                'timestamp': question.get('timestamp'),
+            }
+
+
+class MinHashDeduplicator:
+    """Точные и почти точные дубликаты по MinHash с LSH по полосам.
+
+    Кандидаты ищутся по совпадению хотя бы одной полосы сигнатуры и
+    подтверждаются оценкой сходства Жаккара по полной сигнатуре. Тексты не
+    хранятся, но индекс растёт линейно с числом принятых записей: 8-байтовый
+    хэш текста (~150 байт вместе с множеством), сигнатура 4 * num_perm байт
+    в общем массиве и по ключу на каждую из bands полос (~70 байт на полосу) —
+    около 1,5 КБ на запись при параметрах по умолчанию, ~1,5 ГБ на миллион
+    записей. max_records ограничивает индекс: после него записи по-прежнему
+    проверяются по уже запомненным, но сами не запоминаются.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.8,
+                 shingle_size: int = 5, near_duplicates: bool = True, seed: int = 1,
+                 max_records: Optional[int] = None):
+        if num_perm % bands:
+            raise ValueError('num_perm должно делиться на bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.near_duplicates = near_duplicates
+        self.max_records = max_records
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._exact = set()
+        # Ключ полосы — 64-битный хэш номера полосы и её значений; значение —
+        # номер записи или список номеров, если полоса совпала у нескольких
+        self._buckets: Dict[int, Any] = {}
+        self._signatures = array('I')
+        self.records = 0
+        self.exact_duplicates = 0
+        self.near_duplicates_found = 0
+
+    @property
+    def full(self) -> bool:
+        return self.max_records is not None and self.records >= self.max_records
+
+    def _shingles(self, text: str) -> set:
+        tokens = text.split()
+        if len(tokens) < self.shingle_size:
+            return {text}
+        return {' '.join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> array:
+        hashes = [
+            struct.unpack('<I', hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest())[0]
+            for shingle in self._shingles(text)
+        ]
+        return array('I', (
+            min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+            for a, b in self._perms
+        ))
+
+    def similarity(self, first: Sequence[int], second: Sequence[int]) -> float:
+        return sum(1 for x, y in zip(first, second) if x == y) / self.num_perm
+
+    def _stored_signature(self, index: int) -> array:
+        return self._signatures[index * self.num_perm:(index + 1) * self.num_perm]
+
+    def _band_keys(self, signature: array) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            packed = struct.pack(f'<H{self.rows}I', band, *signature[band * self.rows:(band + 1) * self.rows])
+            keys.append(int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), 'little'))
+        return keys
+
+    def is_duplicate(self, text: str) -> bool:
+        """Проверяет запись и, если она новая и индекс не заполнен, запоминает её."""
+        normalized = _normalize_text(text)
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+        if digest in self._exact:
+            self.exact_duplicates += 1
+            return True
+        if not self.near_duplicates:
+            if not self.full:
+                self._exact.add(digest)
+                self.records += 1
+            return False
+
+        signature = self.signature(normalized)
+        keys = self._band_keys(signature)
+        checked = set()
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for candidate in (bucket if isinstance(bucket, list) else (bucket,)):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if self.similarity(signature, self._stored_signature(candidate)) >= self.threshold:
+                    self.near_duplicates_found += 1
+                    return True
+        if self.full:
+            return False
+        index = self.records
+        self.records += 1
+        self._exact.add(digest)
+        self._signatures.extend(signature)
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = index
+            elif isinstance(bucket, list):
+                bucket.append(index)
+            else:
+                self._buckets[key] = [bucket, index]
+        return False
+
+
+class ShardedJsonlWriter:
+    """JSONL-шарды по shard_size записей; шард появляется под своим именем только целиком."""
+
+    def __init__(self, output_dir: str, prefix: str = 'train', shard_size: int = 10000):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.shards: List[str] = []
+        self._file = None
+        self._tmp_path: Optional[Path] = None
+        self._count = 0
+
+    def _open(self):
+        self._tmp_path = self.output_dir / f'.{self.prefix}-{len(self.shards):05d}.jsonl.tmp'
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._count = 0
+
+    def _close_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        path = self.output_dir / f'{self.prefix}-{len(self.shards):05d}.jsonl'
+        os.replace(self._tmp_path, path)
+        self.shards.append(str(path))
+        self._file = None
+
+    def write(self, record: Dict[str, Any]):
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._count += 1
+        if self._count >= self.shard_size:
+            self._close_shard()
+
+    def close(self) -> List[str]:
+        self._close_shard()
+        return self.shards
+
+
+def export_history_dataset(history_dir: str, output_dir: str, tags: Optional[List[str]] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           shard_size: int = 10000, near_duplicates: bool = True,
+                           threshold: float = 0.8, min_chars: int = 1,
+                           max_dedup_records: Optional[int] = None) -> Dict[str, Any]:
+    """Выгружает историю чатов в шардированный JSONL для ConversationDataset.
+
+    Файлы истории читаются по одному, пары вопрос-ответ фильтруются по тегам
+    (как в ChatHistory.filter_history: все указанные теги должны быть) и
+    дате вопроса, дубликаты отбрасываются. Рядом с шардами пишется
+    manifest.json, поле dataset_paths которого подходит для конфигурации
+    FineTuningPipeline. max_dedup_records ограничивает память индекса
+    дубликатов (см. MinHashDeduplicator).
+    """
+    deduplicator = MinHashDeduplicator(threshold=threshold, near_duplicates=near_duplicates,
+                                       max_records=max_dedup_records)
+    writer = ShardedJsonlWriter(output_dir, shard_size=shard_size)
+    required_tags = set(tags or [])
+    stats = {'pairs': 0, 'filtered': 0, 'exact_duplicates': 0, 'near_duplicates': 0, 'written': 0}
+    try:
+        for pair in iter_turn_pairs(iter_messages(history_files(history_dir))):
+            stats['pairs'] += 1
+            timestamp = _parse_timestamp(pair.pop('timestamp'))
+            if (
+                (required_tags and not required_tags.issubset(pair['tags']))
+                or (start and (timestamp is None or timestamp < start))
+                or (end and (timestamp is None or timestamp > end))
+                or len(pair['instruction'].strip()) < min_chars
+                or len(pair['output'].strip()) < min_chars
+            ):
+                stats['filtered'] += 1
+                continue
+            if deduplicator.is_duplicate(pair['instruction'] + '\n' + pair['output']):
+                continue
+            writer.write(pair)
+            stats['written'] += 1
+    finally:
+        shards = writer.close()
+    stats['exact_duplicates'] = deduplicator.exact_duplicates
+    stats['near_duplicates'] = deduplicator.near_duplicates_found
+    stats['dedup_records'] = deduplicator.records
+
+    manifest = {
+        'created': datetime.now().isoformat(),
+        'history_dir': str(history_dir),
+        'filters': {
+            'tags': sorted(required_tags),
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+        },
+        'stats': stats,
+        'dataset_paths': shards,
+    }
+    with open(Path(output_dir) / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
@@ -0,0 +1,187 @@
+from typing import Dict, Any, List, Optional
+
+# Регулярные выражения PEFT (полное совпадение имени модуля)
+LORA_TARGETS = {
+    'attention': r'.*\.self_attn\.(q_proj|k_proj|v_proj|o_proj)',
+    'attention_shared_experts': r'.*\.(self_attn\.(q_proj|k_proj|v_proj|o_proj)|mlp\.shared_experts\.(gate_proj|up_proj|down_proj))',
+}
+
+PROFILES = {
+    'default': {'gradient_checkpointing': False, 'quantization': None},
+    'memory_efficient': {'gradient_checkpointing': True, 'quantization': '4bit'},
+}
+
+# Байт на параметр замороженных весов; для 4 бит учтены масштабы блоков nf4 с двойной квантизацией
+WEIGHT_BYTES = {None: 2.0, '8bit': 1.0 + 4.0 / 64, '4bit': 0.5 + 0.5 / 64 + 4.0 / (64 * 256)}
+# Обучаемые параметры LoRA в fp32: веса, градиенты и два момента AdamW
+TRAINABLE_BYTES = 16
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def resolve_memory_settings(config, cuda_available: Optional[bool] = None) -> Dict[str, Any]:
+    """Итоговые настройки памяти: профиль плюс явно заданные поля конфигурации.
+
+    bitsandbytes (0.44) квантует только на CUDA: без GPU квантизация из
+    профиля снимается с пометкой в notes, а явно заданная — ошибка.
+    """
+    if config.memory_profile not in PROFILES:
+        raise ValueError(f"Неизвестный профиль памяти {config.memory_profile}, доступны: {', '.join(PROFILES)}")
+    settings = dict(PROFILES[config.memory_profile])
+    settings['notes'] = []
+    if config.gradient_checkpointing is not None:
+        settings['gradient_checkpointing'] = config.gradient_checkpointing
+    if config.quantization is not None:
+        settings['quantization'] = None if config.quantization in ('', 'none') else config.quantization
+    if settings['quantization'] not in WEIGHT_BYTES:
+        raise ValueError(f"Неподдерживаемая квантизация {settings['quantization']}: ожидается 4bit или 8bit")
+    if cuda_available is None:
+        cuda_available = _cuda_available()
+    if settings['quantization'] and not cuda_available:
+        if config.quantization is not None:
+            raise ValueError(
+                f"Квантизация {settings['quantization']} требует CUDA (bitsandbytes), а GPU не найден; "
+                f"уберите quantization или задайте \"quantization\": \"none\""
+            )
+        settings['notes'].append(
+            f"профиль {config.memory_profile}: квантизация {settings['quantization']} отключена — нет CUDA, "
+            f"веса загружаются в bf16"
+        )
+        settings['quantization'] = None
+    if config.lora_target_modules:
+        settings['lora_target_modules'] = list(config.lora_target_modules)
+    else:
+        if config.lora_target not in LORA_TARGETS:
+            raise ValueError(f"Неизвестная цель LoRA {config.lora_target}, доступны: {', '.join(LORA_TARGETS)}")
+        settings['lora_target_modules'] = LORA_TARGETS[config.lora_target]
+    return settings
+
+
+def _is_moe_layer(model_config, layer_idx: int) -> bool:
+    return (
+        model_config.n_routed_experts is not None
+        and layer_idx >= model_config.first_k_dense_replace
+        and layer_idx % model_config.moe_layer_freq == 0
+    )
+
+
+def count_parameters(model_config) -> Dict[str, int]:
+    hidden = model_config.hidden_size
+    head_dim = getattr(model_config, 'head_dim', None) or hidden // model_config.num_attention_heads
+    heads, kv_heads = model_config.num_attention_heads, model_config.num_key_value_heads
+    attention = hidden * head_dim * (2 * heads + 2 * kv_heads)
+    moe_mlp = 3 * hidden * model_config.moe_intermediate_size
+    counts = {'embeddings': 2 * hidden * model_config.vocab_size, 'attention': 0, 'dense_mlp': 0,
+              'routed_experts': 0, 'shared_experts': 0, 'router': 0}
+    for layer_idx in range(model_config.num_hidden_layers):
+        counts['attention'] += attention
+        if _is_moe_layer(model_config, layer_idx):
+            counts['routed_experts'] += moe_mlp * model_config.n_routed_experts
+            counts['shared_experts'] += moe_mlp * (model_config.n_shared_experts or 0)
+            counts['router'] += hidden * model_config.n_routed_experts
+        else:
+            counts['dense_mlp'] += 3 * hidden * model_config.intermediate_size
+    return counts
+
+
+def count_lora_parameters(model_config, lora_r: int, target: str) -> int:
+    hidden = model_config.hidden_size
+    head_dim = getattr(model_config, 'head_dim', None) or hidden // model_config.num_attention_heads
+    q_out = model_config.num_attention_heads * head_dim
+    kv_out = model_config.num_key_value_heads * head_dim
+    per_layer = lora_r * ((hidden + q_out) * 2 + (hidden + kv_out) * 2)
+    total = per_layer * model_config.num_hidden_layers
+    if 'shared_experts' in target and model_config.n_shared_experts:
+        shared = model_config.moe_intermediate_size * model_config.n_shared_experts
+        moe_layers = sum(1 for layer_idx in range(model_config.num_hidden_layers) if _is_moe_layer(model_config, layer_idx))
+        total += lora_r * (hidden + shared) * 3 * moe_layers
+    return total
+
+
+def estimate_training_memory(model_config, settings: Dict[str, Any], lora_r: int,
+                             batch_size: int, seq_len: int) -> Dict[str, float]:
+    """Оценка пиковой памяти обучения в ГБ по конфигурации модели.
+
+    Учитывает замороженные веса (с квантизацией), обучаемые параметры LoRA
+    с состоянием AdamW, активации (при чекпоинтинге — входы слоёв плюс
+    один пересчитываемый слой) и логиты в fp32. Буферы распределителя и
+    CUDA-контекст не учитываются.
+    """
+    gib = 1024 ** 3
+    counts = count_parameters(model_config)
+    total_params = sum(counts.values())
+    quantized = counts['attention'] + counts['dense_mlp'] + counts['routed_experts'] + counts['shared_experts']
+    # Эмбеддинги, lm_head и роутер не квантуются
+    weights = quantized * WEIGHT_BYTES[settings['quantization']] + (total_params - quantized) * 2
+    target = settings['lora_target_modules'] if isinstance(settings['lora_target_modules'], str) else ' '.join(settings['lora_target_modules'])
+    lora = count_lora_parameters(model_config, lora_r, target) * TRAINABLE_BYTES
+
+    hidden = model_config.hidden_size
+    tokens = batch_size * seq_len
+    active_experts = model_config.num_experts_per_tok + (model_config.n_shared_experts or 0)
+    mlp_width = max(model_config.intermediate_size, model_config.moe_intermediate_size * active_experts)
+    # bf16: нормы, q/k/v/o, промежуточные MLP (gate, up, act) и матрица внимания eager
+    layer_activations = tokens * (10 * hidden + 3 * mlp_width) * 2
+    layer_activations += batch_size * model_config.num_attention_heads * seq_len * seq_len * 2 * 2
+    layers = model_config.num_hidden_layers
+    if settings['gradient_checkpointing']:
+        activations = layers * tokens * hidden * 2 + layer_activations
+    else:
+        activations = layers * layer_activations
+    logits = tokens * model_config.vocab_size * 4 * 2
+
+    plan = {
+        'parameters_b': total_params / 1e9,
+        'weights_gb': weights / gib,
+        'lora_and_optimizer_gb': lora / gib,
+        'activations_gb': activations / gib,
+        'logits_gb': logits / gib,
+    }
+    plan['peak_gb'] = plan['weights_gb'] + plan['lora_and_optimizer_gb'] + plan['activations_gb'] + plan['logits_gb']
+    return plan
+
+
+def format_memory_plan(plan: Dict[str, float], settings: Dict[str, Any],
+                       available_gb: Optional[float] = None) -> str:
+    lines: List[str] = [
+        "План памяти обучения:",
+        f"  параметров модели: {plan['parameters_b']:.1f}B, квантизация: {settings['quantization'] or 'нет (bf16)'}, "
+        f"чекпоинтинг градиентов: {'да' if settings['gradient_checkpointing'] else 'нет'}",
+        f"  веса: {plan['weights_gb']:.1f} ГБ",
+        f"  LoRA + AdamW: {plan['lora_and_optimizer_gb']:.2f} ГБ",
+        f"  активации: {plan['activations_gb']:.1f} ГБ",
+        f"  логиты: {plan['logits_gb']:.1f} ГБ",
+        f"  итого пик: ~{plan['peak_gb']:.1f} ГБ",
+    ]
+    if available_gb is not None:
+        verdict = 'помещается' if plan['peak_gb'] < available_gb else 'НЕ помещается'
+        lines.append(f"  доступно: {available_gb:.1f} ГБ — {verdict}")
+    for note in settings.get('notes', []):
+        lines.append(f"  внимание: {note}")
+    return '\n'.join(lines)
+
+
+def active_parameters_per_token(model_config) -> int:
+    """Параметры, через которые проходит один токен: внимание, top-k и общие эксперты, lm_head."""
+    counts = count_parameters(model_config)
+    moe_layers = sum(1 for layer_idx in range(model_config.num_hidden_layers) if _is_moe_layer(model_config, layer_idx))
+    routed_active = 3 * model_config.hidden_size * model_config.moe_intermediate_size * model_config.num_experts_per_tok * moe_layers
+    lm_head = model_config.hidden_size * model_config.vocab_size
+    return counts['attention'] + counts['dense_mlp'] + counts['shared_experts'] + counts['router'] + routed_active + lm_head
+
+
+def training_flops_per_token(model_config, gradient_checkpointing: bool = False) -> float:
+    """FLOPs обучения LoRA на токен: прямой проход 2N, обратный по активациям 2N.
+
+    Градиенты замороженных весов не считаются, поэтому множитель 4, а не
+    6; чекпоинтинг добавляет повторный прямой проход. Внимание по длине
+    последовательности не учитывается.
+    """
+    multiplier = 6 if gradient_checkpointing else 4
+    return float(multiplier * active_parameters_per_token(model_config))
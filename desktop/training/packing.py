@@ -0,0 +1,118 @@
+from bisect import bisect_left, insort
+from typing import Dict, Any, List, Sequence, Tuple
+
+import torch
+from datasets import Dataset
+
+IGNORE_INDEX = -100
+
+
+def pack_sequences(lengths: Sequence[int], capacity: int) -> List[List[int]]:
+    """Раскладывает образцы по пакетам длиной не больше capacity (best-fit decreasing).
+
+    Возвращает индексы образцов для каждого пакета.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index], reverse=True)
+    packs: List[List[int]] = []
+    # Отсортированные пары (свободное место, номер пакета)
+    free: List[Tuple[int, int]] = []
+    for index in order:
+        length = lengths[index]
+        if length > capacity:
+            raise ValueError(f'Образец {index} длиной {length} не помещается в {capacity} токенов')
+        position = bisect_left(free, (length, -1))
+        if position < len(free):
+            space, pack_id = free.pop(position)
+        else:
+            pack_id, space = len(packs), capacity
+            packs.append([])
+        packs[pack_id].append(index)
+        space -= length
+        if space > 0:
+            insort(free, (space, pack_id))
+    return packs
+
+
+def pack_dataset(dataset: Dataset, max_seq_length: int) -> Tuple[Dataset, Dict[str, Any]]:
+    """Склеивает токенизированные образцы в пакеты до max_seq_length.
+
+    В каждой строке результата хранятся склеенные input_ids и labels и
+    seq_lens — длины образцов, по которым коллатор восстанавливает границы.
+    """
+    input_ids = dataset['input_ids']
+    labels = dataset['labels'] if 'labels' in dataset.column_names else input_ids
+    lengths = [len(ids) for ids in input_ids]
+    non_empty = [index for index, length in enumerate(lengths) if length]
+    packs = pack_sequences([lengths[index] for index in non_empty], max_seq_length)
+
+    rows = []
+    for pack in packs:
+        members = [non_empty[index] for index in pack]
+        rows.append({
+            'input_ids': [token for index in members for token in input_ids[index]],
+            'labels': [token for index in members for token in labels[index]],
+            'seq_lens': [lengths[index] for index in members],
+        })
+    tokens = sum(lengths)
+    stats = {
+        'samples': len(non_empty),
+        'packs': len(packs),
+        'tokens': tokens,
+        'efficiency': tokens / (len(packs) * max_seq_length) if packs else 0.0,
+        'unpacked_efficiency': tokens / (len(non_empty) * max_seq_length) if non_empty else 0.0,
+    }
+    return Dataset.from_list(rows), stats
+
+
+class PackedSequenceCollator:
+    """Собирает батч из пакетов с блочно-диагональной причинной маской.
+
+    Позиции начинаются с нуля в каждом образце, метка первого токена
+    образца маскируется — иначе он предсказывался бы по чужому образцу.
+    Маска передаётся модели в 4D-виде (0 — можно смотреть, min — нельзя)
+    в типе mask_dtype, который должен совпадать с типом активаций модели.
+    """
+
+    def __init__(self, pad_token_id: int, mask_dtype: torch.dtype = torch.float32):
+        self.pad_token_id = pad_token_id
+        self.mask_dtype = mask_dtype
+        self.real_tokens = 0
+        self.total_tokens = 0
+
+    @property
+    def efficiency(self) -> float:
+        return self.real_tokens / self.total_tokens if self.total_tokens else 0.0
+
+    def __call__(self, features: List[Dict[str, Any]]) -> Dict[str, torch.Tensor]:
+        batch_size = len(features)
+        width = max(len(feature['input_ids']) for feature in features)
+        input_ids = torch.full((batch_size, width), self.pad_token_id, dtype=torch.long)
+        labels = torch.full((batch_size, width), IGNORE_INDEX, dtype=torch.long)
+        position_ids = torch.zeros((batch_size, width), dtype=torch.long)
+        segments = torch.zeros((batch_size, width), dtype=torch.long)
+
+        for row, feature in enumerate(features):
+            ids = feature['input_ids']
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            labels[row, :len(ids)] = torch.tensor(feature.get('labels', ids), dtype=torch.long)
+            offset = 0
+            for segment, length in enumerate(feature.get('seq_lens') or [len(ids)], 1):
+                position_ids[row, offset:offset + length] = torch.arange(length)
+                segments[row, offset:offset + length] = segment
+                labels[row, offset] = IGNORE_INDEX
+                offset += length
+            self.real_tokens += offset
+        self.total_tokens += batch_size * width
+
+        causal = torch.ones((width, width), dtype=torch.bool).tril()
+        allowed = (segments[:, :, None] == segments[:, None, :]) & causal & (segments[:, :, None] > 0)
+        # Строки паддинга смотрят на себя, чтобы не было полностью замаскированных строк
+        allowed |= torch.eye(width, dtype=torch.bool)
+        attention_mask = torch.zeros((batch_size, 1, width, width), dtype=self.mask_dtype)
+        attention_mask.masked_fill_(~allowed[:, None], torch.finfo(self.mask_dtype).min)
+        return {
+            'input_ids': input_ids,
+            'labels': labels,
+            'position_ids': position_ids,
+            'attention_mask': attention_mask,
+        }
@@ -0,0 +1,195 @@
+import json
+import math
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import torch
+
+from desktop.training.tokenization import PROMPT_TEMPLATE
+
+UNTAGGED = 'untagged'
+
+Document = Tuple[Iterator[List[int]], List[str]]
+
+
+def _iter_text_tokens(path: str, tokenizer, block_chars: int) -> Iterator[List[int]]:
+    # Файл читается блоками по границам строк, поэтому размер текста не ограничен памятью
+    first = True
+    block: List[str] = []
+    size = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            block.append(line)
+            size += len(line)
+            if size >= block_chars:
+                yield tokenizer(''.join(block), add_special_tokens=first)['input_ids']
+                first, block, size = False, [], 0
+    if block:
+        yield tokenizer(''.join(block), add_special_tokens=first)['input_ids']
+
+
+def iter_documents(paths: List[str], tokenizer, template: str = PROMPT_TEMPLATE,
+                   block_chars: int = 1 << 16) -> Iterator[Document]:
+    """Документы для оценки: строки JSONL (text или instruction/input/output, домены — tags)
+    и целые текстовые файлы (домен — имя файла)."""
+    for path in paths:
+        if path.endswith('.jsonl'):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    text = record.get('text')
+                    if text is None:
+                        text = template.format(
+                            instruction=record.get('instruction') or '',
+                            input=record.get('input') or '',
+                            output=record.get('output') or '',
+                        )
+                    tags = [str(tag) for tag in record.get('tags') or []]
+                    yield iter([tokenizer(text)['input_ids']]), tags
+        else:
+            yield _iter_text_tokens(path, tokenizer, block_chars), [Path(path).stem]
+
+
+def _rechunk(blocks: Iterator[List[int]], size: int) -> Iterator[List[int]]:
+    buffer: List[int] = []
+    for block in blocks:
+        buffer.extend(block)
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+
+class StreamingPerplexity:
+    """Перплексия, взвешенная по токенам, со скользящим окном и шагом stride.
+
+    Документ подаётся кусками по stride токенов; перед каждым куском
+    заново кодируются window - stride последних токенов документа, так что
+    каждый токен видит от window - stride до window - 1 токенов контекста —
+    ровно как при пересчёте окна с нуля. KV-кэш между кусками не
+    переиспользуется: обрезанный кэш неточен, потому что K/V верхних слоёв
+    посчитаны, пока отброшенные токены ещё были видны. Цена — каждый токен
+    кодируется примерно window / stride раз. Строки батча независимы: когда
+    документ в строке заканчивается, в неё сразу подаётся следующий.
+    Первый токен документа не оценивается — для него нет контекста.
+    """
+
+    def __init__(self, model, window: int = 1024, stride: int = 512, batch_size: int = 4,
+                 pad_token_id: int = 0, device: Optional[torch.device] = None):
+        if not 0 < stride <= window:
+            raise ValueError('Нужно 0 < stride <= window')
+        self.model = model
+        self.window = window
+        self.stride = stride
+        self.keep = window - stride
+        self.batch_size = batch_size
+        self.pad_token_id = pad_token_id
+        self.device = device or next(model.parameters()).device
+
+    def _next_row(self, documents: Iterator[Document]) -> Optional[Dict[str, Any]]:
+        document = next(documents, None)
+        if document is None:
+            return None
+        blocks, tags = document
+        return {'chunks': _rechunk(blocks, self.stride), 'tags': tags or [UNTAGGED],
+                'position': 0, 'context': [], 'last': None}
+
+    @torch.no_grad()
+    def evaluate(self, documents: Iterable[Document]) -> Dict[str, Any]:
+        documents = iter(documents)
+        rows: List[Optional[Dict[str, Any]]] = [None] * self.batch_size
+        totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        count_documents = 0
+        start = time.time()
+
+        while True:
+            chunks: List[List[int]] = []
+            for i in range(self.batch_size):
+                chunk = next(rows[i]['chunks'], None) if rows[i] is not None else None
+                while chunk is None:
+                    rows[i] = self._next_row(documents)
+                    if rows[i] is None:
+                        break
+                    count_documents += 1
+                    chunk = next(rows[i]['chunks'], None)
+                chunks.append(chunk or [])
+            if not any(chunks):
+                break
+
+            contexts = [rows[i]['context'] if chunk else [] for i, chunk in enumerate(chunks)]
+            length = max(len(context) + len(chunk) for context, chunk in zip(contexts, chunks))
+            input_ids = torch.full((self.batch_size, length), self.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros(self.batch_size, length, dtype=torch.long)
+            position_ids = torch.zeros(self.batch_size, length, dtype=torch.long)
+            for i, (context, chunk) in enumerate(zip(contexts, chunks)):
+                if not chunk:
+                    continue
+                # Паддинг справа: из-за causal-маски он не влияет на логиты настоящих токенов
+                tokens = context + chunk
+                input_ids[i, :len(tokens)] = torch.tensor(tokens, dtype=torch.long)
+                attention_mask[i, :len(tokens)] = 1
+                offset = rows[i]['position'] - len(context)
+                position_ids[i] = torch.arange(offset, offset + length)
+
+            outputs = self.model(
+                input_ids=input_ids.to(self.device),
+                attention_mask=attention_mask.to(self.device),
+                position_ids=position_ids.to(self.device),
+                use_cache=False,
+            )
+            for i, (context, chunk) in enumerate(zip(contexts, chunks)):
+                row = rows[i]
+                if not chunk:
+                    continue
+                begin = len(context)
+                # log_softmax по строке, а не по всему батчу: логиты [T, vocab] в fp32 и так велики
+                logprobs = torch.log_softmax(outputs.logits[i, begin:begin + len(chunk)].float(), dim=-1)
+                targets = torch.tensor(chunk[1:], dtype=torch.long, device=logprobs.device)
+                # Токены 1..n-1 куска предсказываются внутри него, токен 0 — по последнему логиту прошлого куска
+                nll = -logprobs[:-1].gather(-1, targets[:, None]).sum().item()
+                tokens = len(chunk) - 1
+                if row['last'] is not None:
+                    nll -= row['last'][chunk[0]].item()
+                    tokens += 1
+                for tag in row['tags'] + ['all']:
+                    totals[tag][0] += nll
+                    totals[tag][1] += tokens
+                row['last'] = logprobs[-1]
+                row['position'] += len(chunk)
+                row['context'] = (context + chunk)[-self.keep:] if self.keep > 0 else []
+
+        elapsed = time.time() - start
+        overall_nll, overall_tokens = totals.pop('all', [0.0, 0])
+        return {
+            'perplexity': math.exp(overall_nll / overall_tokens) if overall_tokens else float('nan'),
+            'nll': overall_nll / overall_tokens if overall_tokens else float('nan'),
+            'tokens': int(overall_tokens),
+            'documents': count_documents,
+            'window': self.window,
+            'stride': self.stride,
+            'elapsed_seconds': round(elapsed, 2),
+            'tokens_per_second': round(overall_tokens / elapsed, 1) if elapsed > 0 else None,
+            'domains': {
+                tag: {'perplexity': math.exp(nll / tokens), 'tokens': int(tokens)}
+                for tag, (nll, tokens) in sorted(totals.items()) if tokens
+            },
+        }
+
+
+def save_perplexity_report(result: Dict[str, Any], report_dir: str, config: Dict[str, Any]) -> Dict[str, str]:
+    """Отчёт через ReportBuilder: перплексия по доменам идёт в метрики, чтобы plot_reports строил их историю."""
+    from desktop.training.reports.report_builder import ReportBuilder
+
+    metrics = {'perplexity': result['perplexity'], 'tokens': result['tokens']}
+    for tag, domain in result['domains'].items():
+        metrics[f'perplexity/{tag}'] = domain['perplexity']
+    config = dict(config)
+    config.update({key: result[key] for key in ('window', 'stride', 'documents', 'elapsed_seconds', 'tokens_per_second')})
+    config['domain_tokens'] = {tag: domain['tokens'] for tag, domain in result['domains'].items()}
+    return ReportBuilder(report_dir).save(metrics, config)
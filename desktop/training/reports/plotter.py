@@ -42,3 +42,43 @@ class ReportPlotter:
         plt.close(fig)
         return output_path
 
+
+    def plot_throughput(self, records: List[Dict[str, float]], filename: str) -> str:
+        if not records:
+            raise ValueError('Нет данных о производительности')
+
+        steps = [record['step'] for record in records]
+        fig, (speed_ax, phase_ax, memory_ax) = plt.subplots(3, 1, figsize=(8, 10), sharex=True)
+
+        speed_ax.plot(steps, [record['tokens_per_second'] for record in records], label='tokens/s')
+        speed_ax.set_ylabel('Tokens/s')
+        speed_ax.set_title('Training throughput')
+        if all('mfu' in record for record in records):
+            mfu_ax = speed_ax.twinx()
+            mfu_ax.plot(steps, [record['mfu'] * 100 for record in records], color='tab:orange', label='MFU')
+            mfu_ax.set_ylabel('MFU, %')
+
+        bottom = [0.0] * len(records)
+        for phase in ('dataloader', 'forward', 'backward', 'optimizer'):
+            values = [record.get(f'{phase}_seconds', 0.0) for record in records]
+            phase_ax.bar(steps, values, bottom=bottom, label=phase, width=max(1, (steps[-1] - steps[0]) / (2 * len(steps))))
+            bottom = [b + v for b, v in zip(bottom, values)]
+        phase_ax.plot(steps, [record['seconds_per_step'] for record in records], color='black', label='step')
+        phase_ax.set_ylabel('Seconds per step')
+        phase_ax.legend()
+
+        memory_ax.plot(steps, [record['peak_rss_gb'] for record in records], label='peak RSS')
+        if all('peak_gpu_gb' in record for record in records):
+            memory_ax.plot(steps, [record['peak_gpu_gb'] for record in records], label='peak GPU')
+        memory_ax.set_xlabel('Step')
+        memory_ax.set_ylabel('GB')
+        memory_ax.legend()
+
+        for ax in (speed_ax, phase_ax, memory_ax):
+            ax.grid(True, alpha=0.3)
+
+        output_path = os.path.join(self.output_dir, filename)
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
+        return output_path
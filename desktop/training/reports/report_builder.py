@@ -1,7 +1,7 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 class ReportBuilder:
@@ -9,7 +9,7 @@ class ReportBuilder:
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def save(self, metrics: Dict[str, Any], config: Dict[str, Any]):
+    def save(self, metrics: Dict[str, Any], config: Dict[str, Any], throughput: Optional[Dict[str, Any]] = None):
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
         json_path = os.path.join(self.output_dir, f'report-{timestamp}.json')
         md_path = os.path.join(self.output_dir, f'report-{timestamp}.md')
@@ -18,6 +18,8 @@ class ReportBuilder:
             'metrics': metrics,
             'config': config
         }
+        if throughput:
+            payload['throughput'] = throughput
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(payload, f, ensure_ascii=False, indent=2)
         with open(md_path, 'w', encoding='utf-8') as f:
@@ -35,6 +37,11 @@ class ReportBuilder:
         lines.append("\n## Конфигурация\n")
         for key, value in payload['config'].items():
             lines.append(f"- {key}: {value}")
+        throughput = payload.get('throughput')
+        if throughput and throughput.get('summary'):
+            lines.append("\n## Производительность\n")
+            for key, value in throughput['summary'].items():
+                lines.append(f"- {key}: {value}")
         return '\n'.join(lines)
 
 
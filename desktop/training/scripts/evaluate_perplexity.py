@@ -0,0 +1,57 @@
+import argparse
+import os
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from desktop.training.perplexity import StreamingPerplexity, iter_documents, save_perplexity_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перплексия модели на длинных отложенных корпусах')
+    parser.add_argument('files', nargs='+', help='JSONL (по строкам, домены из tags) или текстовые файлы')
+    parser.add_argument('--model', default='models')
+    parser.add_argument('--adapter', default=None, help='каталог LoRA-адаптера')
+    parser.add_argument('--dtype', default='bfloat16', choices=['float32', 'float16', 'bfloat16'])
+    parser.add_argument('--window', type=int, default=1024)
+    parser.add_argument('--stride', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--reports', default=os.path.join('data', 'reports'))
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        args.model,
+        trust_remote_code=True,
+        torch_dtype=getattr(torch, args.dtype),
+        device_map='auto' if torch.cuda.is_available() else None,
+        low_cpu_mem_usage=True,
+    )
+    if args.adapter:
+        from peft import PeftModel
+        model = PeftModel.from_pretrained(model, args.adapter)
+    model.eval()
+
+    evaluator = StreamingPerplexity(
+        model,
+        window=args.window,
+        stride=args.stride,
+        batch_size=args.batch_size,
+        pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+    )
+    result = evaluator.evaluate(iter_documents(args.files, tokenizer))
+    print(f"Перплексия: {result['perplexity']:.3f} по {result['tokens']} токенам "
+          f"({result['tokens_per_second']} ток/с)")
+    for tag, domain in result['domains'].items():
+        print(f"  {tag}: {domain['perplexity']:.3f} ({domain['tokens']} токенов)")
+    report = save_perplexity_report(result, args.reports, {
+        'model_path': os.path.abspath(args.model),
+        'adapter': args.adapter,
+        'dtype': args.dtype,
+        'files': args.files,
+    })
+    print(f"Отчёт сохранён в {report['json']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import os
+from datetime import datetime
+
+from desktop.training.history_export import export_history_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Выгрузка истории чатов в датасет для дообучения')
+    parser.add_argument('--history-dir', default='data')
+    parser.add_argument('--output', default=os.path.join('data', 'datasets', 'history'))
+    parser.add_argument('--tags', nargs='*', default=None)
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None)
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None)
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--threshold', type=float, default=0.8, help='порог сходства для почти точных дубликатов')
+    parser.add_argument('--exact-only', action='store_true', help='только точные дубликаты, без MinHash')
+    parser.add_argument('--max-dedup-records', type=int, default=None,
+                        help='сколько записей держать в индексе дубликатов (~1,5 КБ на запись с MinHash)')
+    args = parser.parse_args()
+
+    manifest = export_history_dataset(
+        args.history_dir,
+        args.output,
+        tags=args.tags,
+        start=args.start,
+        end=args.end,
+        shard_size=args.shard_size,
+        near_duplicates=not args.exact_only,
+        threshold=args.threshold,
+        max_dedup_records=args.max_dedup_records,
+    )
+    stats = manifest['stats']
+    print(
+        f"Пар: {stats['pairs']}, отфильтровано: {stats['filtered']}, "
+        f"дубликатов: {stats['exact_duplicates']} точных и {stats['near_duplicates']} почти точных, "
+        f"записано: {stats['written']} в {len(manifest['dataset_paths'])} шардах"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,26 @@
 import json
 import os
+import tempfile
 from datetime import datetime
+from typing import Dict, Any, Optional
 
 
 class TrainingStatusWriter:
-    def __init__(self, status_file: str):
+    """Статус обучения в JSON, который читает MainWindow.
+
+    Файл заменяется атомарно (временный файл + os.replace), поэтому
+    читатель никогда не видит его наполовину записанным. Прогресс
+    дописывается в поле progress текущего статуса и построчно в
+    progress_file (JSONL).
+    """
+
+    def __init__(self, status_file: str, progress_file: Optional[str] = None):
         self.status_file = status_file
         os.makedirs(os.path.dirname(self.status_file), exist_ok=True)
+        if progress_file is None:
+            progress_file = os.path.join(os.path.dirname(self.status_file), 'training_progress.jsonl')
+        self.progress_file = progress_file
+        self._payload: Dict[str, Any] = {}
 
     def update(self, status: str, **kwargs):
         payload = {
@@ -14,6 +28,29 @@ class TrainingStatusWriter:
             'timestamp': datetime.utcnow().isoformat(),
         }
         payload.update(kwargs)
-        with open(self.status_file, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        self._payload = payload
+        self._write(payload)
+
+    def progress(self, **fields):
+        fields['timestamp'] = datetime.utcnow().isoformat()
+        payload = dict(self._payload or {'status': 'running'})
+        payload['timestamp'] = fields['timestamp']
+        payload['progress'] = fields
+        self._payload = payload
+        self._write(payload)
+        with open(self.progress_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(fields, ensure_ascii=False) + '\n')
 
+    def _write(self, payload: Dict[str, Any]):
+        directory = os.path.dirname(self.status_file)
+        fd, tmp_path = tempfile.mkstemp(prefix='.status-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.status_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,93 @@
+import hashlib
+import os
+from typing import Dict, Any, List, Optional, Union
+
+from datasets import Dataset, IterableDataset
+
+PROMPT_TEMPLATE = "Инструкция:\n{instruction}\nВвод:\n{input}\nОтвет:\n{output}"
+# Версия схемы токенизации: меняется вместе с tokenize_batch
+TOKENIZATION_VERSION = 1
+TOKENIZER_FILES = ('tokenizer.json', 'tokenizer_config.json', 'special_tokens_map.json', 'added_tokens.json')
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Хэш файлов токенизатора; без локальных файлов — имя, класс и размер словаря."""
+    digest = hashlib.sha1()
+    digest.update(f"{type(tokenizer).__name__}:{len(tokenizer)}".encode('utf-8'))
+    directory = getattr(tokenizer, 'name_or_path', '') or ''
+    names = set(TOKENIZER_FILES) | set(getattr(tokenizer, 'vocab_files_names', {}).values())
+    found = False
+    if os.path.isdir(directory):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                found = True
+                digest.update(name.encode('utf-8'))
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+    if not found:
+        digest.update(directory.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def tokenization_fingerprint(dataset: Dataset, tokenizer, template: str, max_seq_length: int) -> str:
+    key = '|'.join([
+        str(TOKENIZATION_VERSION),
+        dataset._fingerprint,
+        tokenizer_fingerprint(tokenizer),
+        template,
+        str(max_seq_length),
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def tokenize_batch(batch: Dict[str, List[Any]], tokenizer, template: str, max_seq_length: int) -> Dict[str, List[Any]]:
+    texts = [
+        template.format(instruction=instruction, input=input_text, output=output)
+        for instruction, input_text, output in zip(batch['instruction'], batch['input'], batch['output'])
+    ]
+    tokenized = tokenizer(texts, truncation=True, max_length=max_seq_length)
+    # Паддинг добавляет коллатор: до пакета или до самого длинного образца в батче
+    tokenized['labels'] = [list(ids) for ids in tokenized['input_ids']]
+    tokenized['length'] = [len(ids) for ids in tokenized['input_ids']]
+    return dict(tokenized)
+
+
+def tokenize_dataset(dataset: Union[Dataset, IterableDataset], tokenizer, max_seq_length: int,
+                     template: str = PROMPT_TEMPLATE, num_proc: Optional[int] = None,
+                     cache_dir: Optional[str] = None, batch_size: int = 1000) -> Union[Dataset, IterableDataset]:
+    """Пакетная токенизация в num_proc процессах с кэшем на диске.
+
+    Имя кэша выводится из отпечатка исходного датасета, файлов токенизатора,
+    шаблона промпта и max_seq_length, поэтому повторный запуск на тех же
+    данных читает готовый Arrow-файл и не токенизирует заново.
+    IterableDataset токенизируется лениво и не кэшируется.
+    """
+    fn_kwargs = {'tokenizer': tokenizer, 'template': template, 'max_seq_length': max_seq_length}
+    if isinstance(dataset, IterableDataset):
+        return dataset.map(tokenize_batch, batched=True, batch_size=batch_size,
+                           fn_kwargs=fn_kwargs, remove_columns=dataset.column_names)
+
+    fingerprint = tokenization_fingerprint(dataset, tokenizer, template, max_seq_length)
+    if cache_dir is None and dataset.cache_files:
+        cache_dir = os.path.dirname(dataset.cache_files[0]['filename'])
+    cache_file_name = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file_name = os.path.join(cache_dir, f'tokenized-{fingerprint}.arrow')
+    if num_proc is None:
+        num_proc = min(8, os.cpu_count() or 1)
+    num_proc = max(1, min(num_proc, len(dataset) // batch_size + 1))
+    return dataset.map(
+        tokenize_batch,
+        batched=True,
+        batch_size=batch_size,
+        num_proc=num_proc if num_proc > 1 else None,
+        fn_kwargs=fn_kwargs,
+        remove_columns=dataset.column_names,
+        new_fingerprint=fingerprint,
+        cache_file_name=cache_file_name,
+        load_from_cache_file=True,
+        desc='Токенизация',
+    )
@@ -1,8 +1,11 @@
 import os
 from typing import Dict, Any, Tuple
 
-from peft import LoraConfig, get_peft_model
-from transformers import AutoModelForCausalLM, AutoTokenizer, Trainer, TrainingArguments, DataCollatorForLanguageModeling
+import psutil
+import torch
+from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, Trainer, TrainingArguments
+from transformers.trainer_utils import get_last_checkpoint
 
 from desktop.training.config import TrainingConfig
 from desktop.training.dataset import ConversationDataset
@@ -11,6 +14,13 @@ from desktop.training.reports.report_builder import ReportBuilder
 from desktop.training.reports.plotter import ReportPlotter
 from desktop.training.evaluation import EvaluationRunner
 from desktop.training.status import TrainingStatusWriter
+from desktop.training.callbacks import StatusProgressCallback, ThroughputCallback
+from desktop.training.packing import pack_dataset, PackedSequenceCollator
+from desktop.training.batching import DynamicPaddingCollator
+from desktop.training.tokenization import tokenize_dataset, PROMPT_TEMPLATE
+from desktop.training.memory import (
+    resolve_memory_settings, estimate_training_memory, format_memory_plan, training_flops_per_token
+)
 
 
 class FineTuningTrainer:
@@ -20,21 +30,77 @@ class FineTuningTrainer:
         self.tokenizer = AutoTokenizer.from_pretrained(self.config.model_path, use_fast=True)
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
-        self.model = AutoModelForCausalLM.from_pretrained(self.config.model_path)
+        self.memory_settings = resolve_memory_settings(self.config, cuda_available=torch.cuda.is_available())
+        self.model_config = AutoConfig.from_pretrained(self.config.model_path, trust_remote_code=True)
+        self.memory_plan = self.print_memory_plan()
+        self.model = self._load_model()
         self.peft_config = LoraConfig(
             r=self.config.lora_r,
             lora_alpha=self.config.lora_alpha,
             lora_dropout=self.config.lora_dropout,
+            target_modules=self.memory_settings['lora_target_modules'],
             task_type="CAUSAL_LM"
         )
         self.model = get_peft_model(self.model, self.peft_config)
+        self.model.print_trainable_parameters()
         self.dataset_loader = ConversationDataset(
             dataset_path=self.config.dataset_path,
-            dataset_paths=self.config.dataset_paths
+            dataset_paths=self.config.dataset_paths,
+            cache_dir=self.config.dataset_cache_dir,
+            streaming=self.config.streaming
         )
         self.report_dir = self.config.report_dir or self.config.output_dir
         status_file = self.config.status_file or os.path.join(self.report_dir, 'training_status.json')
         self.status_writer = TrainingStatusWriter(status_file)
+        self.packing_stats: Dict[str, Any] = {}
+
+    def print_memory_plan(self) -> Dict[str, float]:
+        plan = estimate_training_memory(
+            self.model_config,
+            self.memory_settings,
+            self.config.lora_r,
+            self.config.per_device_train_batch_size,
+            self.config.max_seq_length
+        )
+        if torch.cuda.is_available():
+            available_gb = torch.cuda.get_device_properties(0).total_memory / 1024 ** 3
+        else:
+            available_gb = psutil.virtual_memory().available / 1024 ** 3
+        print(format_memory_plan(plan, self.memory_settings, available_gb), flush=True)
+        return plan
+
+    def _load_model(self):
+        quantization = self.memory_settings['quantization']
+        load_kwargs: Dict[str, Any] = {
+            'trust_remote_code': True,
+            'torch_dtype': torch.bfloat16,
+            'low_cpu_mem_usage': True,
+        }
+        if quantization == '4bit':
+            load_kwargs['quantization_config'] = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type='nf4',
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_compute_dtype=torch.bfloat16,
+                llm_int8_skip_modules=['lm_head'],
+            )
+        elif quantization == '8bit':
+            load_kwargs['quantization_config'] = BitsAndBytesConfig(load_in_8bit=True, llm_int8_skip_modules=['lm_head'])
+        model = AutoModelForCausalLM.from_pretrained(self.config.model_path, **load_kwargs)
+        checkpointing = self.memory_settings['gradient_checkpointing']
+        if quantization:
+            model = prepare_model_for_kbit_training(
+                model,
+                use_gradient_checkpointing=checkpointing,
+                gradient_checkpointing_kwargs={'use_reentrant': False}
+            )
+        elif checkpointing:
+            model.gradient_checkpointing_enable(gradient_checkpointing_kwargs={'use_reentrant': False})
+            # Замороженные эмбеддинги не дают градиент на вход — без него чекпоинтинг не пропустит градиент к LoRA
+            model.enable_input_require_grads()
+        if checkpointing:
+            model.config.use_cache = False
+        return model
 
     def build_training_arguments(self) -> TrainingArguments:
         return TrainingArguments(
@@ -50,36 +116,75 @@ class FineTuningTrainer:
             save_total_limit=2,
             report_to="none",
             remove_unused_columns=False,
+            group_by_length=self.length_grouped,
+            length_column_name='length',
         )
 
-    def tokenize_function(self, sample: Dict[str, str]) -> Dict[str, Any]:
-        input_text = f"Инструкция:\n{sample['instruction']}\nВвод:\n{sample['input']}\nОтвет:\n{sample['output']}"
-        tokenized = self.tokenizer(
-            input_text,
-            truncation=True,
-            max_length=self.config.max_seq_length,
-            padding="max_length",
+    @property
+    def packing(self) -> bool:
+        # Упаковке и группировке по длине нужен весь датасет, потоковому режиму они недоступны
+        return self.config.packing and not self.config.streaming
+
+    @property
+    def length_grouped(self) -> bool:
+        return self.config.group_by_length and not self.config.packing and not self.config.streaming
+
+    def tokenize(self, dataset):
+        return tokenize_dataset(
+            dataset,
+            self.tokenizer,
+            self.config.max_seq_length,
+            template=self.config.prompt_template or PROMPT_TEMPLATE,
+            num_proc=self.config.tokenization_num_proc,
+            cache_dir=self.config.dataset_cache_dir,
         )
-        tokenized["labels"] = tokenized["input_ids"].copy()
-        return tokenized
 
     def _prepare_datasets(self) -> Tuple[Any, Any]:
         raw_dataset = self.dataset_loader.load()
         dataset_dict = None
         eval_dataset = None
         if self.config.eval_dataset_path:
-            eval_loader = ConversationDataset(dataset_path=self.config.eval_dataset_path)
+            eval_loader = ConversationDataset(
+                dataset_path=self.config.eval_dataset_path,
+                cache_dir=self.config.dataset_cache_dir,
+                streaming=self.config.streaming
+            )
             eval_dataset = eval_loader.load()
+        elif self.config.streaming:
+            dataset_dict = {
+                'train': raw_dataset.skip(self.config.eval_holdout),
+                'test': raw_dataset.take(self.config.eval_holdout),
+            }
         else:
-            dataset_dict = raw_dataset.train_test_split(test_size=0.1)
+            # Фиксированный seed даёт тот же сплит и тот же отпечаток — кэш токенизации переиспользуется
+            dataset_dict = raw_dataset.train_test_split(test_size=0.1, seed=42)
         train_dataset = dataset_dict['train'] if dataset_dict else raw_dataset
         eval_dataset = dataset_dict['test'] if dataset_dict else eval_dataset
-        tokenized_train = train_dataset.map(self.tokenize_function, remove_columns=train_dataset.column_names)
+        tokenized_train = self.tokenize(train_dataset)
         tokenized_eval = None
         if eval_dataset:
-            tokenized_eval = eval_dataset.map(self.tokenize_function, remove_columns=eval_dataset.column_names)
+            tokenized_eval = self.tokenize(eval_dataset)
+        if self.packing:
+            tokenized_train, self.packing_stats['train'] = pack_dataset(tokenized_train, self.config.max_seq_length)
+            if tokenized_eval is not None:
+                tokenized_eval, self.packing_stats['eval'] = pack_dataset(tokenized_eval, self.config.max_seq_length)
         return tokenized_train, tokenized_eval
 
+    def build_data_collator(self):
+        if self.packing:
+            return PackedSequenceCollator(self.tokenizer.pad_token_id, mask_dtype=self.model.dtype)
+        return DynamicPaddingCollator(self.tokenizer.pad_token_id, self.config.pad_to_multiple_of)
+
+    def _batching_summary(self, data_collator) -> Dict[str, Any]:
+        if self.packing:
+            mode = 'packing'
+        else:
+            mode = 'length_grouped' if self.length_grouped else 'dynamic_padding'
+        summary: Dict[str, Any] = {'mode': mode, **self.packing_stats}
+        # Доля настоящих токенов в батчах, которые реально прошли через модель
+        summary['batch_efficiency'] = round(data_collator.efficiency, 4)
+        return summary
+
     def _collect_history(self, log_history):
         metric_history: Dict[str, list] = {}
         for entry in log_history:
@@ -91,22 +196,38 @@ class FineTuningTrainer:
                     metric_history.setdefault(key, []).append({'step': step, 'value': entry[key]})
         return metric_history
 
+    def find_resume_checkpoint(self):
+        if not self.config.resume or not os.path.isdir(self.config.output_dir):
+            return None
+        return get_last_checkpoint(self.config.output_dir)
+
     def run(self):
         train_dataset, eval_dataset = self._prepare_datasets()
-        data_collator = DataCollatorForLanguageModeling(self.tokenizer, mlm=False)
+        data_collator = self.build_data_collator()
+        throughput = ThroughputCallback(
+            lambda: data_collator.real_tokens,
+            flops_per_token=training_flops_per_token(self.model_config, self.memory_settings['gradient_checkpointing']),
+            peak_tflops=self.config.peak_tflops
+        )
         trainer = Trainer(
             model=self.model,
             args=self.build_training_arguments(),
             train_dataset=train_dataset,
             eval_dataset=eval_dataset,
             data_collator=data_collator,
+            callbacks=[StatusProgressCallback(self.status_writer, lambda: data_collator.real_tokens), throughput],
         )
-        self.status_writer.update('running', message='Обучение запущено')
+        checkpoint = self.find_resume_checkpoint()
+        if checkpoint:
+            message = f'Обучение продолжено с {os.path.basename(checkpoint)}'
+        else:
+            message = 'Обучение запущено'
+        self.status_writer.update('running', message=message, checkpoint=checkpoint, packing=self.packing_stats)
         metrics = {}
         try:
-            trainer.train()
+            trainer.train(resume_from_checkpoint=checkpoint)
             if eval_dataset:
-                evaluator = EvaluationRunner(trainer, self.config.evaluation_metric)
+                evaluator = EvaluationRunner(trainer, self.config.evaluation_metric, group_by_length=self.length_grouped)
                 metrics = evaluator.run()
             trainer.save_model(self.config.output_dir)
             self.tokenizer.save_pretrained(self.config.output_dir)
@@ -115,14 +236,21 @@ class FineTuningTrainer:
                 'max_steps': self.config.max_steps,
                 'learning_rate': self.config.learning_rate,
                 'dataset_paths': self.config.dataset_paths or [self.config.dataset_path],
-                'eval_dataset_path': self.config.eval_dataset_path
-            })
+                'eval_dataset_path': self.config.eval_dataset_path,
+                'memory': {**self.memory_settings, 'estimated_peak_gb': round(self.memory_plan['peak_gb'], 1)},
+                'batching': self._batching_summary(data_collator)
+            }, throughput={'summary': throughput.summary(), 'history': throughput.records})
             history = self._collect_history(trainer.state.log_history)
             if history:
                 plotter = ReportPlotter(self.report_dir)
                 plot_name = f"metrics-{report_meta['timestamp']}.png"
                 plot_path = plotter.plot_metrics(history, plot_name)
                 report_meta['plot'] = plot_path
+            if throughput.records:
+                plotter = ReportPlotter(self.report_dir)
+                report_meta['throughput_plot'] = plotter.plot_throughput(
+                    throughput.records, f"throughput-{report_meta['timestamp']}.png"
+                )
             self.status_writer.update('completed', metrics=metrics, report=report_meta.get('json'))
         except Exception as exc:
             self.status_writer.update('failed', error=str(exc))
@@ -6,6 +6,7 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt5.QtGui import QTextCursor, QTextCharFormat, QColor, QIcon
 import os
+import threading
 from typing import Optional, List
 import datetime
 
@@ -34,6 +35,7 @@ logger = get_logger('desktop.ui.chat_widget')
 class ResponseThread(QThread):
     
     response_ready = pyqtSignal(str)
+    token_received = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
     
     def __init__(self, neural_network: NeuralNetwork, user_input: str):
@@ -42,13 +44,23 @@ class ResponseThread(QThread):
         self.neural_network = neural_network
         self.user_input = user_input
         self._is_cancelled = False
+        # Событие отмены живёт столько же, сколько запрос, и не сбрасывается при старте генерации
+        self._stop_event = threading.Event()
         self._start_time: Optional[float] = None
         
     def cancel(self) -> None:
         
         self._is_cancelled = True
+        self._stop_event.set()
+        # Генерация останавливается между токенами; процесс модели при необходимости перезапускается
+        self.neural_network.cancel_generation()
         logger.debug("Генерация ответа отменена")
         
+    def _emit_token(self, text: str) -> None:
+        # Вызывается из потока генерации; сигнал доставляется в GUI-поток через очередь Qt
+        if not self._is_cancelled:
+            self.token_received.emit(text)
+        
     def run(self) -> None:
         
         if self._is_cancelled:
@@ -60,11 +72,13 @@ class ResponseThread(QThread):
             
         try:
             logger.debug(f"Начало генерации ответа для сообщения длиной {len(self.user_input)}")
-            response = self.neural_network.generate_response(self.user_input)
+            response = self.neural_network.generate_response(
+                self.user_input, on_token=self._emit_token, stop_event=self._stop_event
+            )
             
             if not self._is_cancelled:
                 response_time = time.time() - self._start_time
-                metrics.record_response(response_time, success=True)
+                metrics.record_response(response_time, success=True, stages=self.neural_network.last_timings)
                 self.response_ready.emit(response)
                 logger.debug(f"Ответ успешно сгенерирован за {response_time:.2f}с, длина: {len(response)}")
         except Exception as e:
@@ -85,6 +99,7 @@ class ChatWidget(QWidget):
         self.neural_network = neural_network
         self.chat_history = ChatHistory()
         self.response_thread: Optional[ResponseThread] = None
+        self._streaming = False
         self.loading_timer = QTimer()
         self.loading_timer.timeout.connect(self.update_loading_indicator)
         self.loading_dots = 0
@@ -263,7 +278,9 @@ class ChatWidget(QWidget):
         self.draft_manager.clear_draft()
         
         self.response_thread = ResponseThread(self.neural_network, user_message)
+        self._streaming = False
         self.response_thread.response_ready.connect(self.on_response_received)
+        self.response_thread.token_received.connect(self.on_token_received)
         self.response_thread.error_occurred.connect(self.on_error_occurred)
         self.response_thread.finished.connect(self.on_thread_finished)
         self.response_thread.start()
@@ -292,9 +309,22 @@ class ChatWidget(QWidget):
         
         return None
         
+    def on_token_received(self, text):
+        if not self._streaming:
+            self._streaming = True
+            self.hide_loading_indicator()
+            self.add_bot_message('', self.pending_tags)
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.chat_display.setTextCursor(cursor)
+        
     def on_response_received(self, response):
         self.hide_loading_indicator()
-        self.add_bot_message(response, self.pending_tags)
+        if not self._streaming:
+            # Ответ из кэша или без потоковой выдачи приходит целиком
+            self.add_bot_message(response, self.pending_tags)
+        self._streaming = False
         self.chat_history.add_message('assistant', response, tags=self.pending_tags)
         self.chat_history.save_history()
         
@@ -368,11 +398,9 @@ class ChatWidget(QWidget):
         if self.response_thread and self.response_thread.isRunning():
             logger.info("Остановка активного потока генерации")
             self.response_thread.cancel()
-            self.response_thread.wait(3000)
-            if self.response_thread.isRunning():
-                logger.warning("Поток не завершился, принудительное завершение")
-                self.response_thread.terminate()
-                self.response_thread.wait(1000)
+            # terminate() посреди вызова torch может оставить блокировки захваченными
+            if not self.response_thread.wait(10000):
+                logger.warning("Поток генерации не завершился после отмены")
         
         self.response_thread = None
         
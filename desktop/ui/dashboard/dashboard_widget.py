@@ -61,6 +61,21 @@ class DashboardWidget(QWidget):
         self.analytics_box.setStyleSheet('QWidget { border: 1px solid #ddd; border-radius: 4px; background: white; }')
         grid.addWidget(self.analytics_box, 2, 0, 1, 2)
 
+        self.latency_box = QWidget()
+        latency_layout = QVBoxLayout()
+        latency_layout.setContentsMargins(12, 12, 12, 12)
+        latency_layout.setSpacing(4)
+        self.latency_box.setLayout(latency_layout)
+        latency_title = QLabel('Задержки (p50 · p90 · p99)')
+        latency_title.setStyleSheet('font-size:13px; font-weight:bold;')
+        self.latency_label = QLabel('Нет данных по задержкам.')
+        self.latency_label.setWordWrap(True)
+        self.latency_label.setStyleSheet('color: #666; font-size:11px;')
+        latency_layout.addWidget(latency_title)
+        latency_layout.addWidget(self.latency_label)
+        self.latency_box.setStyleSheet('QWidget { border: 1px solid #ddd; border-radius: 4px; background: white; }')
+        grid.addWidget(self.latency_box, 3, 0, 1, 2)
+
     def update_card(self, key: str, value: str, subtitle: str = ''):
         if key in self.cards:
             self.cards[key].update_value(value, subtitle)
@@ -71,3 +86,9 @@ class DashboardWidget(QWidget):
         else:
             self.analytics_label.setText('\n'.join(lines))
 
+    def update_latency(self, lines: List[str]):
+        if not lines:
+            self.latency_label.setText('Нет данных по задержкам.')
+        else:
+            self.latency_label.setText('\n'.join(lines))
+
@@ -8,7 +8,7 @@ class StatisticsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('Статистика')
-        self.setMinimumSize(600, 500)
+        self.setMinimumSize(600, 620)
         self.setModal(True)
         
         layout = QVBoxLayout()
@@ -35,7 +35,7 @@ class StatisticsDialog(QDialog):
         
     def update_statistics(self, sessions: str, messages: str, plugins: str, training: str, 
                          sessions_subtitle: str = '', messages_subtitle: str = '', 
-                         analytics_lines: List[str] = None):
+                         analytics_lines: List[str] = None, latency_lines: List[str] = None):
         
         self.dashboard.update_card('sessions', sessions, sessions_subtitle)
         self.dashboard.update_card('messages', messages, messages_subtitle)
@@ -45,4 +45,5 @@ class StatisticsDialog(QDialog):
             self.dashboard.update_analytics(analytics_lines)
         else:
             self.dashboard.update_analytics([])
+        self.dashboard.update_latency(latency_lines or [])
 
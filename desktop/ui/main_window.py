@@ -28,10 +28,12 @@ from desktop.shortcuts.actions import QuickActionsManager, QuickAction
 from desktop.shortcuts.quick_actions_dialog import QuickActionsDialog
 from desktop.ui.dashboard.statistics_dialog import StatisticsDialog
 from desktop.ui.monitoring.monitor_dialog import MonitorDialog
+from desktop.ui.monitoring.cache_dialog import CacheStatsDialog
 from desktop.utils.logger import get_logger
+from desktop.utils.metrics import get_metrics_collector
 from desktop.utils.constants import (
     MONITOR_UPDATE_INTERVAL, TRAINING_STATUS_UPDATE_INTERVAL,
-    VRAM_WARNING_THRESHOLD
+    MODEL_STATE_UPDATE_INTERVAL, VRAM_WARNING_THRESHOLD
 )
 
 logger = get_logger('desktop.ui.main_window')
@@ -43,6 +45,9 @@ class MainWindow(QMainWindow):
         self.theme_manager = ThemeManager()
         self.theme_manager.set_accent_color(self.settings.get_accent_color())
         self.neural_network = NeuralNetwork(settings=self.settings)
+        self.metrics_config = self.settings.get_metrics_config()
+        # Перцентили и счётчики продолжаются с прошлых запусков
+        get_metrics_collector().attach_storage(self.metrics_config['path'])
         self.user_repository = user_repository
         
         # Флаг для показа диалога загрузки модели
@@ -73,13 +78,19 @@ class MainWindow(QMainWindow):
         self.monitor_timer.timeout.connect(self.refresh_metrics)
         self.training_timer = QTimer(self)
         self.training_timer.timeout.connect(self._update_training_status_label)
+        self.model_state_timer = QTimer(self)
+        self.model_state_timer.timeout.connect(self._update_model_state)
         self.init_ui()
         self.load_window_state()
         self.apply_theme(self.settings.get_theme())
         self.statistics_dialog = None
         self.monitor_timer.start(MONITOR_UPDATE_INTERVAL)
         self.training_timer.start(TRAINING_STATUS_UPDATE_INTERVAL)
+        self.model_state_timer.start(MODEL_STATE_UPDATE_INTERVAL)
         logger.info("MainWindow инициализирован")
+        self._update_model_state()
+        # Ядра инференса отдаются модели, GUI-поток остаётся на зарезервированных
+        self.neural_network.model_manager.runtime.pin_ui_thread()
         self._update_training_status_label()
         self._update_dashboard_metrics()
         
@@ -191,6 +202,9 @@ class MainWindow(QMainWindow):
         self.user_admin_action = QAction('Управление пользователями', self)
         self.user_admin_action.triggered.connect(self.open_user_admin)
         tools_menu.addAction(self.user_admin_action)
+        self.cache_stats_action = QAction('Кэш ответов', self)
+        self.cache_stats_action.triggered.connect(self.open_cache_stats)
+        tools_menu.addAction(self.cache_stats_action)
         quick_actions_action = QAction('Быстрые действия', self)
         quick_actions_action.triggered.connect(self.open_quick_actions)
         tools_menu.addAction(quick_actions_action)
@@ -275,10 +289,20 @@ class MainWindow(QMainWindow):
             self.monitor_timer.stop()
         if self.training_timer.isActive():
             self.training_timer.stop()
+        if self.model_state_timer.isActive():
+            self.model_state_timer.stop()
         
         if hasattr(self, 'chat_widget') and self.chat_widget:
             self.chat_widget.cleanup()
         
+        if hasattr(self, 'neural_network') and self.neural_network:
+            self.neural_network.shutdown()
+        
+        try:
+            get_metrics_collector().save()
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить метрики: {e}")
+        
         try:
             if hasattr(self, 'neural_network') and self.neural_network:
                 model_manager = getattr(self.neural_network, 'model_manager', None)
@@ -317,6 +341,11 @@ class MainWindow(QMainWindow):
         else:
             self.current_user_role = 'user'
             self.status_panel.set_user('—', self.current_user_role)
+        user_adapter = None
+        if self.current_user and self.user_repository:
+            role_defaults = self.settings.get_adapter_config().get('role_defaults', {})
+            user_adapter = self.user_repository.resolve_adapter(self.current_user['id'], role_defaults)
+        self.neural_network.set_user_adapter(user_adapter)
         self._refresh_plugin_manager()
         self._update_role_dependent_actions()
 
@@ -343,6 +372,13 @@ class MainWindow(QMainWindow):
         dialog.exec_()
         self._load_current_user()
 
+    def open_cache_stats(self):
+        if self.current_user_role != 'admin':
+            QMessageBox.warning(self, 'Недостаточно прав', 'Статистика кэша доступна только администратору.')
+            return
+        dialog = CacheStatsDialog(self.neural_network, self)
+        dialog.exec_()
+
     def open_quick_actions(self):
         dialog = QuickActionsDialog(self.quick_actions, self)
         dialog.exec_()
@@ -388,9 +424,23 @@ class MainWindow(QMainWindow):
             training=self._latest_training_status or 'нет данных',
             sessions_subtitle=f'+{len(sessions_today)} сегодня',
             messages_subtitle=f'+{messages_today} сегодня',
-            analytics_lines=analytics_lines
+            analytics_lines=analytics_lines,
+            latency_lines=self._latency_lines()
         )
 
+    def _latency_lines(self) -> List[str]:
+        percentiles = get_metrics_collector().get_percentile_stats()
+        labels = {'5m': '5 мин', '1h': '1 ч', 'all': 'всё время'}
+        lines = []
+        for name, title, unit, fmt in (('latency', 'Ответ', 'с', '.2f'), ('ttft', 'Первый токен', 'с', '.2f'),
+                                       ('tokens_per_second', 'Токенов/с', '', '.1f')):
+            for window, summary in percentiles[name].items():
+                if not summary['count']:
+                    continue
+                values = ' · '.join(f"{q} {summary[q]:{fmt}}{unit}" for q in ('p50', 'p90', 'p99'))
+                lines.append(f"{title}, {labels[window]}: {values} (n={summary['count']})")
+        return lines
+
     def verify_models(self):
         result = self.update_manager.verify_models()
         QMessageBox.information(self, 'Проверка модели', result['details'])
@@ -413,6 +463,9 @@ class MainWindow(QMainWindow):
                 f"Время: {timestamp}",
                 f"Сообщение: {message}"
             ]
+            progress = payload.get('progress')
+            if progress:
+                lines.append(f"Прогресс: {self._format_training_progress(progress)}")
             if metrics:
                 lines.append(f"Метрики: {metrics}")
             text = '\n'.join(lines)
@@ -426,6 +479,7 @@ class MainWindow(QMainWindow):
         self.status_panel.update_metrics(metrics)
         self._check_vram(metrics)
         self.status_bar.showMessage('Мониторинг обновлён')
+        get_metrics_collector().maybe_save(self.metrics_config.get('save_interval', 60))
         self._update_dashboard_metrics()
 
     def _show_model_loading_dialog(self):
@@ -445,6 +499,11 @@ class MainWindow(QMainWindow):
             logger.exception(f"Ошибка показа диалога загрузки модели: {e}")
     
     def reload_model(self):
+        model_manager = self.neural_network.model_manager
+        if getattr(model_manager, 'is_remote', False):
+            model_manager.restart()
+            QMessageBox.information(self, 'Перезагрузка модели', 'Процесс модели перезапущен, загрузка идёт в фоне.')
+            return
         try:
             from desktop.ui.model_loading_dialog import ModelLoadingDialog
             dialog = ModelLoadingDialog(self.neural_network.model_manager, self)
@@ -486,6 +545,16 @@ class MainWindow(QMainWindow):
     def _update_role_dependent_actions(self):
         if hasattr(self, 'user_admin_action'):
             self.user_admin_action.setVisible(self.current_user_role == 'admin')
+        if hasattr(self, 'cache_stats_action'):
+            self.cache_stats_action.setVisible(self.current_user_role == 'admin')
+
+    def _update_model_state(self):
+        model_manager = getattr(self.neural_network, 'model_manager', None)
+        if model_manager is None:
+            return
+        state = getattr(model_manager, 'state', None)
+        value = getattr(state, 'value', state) or ''
+        self.status_panel.set_model_state(value, getattr(model_manager, 'state_message', '') or '')
 
     def _update_training_status_label(self):
         status_path, raw, payload = self._get_training_status_payload()
@@ -496,9 +565,11 @@ class MainWindow(QMainWindow):
             status = payload.get('status', 'неизвестно')
             icon = self._status_indicator(status)
             timestamp = payload.get('timestamp')
-            summary = payload.get('message') or payload.get('details') or ''
+            summary = (payload.get('message') or payload.get('details') or '')[:30]
+            if payload.get('progress') and status == 'running':
+                summary = self._format_training_progress(payload['progress'])
             suffix = f" · {timestamp}" if timestamp else ''
-            text = f'{icon} Обучение: {status}{suffix} {summary[:30]}'
+            text = f'{icon} Обучение: {status}{suffix} {summary}'
             self.training_status_label.setText(text)
             self._latest_training_status = f'{icon} {status}'
         elif raw:
@@ -559,6 +630,17 @@ class MainWindow(QMainWindow):
             payload = None
         return status_path, data, payload
 
+    def _format_training_progress(self, progress: Dict[str, Any]) -> str:
+        parts = [f"шаг {progress.get('step', '?')}/{progress.get('max_steps', '?')}"]
+        if progress.get('loss') is not None:
+            parts.append(f"loss {progress['loss']:.3f}")
+        if progress.get('tokens_per_second'):
+            parts.append(f"{progress['tokens_per_second']:.0f} ток/с")
+        if progress.get('eta_seconds') is not None:
+            minutes = int(progress['eta_seconds'] // 60)
+            parts.append(f"ETA {minutes // 60}ч {minutes % 60:02d}м")
+        return ', '.join(parts)
+
     def _status_indicator(self, status: str) -> str:
         normalized = (status or '').lower()
         if normalized in ('completed', 'success', 'done'):
@@ -52,6 +52,11 @@ class ModelLoadingThread(QThread):
             
             resolved_path = os.path.abspath(self.model_manager.model_path)
             self.progress_signal.emit(f"Путь к модели: {resolved_path}")
+            from desktop.core.model_manager import ModelState
+            from desktop.core.precision import to_torch_dtype, apply_compute_dtype
+            self.model_manager.set_state(ModelState.LOADING)
+            self.model_manager.runtime.apply()
+            self.model_manager.runtime.pin_inference_thread()
             
             # Шаг 1: Загрузка токенизатора
             self.progress_signal.emit("Шаг 1/2: Загрузка токенизатора...")
@@ -73,6 +78,7 @@ class ModelLoadingThread(QThread):
                 self.progress_signal.emit(f"[OK] Токенизатор загружен ({elapsed:.1f} сек)")
             except Exception as e:
                 error_msg = f"Ошибка загрузки токенизатора: {str(e)}"
+                self.model_manager.set_state(ModelState.DEGRADED, error_msg)
                 self.error_signal.emit(error_msg)
                 self.finished_signal.emit(False, error_msg)
                 return
@@ -91,20 +97,22 @@ class ModelLoadingThread(QThread):
                 self.progress_signal.emit("Загрузка может занять много времени, подождите...")
                 model_start = time.time()
                 
+                storage_dtype, compute_dtype = self.model_manager.select_dtypes('cpu')
+                self.progress_signal.emit(f"Точность: хранение {storage_dtype}, вычисления {compute_dtype}")
                 model = AutoModelForCausalLM.from_pretrained(
                     resolved_path,
                     trust_remote_code=True,
-                    dtype=torch.float16,
+                    dtype=to_torch_dtype(storage_dtype),
                     low_cpu_mem_usage=True
                 )
                 
                 self.progress_signal.emit("Перемещение модели на CPU...")
                 model = model.to('cpu')
-                model.eval()
+                apply_compute_dtype(model, storage_dtype, compute_dtype)
+                self.model_manager.storage_dtype = storage_dtype
+                self.model_manager.compute_dtype = compute_dtype
                 
-                self.model_manager.model = model
-                self.model_manager.device = torch.device('cpu')
-                self.model_manager.is_fallback = False
+                self.model_manager.install_model(model, torch.device('cpu'))
                 
                 elapsed = time.time() - model_start
                 total_time = time.time() - start_time
@@ -114,11 +122,14 @@ class ModelLoadingThread(QThread):
                 self.progress_signal.emit("=" * 60)
                 self.progress_signal.emit(f"Время загрузки модели: {elapsed/60:.1f} минут ({elapsed:.0f} секунд)")
                 self.progress_signal.emit(f"Общее время: {total_time/60:.1f} минут ({total_time:.0f} секунд)")
+                self.progress_signal.emit("Запуск фонового прогрева модели...")
+                self.model_manager.start_warmup()
                 
                 self.finished_signal.emit(True, "Модель успешно загружена!")
                 
             except Exception as e:
                 error_msg = f"Ошибка загрузки модели: {str(e)}"
+                self.model_manager.set_state(ModelState.DEGRADED, error_msg)
                 self.error_signal.emit(error_msg)
                 import traceback
                 self.error_signal.emit(f"Детали: {traceback.format_exc()}")
@@ -0,0 +1,90 @@
+from typing import Optional
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QFormLayout,
+    QLabel,
+    QHBoxLayout,
+    QPushButton,
+    QMessageBox,
+    QWidget,
+)
+
+from desktop.core.neural_network import NeuralNetwork
+
+
+class CacheStatsDialog(QDialog):
+    def __init__(self, neural_network: NeuralNetwork, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.neural_network = neural_network
+        self.setWindowTitle('Кэш ответов')
+        self.resize(420, 300)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._update_stats)
+        self._init_ui()
+        self._update_stats()
+        self._timer.start(2000)
+
+    def _init_ui(self):
+        layout = QVBoxLayout()
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+        self.setLayout(layout)
+
+        self.status_label = QLabel('')
+        layout.addWidget(self.status_label)
+
+        form = QFormLayout()
+        self.hit_rate_label = QLabel('—')
+        self.memory_hits_label = QLabel('0')
+        self.disk_hits_label = QLabel('0')
+        self.semantic_hits_label = QLabel('0')
+        self.misses_label = QLabel('0')
+        self.entries_label = QLabel('—')
+        self.semantic_entries_label = QLabel('—')
+        form.addRow('Доля попаданий', self.hit_rate_label)
+        form.addRow('Попадания (память)', self.memory_hits_label)
+        form.addRow('Попадания (диск)', self.disk_hits_label)
+        form.addRow('Попадания (семантические)', self.semantic_hits_label)
+        form.addRow('Промахи', self.misses_label)
+        form.addRow('Записей (память / диск)', self.entries_label)
+        form.addRow('Записей в семантическом индексе', self.semantic_entries_label)
+        layout.addLayout(form)
+
+        button_row = QHBoxLayout()
+        button_row.addStretch()
+        self.clear_button = QPushButton('Очистить кэш')
+        self.clear_button.clicked.connect(self._clear_cache)
+        self.close_button = QPushButton('Закрыть')
+        self.close_button.clicked.connect(self.close)
+        button_row.addWidget(self.clear_button)
+        button_row.addWidget(self.close_button)
+        layout.addLayout(button_row)
+
+    def _update_stats(self):
+        stats = self.neural_network.get_cache_stats()
+        if stats.get('enabled'):
+            mode = 'точный + семантический' if stats.get('semantic_enabled') else 'точный'
+            self.status_label.setText(f'Кэш включён: {mode}')
+        else:
+            self.status_label.setText('Кэш отключён в настройках (cache.enabled)')
+        by_tier = stats.get('cache_hits_by_tier', {})
+        self.hit_rate_label.setText(f"{stats.get('cache_hit_rate', 0.0):.1f}%")
+        self.memory_hits_label.setText(str(by_tier.get('memory', 0)))
+        self.disk_hits_label.setText(str(by_tier.get('disk', 0)))
+        self.semantic_hits_label.setText(str(by_tier.get('semantic', 0)))
+        self.misses_label.setText(str(stats.get('cache_misses', 0)))
+        self.entries_label.setText(f"{stats.get('memory_entries', 0)} / {stats.get('disk_entries', 0)}")
+        if stats.get('semantic_enabled'):
+            self.semantic_entries_label.setText(
+                f"{stats.get('semantic_entries', 0)} (порог {stats.get('semantic_threshold', 0):.2f})"
+            )
+        else:
+            self.semantic_entries_label.setText('—')
+
+    def _clear_cache(self):
+        self.neural_network.clear_response_cache()
+        self._update_stats()
+        QMessageBox.information(self, 'Кэш ответов', 'Кэш очищен.')
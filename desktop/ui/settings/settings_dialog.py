@@ -21,6 +21,7 @@ from PyQt5.QtCore import Qt
 
 from desktop.config.settings import Settings
 from desktop.core.neural_network import NeuralNetwork
+from desktop.core.precision import COMPUTE_DTYPE_CHOICES
 from desktop.appearance.palette_manager import PaletteManager
 
 
@@ -96,6 +97,11 @@ class SettingsDialog(QDialog):
         self.theme_combo.addItems(['light', 'dark'])
         layout.addRow('Тема', self.theme_combo)
 
+        self.compute_dtype_combo = QComboBox()
+        self.compute_dtype_combo.addItems(list(COMPUTE_DTYPE_CHOICES))
+        self.compute_dtype_combo.setToolTip('Применяется при следующей загрузке модели')
+        layout.addRow('Точность вычислений', self.compute_dtype_combo)
+
         self.info_label = QLabel()
         self.info_label.setWordWrap(True)
         layout.addRow('Информация о модели', self.info_label)
@@ -204,6 +210,7 @@ class SettingsDialog(QDialog):
     def _load_data(self):
         self.model_path_edit.setText(self.settings.get_model_path())
         self.theme_combo.setCurrentText(self.settings.get_theme())
+        self.compute_dtype_combo.setCurrentText(self.settings.get_runtime_config().get('compute_dtype') or 'auto')
         generation = self.settings.get_generation_config()
         self.max_tokens_spin.setValue(generation.get('max_new_tokens', 200))
         self.temperature_spin.setValue(generation.get('temperature', 0.8))
@@ -213,7 +220,7 @@ class SettingsDialog(QDialog):
         self.prompt_editor.setPlainText(self.settings.get_prompt())
         self._refresh_presets()
         info = self.neural_network.get_model_info()
-        info_text = f"Путь: {info.get('model_path')}\nУстройство: {info.get('device')}\nКонтекст: {info.get('context_length')}\nVocab: {info.get('vocab_size')}"
+        info_text = f"Путь: {info.get('model_path')}\nУстройство: {info.get('device')}\nКонтекст: {info.get('context_length')}\nVocab: {info.get('vocab_size')}\nТочность: {info.get('storage_dtype')} / {info.get('compute_dtype')}"
         self.info_label.setText(info_text)
         accent = self.settings.get_accent_color()
         index = self.accent_combo.findData(accent)
@@ -280,6 +287,7 @@ class SettingsDialog(QDialog):
     def accept(self):
         self.settings.set_model_path(self.model_path_edit.text().strip())
         self.settings.set_theme(self.theme_combo.currentText())
+        self.settings.update_runtime_config({'compute_dtype': self.compute_dtype_combo.currentText()})
         self.settings.set_prompt(self.prompt_editor.toPlainText())
         self.settings.update_generation_config({
             'max_new_tokens': self.max_tokens_spin.value(),
@@ -1,6 +1,13 @@
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QPushButton
 from PyQt5.QtCore import Qt
 
+MODEL_STATE_LABELS = {
+    'loading': ('⚪', 'загрузка'),
+    'warming': ('🟡', 'прогрев'),
+    'ready': ('🟢', 'готова'),
+    'degraded': ('🔴', 'ограничена'),
+}
+
 
 class StatusPanel(QWidget):
     def __init__(self, parent=None):
@@ -10,10 +17,12 @@ class StatusPanel(QWidget):
         layout.setSpacing(12)
         self.setLayout(layout)
         self.user_label = QLabel('Пользователь: —')
+        self.model_label = QLabel('Модель: —')
         self.cpu_label = QLabel('CPU: --%')
         self.ram_label = QLabel('RAM: --%')
         self.gpu_label = QLabel('GPU: недоступно')
         layout.addWidget(self.user_label)
+        layout.addWidget(self.model_label)
         layout.addWidget(self.cpu_label)
         layout.addWidget(self.ram_label)
         layout.addWidget(self.gpu_label)
@@ -35,3 +44,7 @@ class StatusPanel(QWidget):
         else:
             self.user_label.setText(f'Пользователь: {name}')
 
+    def set_model_state(self, state: str, message: str = ''):
+        icon, title = MODEL_STATE_LABELS.get(state, ('⚪', state or '—'))
+        self.model_label.setText(f'{icon} Модель: {title}')
+        self.model_label.setToolTip(message or '')
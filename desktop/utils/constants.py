@@ -3,6 +3,7 @@ MAX_TAG_LENGTH = 50
 MAX_TAGS_COUNT = 10
 MONITOR_UPDATE_INTERVAL = 5000
 TRAINING_STATUS_UPDATE_INTERVAL = 10000
+MODEL_STATE_UPDATE_INTERVAL = 1000
 LOADING_INDICATOR_INTERVAL = 500
 VRAM_WARNING_THRESHOLD = 0.9
 VRAM_WARNING_RESET_THRESHOLD = 0.8
@@ -0,0 +1,177 @@
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+
+class HdrHistogram:
+    """Гистограмма с фиксированной относительной точностью (в духе HdrHistogram).
+
+    Значение переводится в целые единицы unit; до 2**significant_bits
+    единиц корзины идут с шагом 1, дальше каждая октава делится на
+    2**(significant_bits - 1) корзин одинаковой ширины. Относительная
+    ошибка перцентиля — не больше 2**(1 - significant_bits) (1,6% при 7
+    битах), а память не зависит от числа записей: значения выше max_value
+    складываются в последнюю корзину.
+    """
+
+    def __init__(self, unit: float = 0.001, max_value: float = 3600.0, significant_bits: int = 7):
+        self.unit = unit
+        self.max_value = max_value
+        self.significant_bits = significant_bits
+        self._sub = 1 << significant_bits
+        self._half = self._sub >> 1
+        self._max_units = max(1, int(round(max_value / unit)))
+        self.counts: List[int] = [0] * (self._index(self._max_units) + 1)
+        self.total = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _index(self, units: int) -> int:
+        if units < self._sub:
+            return units
+        shift = units.bit_length() - self.significant_bits
+        return shift * self._half + (units >> shift)
+
+    def _bucket_value(self, index: int) -> float:
+        # Середина корзины в исходных единицах
+        if index < self._sub:
+            return index * self.unit
+        shift = index // self._half - 1
+        lower = (index - shift * self._half) << shift
+        return (lower + ((1 << shift) - 1) / 2) * self.unit
+
+    def record(self, value: float, count: int = 1) -> None:
+        if value is None or value != value or count <= 0:
+            return
+        value = max(0.0, float(value))
+        units = min(int(round(value / self.unit)), self._max_units)
+        self.counts[self._index(units)] += count
+        self.total += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'HdrHistogram') -> None:
+        if len(other.counts) != len(self.counts) or other.unit != self.unit:
+            raise ValueError('Гистограммы с разными параметрами нельзя объединить')
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+
+    def empty_copy(self) -> 'HdrHistogram':
+        return HdrHistogram(self.unit, self.max_value, self.significant_bits)
+
+    def percentile(self, q: float) -> Optional[float]:
+        return self.percentiles([q])[q]
+
+    def percentiles(self, qs: Sequence[float]) -> Dict[float, Optional[float]]:
+        if not self.total:
+            return {q: None for q in qs}
+        result: Dict[float, Optional[float]] = {}
+        targets = sorted((max(1, int(-(-q * self.total // 100))), q) for q in qs)
+        seen = 0
+        position = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position][0]:
+                # Крайние перцентили не выходят за реально записанные min/max
+                if targets[position][0] >= self.total:
+                    value = self.max
+                else:
+                    value = min(max(self._bucket_value(index), self.min), self.max)
+                result[targets[position][1]] = value
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'counts': {str(index): count for index, count in enumerate(self.counts) if count},
+            'min': self.min,
+            'max': self.max,
+        }
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        for index, count in (data.get('counts') or {}).items():
+            index = int(index)
+            if 0 <= index < len(self.counts):
+                self.counts[index] += int(count)
+                self.total += int(count)
+        for bound in (data.get('min'), data.get('max')):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+
+
+class WindowedHistogram:
+    """HdrHistogram со скользящими окнами по времени.
+
+    Записи копятся в срезах по slice_seconds секунд; хранится не больше
+    slices срезов, так что окно до slice_seconds * slices секунд собирается
+    слиянием последних срезов. Отдельно ведётся накопительная гистограмма
+    за всё время.
+    """
+
+    def __init__(self, unit: float = 0.001, max_value: float = 3600.0, significant_bits: int = 7,
+                 slice_seconds: int = 60, slices: int = 60, clock=time.time):
+        self.slice_seconds = slice_seconds
+        self.clock = clock
+        self.cumulative = HdrHistogram(unit, max_value, significant_bits)
+        self._slices: "deque" = deque(maxlen=slices)
+
+    def _slice_start(self, now: float) -> int:
+        return int(now // self.slice_seconds) * self.slice_seconds
+
+    def record(self, value: float, now: Optional[float] = None) -> None:
+        start = self._slice_start(self.clock() if now is None else now)
+        if not self._slices or self._slices[-1][0] != start:
+            self._slices.append((start, self.cumulative.empty_copy()))
+        self._slices[-1][1].record(value)
+        self.cumulative.record(value)
+
+    def window(self, seconds: Optional[float], now: Optional[float] = None) -> HdrHistogram:
+        if seconds is None:
+            return self.cumulative
+        now = self.clock() if now is None else now
+        # Срез учитывается, если хотя бы его конец попадает в окно
+        oldest = now - seconds - self.slice_seconds
+        merged = self.cumulative.empty_copy()
+        for start, histogram in self._slices:
+            if start > oldest:
+                merged.merge(histogram)
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'cumulative': self.cumulative.to_dict(),
+            'slices': [[start, histogram.to_dict()] for start, histogram in self._slices],
+        }
+
+    def load_dict(self, data: Dict[str, Any], now: Optional[float] = None) -> None:
+        self.cumulative.load_dict(data.get('cumulative') or {})
+        oldest = (self.clock() if now is None else now) - self.slice_seconds * (self._slices.maxlen or 0)
+        slices = dict(self._slices)
+        for start, histogram_data in data.get('slices') or []:
+            if start <= oldest:
+                continue
+            histogram = slices.setdefault(start, self.cumulative.empty_copy())
+            histogram.load_dict(histogram_data)
+        self._slices.clear()
+        self._slices.extend(sorted(slices.items(), key=lambda item: item[0]))
+
+
+def summarize(histogram: HdrHistogram, qs: Iterable[float] = (50, 90, 99)) -> Dict[str, Any]:
+    qs = list(qs)
+    values = histogram.percentiles(qs)
+    summary: Dict[str, Any] = {'count': histogram.total}
+    for q in qs:
+        value = values[q]
+        summary[f'p{q:g}'] = round(value, 4) if value is not None else None
+    return summary
@@ -1,85 +1,220 @@
 
+import json
+import os
+import threading
 import time
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 from collections import deque
 from datetime import datetime
 
+from desktop.utils.histogram import WindowedHistogram, summarize
 from desktop.utils.logger import get_logger
 
 logger = get_logger('desktop.utils.metrics')
 
+# Окна для перцентилей; None — за всё время с учётом прошлых запусков
+PERCENTILE_WINDOWS = {'5m': 300, '1h': 3600, 'all': None}
+
 
 class MetricsCollector:
     
     
-    def __init__(self, max_history: int = 100):
+    def __init__(self, max_history: int = 100, storage_path: Optional[str] = None):
         
         self.max_history = max_history
         self.response_times: deque = deque(maxlen=max_history)
         self.successful_requests: int = 0
         self.failed_requests: int = 0
-        self.request_history: List[Dict] = []
+        self.request_history: deque = deque(maxlen=max_history)
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_misses: int = 0
+        self.stage_times: Dict[str, deque] = {}
+        self.histograms: Dict[str, WindowedHistogram] = self._new_histograms()
+        self.storage_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
         self._start_time = time.time()
+        if storage_path:
+            self.attach_storage(storage_path)
+    
+    @staticmethod
+    def _new_histograms() -> Dict[str, WindowedHistogram]:
+        
+        return {
+            'latency': WindowedHistogram(unit=0.001, max_value=3600.0),
+            'ttft': WindowedHistogram(unit=0.001, max_value=3600.0),
+            'tokens_per_second': WindowedHistogram(unit=0.01, max_value=10000.0)
+        }
     
     def record_response(self, response_time: float, success: bool = True, 
-                       error: Optional[str] = None) -> None:
+                       error: Optional[str] = None, stages: Optional[Dict[str, float]] = None) -> None:
         
         timestamp = datetime.now().isoformat()
         metric = {
             'timestamp': timestamp,
             'response_time': response_time,
             'success': success,
-            'error': error
+            'error': error,
+            'stages': dict(stages or {})
         }
         
-        self.response_times.append(response_time)
-        self.request_history.append(metric)
+        with self._lock:
+            self.response_times.append(response_time)
+            for name, value in metric['stages'].items():
+                self.stage_times.setdefault(name, deque(maxlen=self.max_history)).append(value)
+            self.request_history.append(metric)
+            
+            if success:
+                self.successful_requests += 1
+                # Хвост ошибок не смешиваем с задержками нормальных ответов
+                self.histograms['latency'].record(response_time)
+                if 'ttft' in metric['stages']:
+                    self.histograms['ttft'].record(metric['stages']['ttft'])
+                new_tokens = metric['stages'].get('new_tokens')
+                if new_tokens and response_time > 0:
+                    self.histograms['tokens_per_second'].record(new_tokens / response_time)
+            else:
+                self.failed_requests += 1
+            self._dirty = True
+        if not success and error:
+            logger.warning(f"Запрос завершился с ошибкой: {error}")
+    
+    def record_cache_hit(self, tier: str = 'memory') -> None:
         
-        if len(self.request_history) > self.max_history:
-            self.request_history.pop(0)
+        with self._lock:
+            self.cache_hits[tier] = self.cache_hits.get(tier, 0) + 1
+            self._dirty = True
+    
+    def record_cache_miss(self) -> None:
         
-        if success:
-            self.successful_requests += 1
-        else:
-            self.failed_requests += 1
-            if error:
-                logger.warning(f"Запрос завершился с ошибкой: {error}")
+        with self._lock:
+            self.cache_misses += 1
+            self._dirty = True
     
-    def get_stats(self) -> Dict:
+    def get_cache_stats(self) -> Dict:
         
-        if not self.response_times:
+        hits = sum(self.cache_hits.values())
+        lookups = hits + self.cache_misses
+        return {
+            'cache_hits': hits,
+            'cache_hits_by_tier': dict(self.cache_hits),
+            'cache_misses': self.cache_misses,
+            'cache_hit_rate': round(hits / lookups * 100, 2) if lookups else 0.0
+        }
+    
+    def get_stage_stats(self) -> Dict[str, Dict[str, float]]:
+        # Время стадий в секундах; prompt_tokens и new_tokens — количества токенов
+        return {
+            name: {
+                'avg': round(sum(values) / len(values), 4),
+                'max': round(max(values), 4),
+                'last': round(values[-1], 4)
+            }
+            for name, values in self.stage_times.items() if values
+        }
+    
+    def get_percentile_stats(self, now: Optional[float] = None) -> Dict[str, Dict[str, Dict]]:
+        # latency и ttft в секундах, tokens_per_second — новых токенов на секунду ответа
+        with self._lock:
             return {
-                'total_requests': 0,
-                'successful': 0,
-                'failed': 0,
-                'success_rate': 0.0,
-                'avg_response_time': 0.0,
-                'min_response_time': 0.0,
-                'max_response_time': 0.0,
-                'uptime': time.time() - self._start_time
+                name: {
+                    label: summarize(histogram.window(seconds, now))
+                    for label, seconds in PERCENTILE_WINDOWS.items()
+                }
+                for name, histogram in self.histograms.items()
             }
+    
+    def get_stats(self) -> Dict:
         
         total = self.successful_requests + self.failed_requests
         success_rate = (self.successful_requests / total * 100) if total > 0 else 0.0
+        recent = list(self.response_times)
         
         return {
             'total_requests': total,
             'successful': self.successful_requests,
             'failed': self.failed_requests,
             'success_rate': round(success_rate, 2),
-            'avg_response_time': round(sum(self.response_times) / len(self.response_times), 3),
-            'min_response_time': round(min(self.response_times), 3),
-            'max_response_time': round(max(self.response_times), 3),
-            'uptime': round(time.time() - self._start_time, 2)
+            'avg_response_time': round(sum(recent) / len(recent), 3) if recent else 0.0,
+            'min_response_time': round(min(recent), 3) if recent else 0.0,
+            'max_response_time': round(max(recent), 3) if recent else 0.0,
+            'uptime': round(time.time() - self._start_time, 2),
+            'stages': self.get_stage_stats(),
+            'percentiles': self.get_percentile_stats(),
+            **self.get_cache_stats()
         }
     
+    def attach_storage(self, path: str) -> None:
+        """Подключает файл счётчиков: накопленное в прошлых запусках добавляется к текущим."""
+        self.storage_path = path
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось загрузить метрики {path}: {e}")
+            return
+        counters = data.get('counters') or {}
+        with self._lock:
+            self.successful_requests += int(counters.get('successful', 0))
+            self.failed_requests += int(counters.get('failed', 0))
+            self.cache_misses += int(counters.get('cache_misses', 0))
+            for tier, count in (counters.get('cache_hits') or {}).items():
+                self.cache_hits[tier] = self.cache_hits.get(tier, 0) + int(count)
+            for name, histogram_data in (data.get('histograms') or {}).items():
+                if name in self.histograms:
+                    self.histograms[name].load_dict(histogram_data)
+        logger.info(f"Загружены метрики прошлых запусков: {self.successful_requests + self.failed_requests} запросов")
+    
+    def save(self) -> None:
+        
+        if not self.storage_path:
+            return
+        with self._lock:
+            payload = {
+                'saved_at': datetime.now().isoformat(),
+                'counters': {
+                    'successful': self.successful_requests,
+                    'failed': self.failed_requests,
+                    'cache_hits': dict(self.cache_hits),
+                    'cache_misses': self.cache_misses
+                },
+                'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+            }
+            self._dirty = False
+            self._last_save = time.time()
+        directory = os.path.dirname(self.storage_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.storage_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, self.storage_path)
+    
+    def maybe_save(self, interval: float = 60.0) -> None:
+        
+        if not self._dirty or time.time() - self._last_save < interval:
+            return
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить метрики: {e}")
+    
     def reset(self) -> None:
         
-        self.response_times.clear()
-        self.successful_requests = 0
-        self.failed_requests = 0
-        self.request_history.clear()
-        self._start_time = time.time()
+        with self._lock:
+            self.response_times.clear()
+            self.successful_requests = 0
+            self.failed_requests = 0
+            self.request_history.clear()
+            self.cache_hits.clear()
+            self.cache_misses = 0
+            self.stage_times.clear()
+            self.histograms = self._new_histograms()
+            self._dirty = True
+            self._start_time = time.time()
         logger.info("Метрики сброшены")
 
 
@@ -320,6 +320,31 @@ class AddAuxiliaryLoss(torch.autograd.Function):
         return grad_output, grad_loss
 
 
+class MoECombine(torch.autograd.Function):
+    """
+    Weighted scatter-sum of expert outputs back to their tokens.
+    Unlike `(outputs * weights).index_add`, it does not keep the weighted copy of the
+    outputs for backward; the gradients are recomputed from the saved outputs.
+    """
+
+    @staticmethod
+    def forward(ctx, expert_outputs, weights, token_idx, num_tokens):
+        ctx.save_for_backward(expert_outputs, weights, token_idx)
+        y = expert_outputs.new_zeros((num_tokens, expert_outputs.shape[-1]))
+        return y.index_add_(0, token_idx, expert_outputs * weights.unsqueeze(-1).to(expert_outputs.dtype))
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        expert_outputs, weights, token_idx = ctx.saved_tensors
+        grad_tokens = grad_output.index_select(0, token_idx)
+        grad_outputs = grad_weights = None
+        if ctx.needs_input_grad[0]:
+            grad_outputs = grad_tokens * weights.unsqueeze(-1).to(grad_tokens.dtype)
+        if ctx.needs_input_grad[1]:
+            grad_weights = (grad_tokens * expert_outputs).sum(dim=-1).to(weights.dtype)
+        return grad_outputs, grad_weights, None, None
+
+
 class DeepseekMoE(nn.Module):
     """
     A mixed expert module containing shared experts.
@@ -354,12 +379,18 @@ class DeepseekMoE(nn.Module):
         return y
 
     def moe_train(self, hidden_states, flat_topk_idx, topk_weight):
-        hidden_states = hidden_states.repeat_interleave(self.num_experts_per_tok, dim=0)
-        y = torch.empty_like(hidden_states)
-        for i, expert in enumerate(self.experts):
-            y[flat_topk_idx == i] = expert(hidden_states[flat_topk_idx == i])
-        y = (y.view(*topk_weight.shape, -1) * topk_weight.unsqueeze(-1)).sum(dim=1)
-        return y.to(hidden_states.dtype) # .sum() in previous line returns fp32 tensor
+        # Sort (token, expert) pairs by expert once, so every expert gets one contiguous slice
+        # instead of two boolean-mask gathers over all tokens
+        order = flat_topk_idx.argsort(stable=True)
+        token_idx = order // self.num_experts_per_tok
+        counts = torch.bincount(flat_topk_idx, minlength=len(self.experts)).tolist()
+        expert_inputs = hidden_states.index_select(0, token_idx).split(counts, dim=0)
+        expert_outputs = [
+            expert(tokens) for expert, tokens in zip(self.experts, expert_inputs) if tokens.shape[0]
+        ]
+        expert_outputs = torch.cat(expert_outputs, dim=0) if expert_outputs else hidden_states.new_zeros((0, hidden_states.shape[-1]))
+        weights = topk_weight.reshape(-1)[order]
+        return MoECombine.apply(expert_outputs, weights, token_idx, hidden_states.shape[0])
 
     @torch.no_grad()
     def moe_infer(self, x, flat_expert_indices, flat_expert_weights):
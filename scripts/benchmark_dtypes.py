@@ -0,0 +1,102 @@
+import sys
+import argparse
+import platform
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+import torch
+import torch.nn.functional as F
+
+from desktop.core.precision import detect_cpu_flags, cpu_supports_bf16, select_dtypes
+from desktop.utils.logger import get_logger
+
+logger = get_logger('scripts.benchmark_dtypes')
+
+DOC_PATH = root_dir / 'MODEL_LOADING_INFO.md'
+MARKER_START = '<!-- dtype-benchmark:start -->'
+MARKER_END = '<!-- dtype-benchmark:end -->'
+
+# Формы матриц эксперта MoE модели: hidden 2048, moe_intermediate 1792
+HIDDEN_SIZE = 2048
+INTERMEDIATE_SIZE = 1792
+MODES = [
+    ('float32', 'float32', 'float32'),
+    ('float16', 'float16', 'float16'),
+    ('bfloat16', 'bfloat16', 'bfloat16'),
+    ('fp32 над bf16', 'bfloat16', 'float32'),
+    ('fp32 над fp16', 'float16', 'float32'),
+]
+
+
+def time_linear(tokens: int, storage: str, compute: str, repeats: int) -> float:
+    weight = torch.randn(INTERMEDIATE_SIZE, HIDDEN_SIZE).to(getattr(torch, storage))
+    inputs = torch.randn(tokens, HIDDEN_SIZE).to(getattr(torch, storage))
+    compute_dtype = getattr(torch, compute)
+
+    def step():
+        if compute_dtype != weight.dtype:
+            return F.linear(inputs.to(compute_dtype), weight.to(compute_dtype))
+        return F.linear(inputs, weight)
+
+    with torch.no_grad():
+        for _ in range(3):
+            step()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            step()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def build_table(repeats: int) -> str:
+    flags = detect_cpu_flags()
+    storage, compute = select_dtypes('auto', 'cpu', flags=flags)
+    lines = [
+        f"CPU: `{platform.processor() or platform.machine()}`, потоков torch: {torch.get_num_threads()}, "
+        f"BF16 в железе: {'да' if cpu_supports_bf16(flags) else 'нет'}, "
+        f"auto выбирает: хранение {storage}, вычисления {compute}",
+        '',
+        '| Режим | Хранение | Вычисления | decode, 1 токен (мс) | prefill, 128 токенов (мс) |',
+        '|---|---|---|---|---|',
+    ]
+    for name, storage_dtype, compute_dtype in MODES:
+        try:
+            decode = f'{time_linear(1, storage_dtype, compute_dtype, repeats):.3f}'
+            prefill = f'{time_linear(128, storage_dtype, compute_dtype, max(1, repeats // 4)):.3f}'
+        except RuntimeError as e:
+            logger.warning(f"Режим {name} не поддерживается: {e}")
+            decode = prefill = 'н/д'
+        lines.append(f'| {name} | {storage_dtype} | {compute_dtype} | {decode} | {prefill} |')
+    return '\n'.join(lines)
+
+
+def write_table(table: str) -> None:
+    content = DOC_PATH.read_text(encoding='utf-8')
+    if MARKER_START not in content or MARKER_END not in content:
+        raise RuntimeError(f'В {DOC_PATH.name} нет маркеров {MARKER_START} / {MARKER_END}')
+    head, rest = content.split(MARKER_START, 1)
+    _, tail = rest.split(MARKER_END, 1)
+    DOC_PATH.write_text(f'{head}{MARKER_START}\n{table}\n{MARKER_END}{tail}', encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение типов данных для матричных умножений на CPU')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--no-write', action='store_true', help='Только вывести таблицу')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    table = build_table(args.repeats)
+    print(table)
+    if not args.no_write:
+        write_table(table)
+        print(f"\nТаблица записана в {DOC_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
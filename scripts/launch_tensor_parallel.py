@@ -0,0 +1,139 @@
+import sys
+import argparse
+import os
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from desktop.core.parallel.tensor_parallel import init_process_group, load_tensor_parallel_model, describe
+from desktop.core.parallel.expert_parallel import load_expert_parallel_model
+from desktop.core.precision import select_dtypes, to_torch_dtype, apply_compute_dtype
+from desktop.core.runtime import InferenceRuntime, detect_cpu_topology
+from desktop.utils.logger import get_logger
+
+logger = get_logger('scripts.launch_tensor_parallel')
+
+
+def _next_batch(rank: int, args, served: int):
+    """Запросы читает rank 0 и рассылает остальным; None — сигнал завершения."""
+    payload = [None]
+    if rank == 0:
+        if args.prompts_file:
+            if served == 0:
+                with open(args.prompts_file, 'r', encoding='utf-8') as f:
+                    payload[0] = [line.strip() for line in f if line.strip()] or None
+        elif args.prompt is not None:
+            payload[0] = [args.prompt] if served == 0 else None
+        else:
+            try:
+                line = input('\nПользователь: ').strip()
+                payload[0] = [line] if line else None
+            except EOFError:
+                payload[0] = None
+    dist.broadcast_object_list(payload, src=0)
+    return payload[0]
+
+
+def _generate(model, tokenizer, prompts, args, synced: bool):
+    texts = [f'Пользователь: {prompt}\nАссистент:' for prompt in prompts]
+    inputs = tokenizer(texts, return_tensors='pt', padding=True)
+    # Одинаковое зерно на всех процессах — иначе сэмплирование разойдётся
+    torch.manual_seed(args.seed)
+    with torch.no_grad():
+        output_ids = model.generate(
+            **inputs,
+            max_new_tokens=args.max_new_tokens,
+            do_sample=args.temperature > 0,
+            temperature=args.temperature if args.temperature > 0 else None,
+            pad_token_id=tokenizer.pad_token_id,
+            synced_gpus=synced
+        )
+    prompt_length = inputs.input_ids.shape[1]
+    return [tokenizer.decode(row[prompt_length:], skip_special_tokens=True).strip() for row in output_ids]
+
+
+def run_worker(local_rank: int, args) -> None:
+    rank = args.node_rank * args.nproc + local_rank
+    world_size = args.nnodes * args.nproc
+    os.environ.setdefault('MASTER_ADDR', args.master_addr)
+    os.environ.setdefault('MASTER_PORT', str(args.master_port))
+    init_process_group(rank, world_size)
+
+    # Каждый локальный процесс — на своём NUMA-узле, чтобы читать свою память
+    topology = detect_cpu_topology()
+    runtime = InferenceRuntime({
+        'numa_node': local_rank % len(topology['numa_nodes']),
+        'reserve_ui_cores': 0,
+        'num_threads': args.threads,
+    }, topology)
+    runtime.apply()
+    runtime.pin_inference_thread()
+
+    storage_dtype, compute_dtype = select_dtypes(args.dtype, 'cpu', model_path=args.model_path)
+    loader = load_expert_parallel_model if args.mode == 'expert' else load_tensor_parallel_model
+    model = loader(args.model_path, rank, world_size, to_torch_dtype(storage_dtype))
+    apply_compute_dtype(model, storage_dtype, compute_dtype)
+    logger.info(f"Процесс {rank}: {describe(model)}, потоки {runtime.describe()}")
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    served = 0
+    while True:
+        prompts = _next_batch(rank, args, served)
+        if prompts is None:
+            break
+        served += 1
+        if args.mode == 'expert':
+            # Каждый процесс берёт свою часть запросов; процесс без запросов всё равно
+            # участвует в all_to_all каждого шага, поэтому генерирует фиктивный
+            own = prompts[rank::world_size]
+            answers = _generate(model, tokenizer, own or [''], args, synced=True)
+            gathered = [None] * world_size
+            dist.gather_object(answers if own else [], gathered if rank == 0 else None, dst=0)
+            if rank == 0:
+                answers = [None] * len(prompts)
+                for source, part in enumerate(gathered):
+                    answers[source::world_size] = part
+        else:
+            answers = _generate(model, tokenizer, prompts, args, synced=False)
+        if rank == 0:
+            for answer in answers:
+                print(f"Ассистент: {answer}", flush=True)
+
+    dist.destroy_process_group()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Параллельный инференс на CPU (gloo): тензорный или по экспертам')
+    parser.add_argument('--model-path', default=str(root_dir / 'models'))
+    parser.add_argument('--mode', choices=['tensor', 'expert'], default='tensor',
+                        help='tensor — веса режутся по головам/каналам, expert — эксперты MoE делятся между процессами')
+    parser.add_argument('--nproc', type=int, default=2, help='Процессов на этой машине')
+    parser.add_argument('--nnodes', type=int, default=1, help='Число машин')
+    parser.add_argument('--node-rank', type=int, default=0, help='Номер этой машины')
+    parser.add_argument('--master-addr', default='127.0.0.1')
+    parser.add_argument('--master-port', type=int, default=29500)
+    parser.add_argument('--threads', type=int, default=None, help='Потоков torch на процесс')
+    parser.add_argument('--dtype', default='auto')
+    parser.add_argument('--prompt', default=None, help='Один запрос; без него — интерактивный режим')
+    parser.add_argument('--prompts-file', default=None, help='Файл с запросами, по одному в строке')
+    parser.add_argument('--max-new-tokens', type=int, default=200)
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mp.spawn(run_worker, args=(args,), nprocs=args.nproc, join=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import sys
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from desktop.core.parallel.tensor_parallel import init_process_group
+from desktop.core.parallel.schedule import estimate_layer_costs, balance_stages
+from desktop.core.parallel.pipeline import (
+    build_micro_batches, load_pipeline_stage, profile_layer_times, describe_bounds
+)
+from desktop.core.precision import select_dtypes, to_torch_dtype, apply_compute_dtype
+from desktop.core.runtime import InferenceRuntime, detect_cpu_topology
+from desktop.utils.logger import get_logger
+
+logger = get_logger('scripts.pipeline_batch')
+
+PROMPT_TEMPLATE = 'Пользователь: {prompt}\nАссистент:'
+
+
+def read_jobs(path: str):
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'prompt' not in record:
+                raise ValueError(f'Строка {line_number}: нет поля prompt')
+            record.setdefault('id', line_number)
+            jobs.append(record)
+    return jobs
+
+
+def stage_bounds(args, num_stages: int):
+    from transformers import AutoConfig
+    config = AutoConfig.from_pretrained(args.model_path, trust_remote_code=True)
+    estimated, first_extra, last_extra = estimate_layer_costs(config)
+    costs = estimated
+    if args.layer_times:
+        # Измеренные времена точнее оценки: MoE-слои зависят от числа активных экспертов и памяти
+        with open(args.layer_times, 'r', encoding='utf-8') as f:
+            costs = json.load(f)
+        # Добавки за эмбеддинги и lm_head переводятся из умножений в секунды
+        scale = sum(costs) / max(sum(estimated), 1.0)
+        first_extra, last_extra = first_extra * scale, last_extra * scale
+    bounds = balance_stages(costs, num_stages, first_extra, last_extra)
+    return bounds, costs
+
+
+def run_stage(rank: int, args) -> None:
+    num_stages = args.nproc
+    os.environ.setdefault('MASTER_ADDR', args.master_addr)
+    os.environ.setdefault('MASTER_PORT', str(args.master_port))
+    init_process_group(rank, num_stages)
+
+    topology = detect_cpu_topology()
+    runtime = InferenceRuntime({
+        'numa_node': rank % len(topology['numa_nodes']),
+        'reserve_ui_cores': 0,
+        'num_threads': args.threads,
+    }, topology)
+    runtime.apply()
+    runtime.pin_inference_thread()
+
+    bounds, costs = stage_bounds(args, num_stages)
+    if rank == 0:
+        logger.info(f"Стадии: {describe_bounds(bounds, costs)}")
+
+    storage_dtype, compute_dtype = select_dtypes(args.dtype, 'cpu', model_path=args.model_path)
+    stage = load_pipeline_stage(args.model_path, rank, bounds, to_torch_dtype(storage_dtype))
+    apply_compute_dtype(stage.decoder, storage_dtype, compute_dtype)
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+
+    payload = [None]
+    if rank == 0:
+        jobs = read_jobs(args.input)
+        prompts = [PROMPT_TEMPLATE.format(prompt=job['prompt']) for job in jobs]
+        batches, indices = build_micro_batches(tokenizer, prompts, args.micro_batch_size)
+        payload[0] = (jobs, batches, indices)
+    dist.broadcast_object_list(payload, src=0)
+    jobs, batches, indices = payload[0]
+
+    torch.manual_seed(args.seed)
+    start = time.time()
+    generated = stage.generate(batches, args.max_new_tokens, args.temperature)
+    elapsed = time.time() - start
+
+    if stage.is_last:
+        responses = [None] * len(jobs)
+        new_tokens = 0
+        for rows, tokens in zip(indices, generated):
+            for row, job_index in enumerate(rows):
+                ids = tokens[row].tolist()
+                if tokenizer.eos_token_id in ids:
+                    ids = ids[:ids.index(tokenizer.eos_token_id)]
+                new_tokens += len(ids)
+                responses[job_index] = tokenizer.decode(ids, skip_special_tokens=True).strip()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for job, response in zip(jobs, responses):
+                f.write(json.dumps({**job, 'response': response}, ensure_ascii=False) + '\n')
+        print(
+            f"Готово: {len(jobs)} запросов, {new_tokens} токенов за {elapsed:.1f}с "
+            f"({new_tokens / max(elapsed, 1e-9):.1f} ток/с), стадий {num_stages}, микробатчей {len(batches)}",
+            flush=True
+        )
+
+    dist.destroy_process_group()
+
+
+def profile_layers(args) -> int:
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    storage_dtype, compute_dtype = select_dtypes(args.dtype, 'cpu', model_path=args.model_path)
+    model = AutoModelForCausalLM.from_pretrained(
+        args.model_path, trust_remote_code=True, torch_dtype=to_torch_dtype(storage_dtype), low_cpu_mem_usage=True
+    )
+    model.eval()
+    apply_compute_dtype(model, storage_dtype, compute_dtype)
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    sample = tokenizer(PROMPT_TEMPLATE.format(prompt='Расскажи подробно о себе. ' * 32), return_tensors='pt')
+    times = profile_layer_times(model, sample.input_ids)
+    with open(args.profile_layers, 'w', encoding='utf-8') as f:
+        json.dump(times, f, indent=2)
+    for index, value in enumerate(times):
+        print(f"слой {index:2d}: {value * 1000:.1f} мс")
+    print(f"Времена слоёв записаны в {args.profile_layers}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетная генерация по JSONL с конвейерным параллелизмом по слоям')
+    parser.add_argument('--model-path', default=str(root_dir / 'models'))
+    parser.add_argument('--input', help='JSONL с полями prompt и (необязательно) id')
+    parser.add_argument('--output', help='JSONL с ответами')
+    parser.add_argument('--nproc', type=int, default=2, help='Число стадий конвейера')
+    parser.add_argument('--micro-batch-size', type=int, default=4)
+    parser.add_argument('--max-new-tokens', type=int, default=200)
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dtype', default='auto')
+    parser.add_argument('--threads', type=int, default=None, help='Потоков torch на стадию')
+    parser.add_argument('--layer-times', default=None, help='JSON с измеренным временем слоёв для балансировки')
+    parser.add_argument('--profile-layers', default=None, help='Измерить время слоёв в одном процессе и сохранить в JSON')
+    parser.add_argument('--master-addr', default='127.0.0.1')
+    parser.add_argument('--master-port', type=int, default=29501)
+    args = parser.parse_args()
+
+    if args.profile_layers:
+        return profile_layers(args)
+    if not args.input or not args.output:
+        parser.error('нужны --input и --output')
+    mp.spawn(run_stage, args=(args,), nprocs=args.nproc, join=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Тесты для горячей замены LoRA-адаптеров.
+"""
+import unittest
+import shutil
+import tempfile
+
+try:
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+from desktop.core.adapters import AdapterCache
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch, transformers и peft')
+class TestAdapterCache(unittest.TestCase):
+    """Тесты для AdapterCache."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = {name: self.save_adapter(name, seed) for name, seed in (('a', 1), ('b', 2))}
+        self.model = build_tiny_model()
+        self.model.eval()
+        self.input_ids = torch.randint(0, self.model.config.vocab_size, (1, 6), generator=torch.Generator().manual_seed(0))
+        self.base_logits = self.logits(self.model)
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir)
+    
+    def save_adapter(self, name, seed):
+        base = build_tiny_model()
+        torch.manual_seed(seed)
+        config = LoraConfig(r=4, lora_alpha=8, target_modules=['q_proj', 'v_proj'], init_lora_weights=False)
+        model = get_peft_model(base, config)
+        path = f'{self.temp_dir}/{name}'
+        model.save_pretrained(path)
+        return path
+    
+    def logits(self, model):
+        with torch.no_grad():
+            return model(input_ids=self.input_ids).logits
+    
+    def test_switch_and_disable(self):
+        """Тест переключения адаптеров и возврата к базовой модели."""
+        cache = AdapterCache(self.model)
+        cache.load('a', self.paths['a'])
+        # Загрузка не меняет активный адаптер
+        torch.testing.assert_close(self.logits(cache.model), self.base_logits)
+        cache.activate('a')
+        logits_a = self.logits(cache.model)
+        self.assertFalse(torch.allclose(logits_a, self.base_logits))
+        cache.load('b', self.paths['b'])
+        cache.activate('b')
+        self.assertFalse(torch.allclose(self.logits(cache.model), logits_a))
+        cache.activate('a')
+        torch.testing.assert_close(self.logits(cache.model), logits_a)
+        cache.activate(None)
+        torch.testing.assert_close(self.logits(cache.model), self.base_logits)
+    
+    def test_merge_matches_unmerged(self):
+        """Тест влитого в веса адаптера и обратного вычитания."""
+        cache = AdapterCache(self.model)
+        cache.load('a', self.paths['a'])
+        cache.activate('a')
+        logits_a = self.logits(cache.model)
+        cache.activate('a', merge=True)
+        self.assertEqual(cache.merged, 'a')
+        torch.testing.assert_close(self.logits(cache.model), logits_a, atol=1e-4, rtol=1e-4)
+        cache.activate(None)
+        self.assertIsNone(cache.merged)
+        torch.testing.assert_close(self.logits(cache.model), self.base_logits, atol=1e-4, rtol=1e-4)
+    
+    def test_load_while_merged(self):
+        """Тест загрузки нового адаптера, пока активный влит в веса."""
+        cache = AdapterCache(self.model)
+        cache.load('a', self.paths['a'])
+        cache.activate('a')
+        logits_a = self.logits(cache.model)
+        cache.activate('a', merge=True)
+        cache.load('b', self.paths['b'])
+        self.assertIsNone(cache.merged)
+        self.assertEqual(cache.active, 'a')
+        torch.testing.assert_close(self.logits(cache.model), logits_a, atol=1e-4, rtol=1e-4)
+        cache.activate('a', merge=False)
+        cache.activate(None)
+        torch.testing.assert_close(self.logits(cache.model), self.base_logits, atol=1e-4, rtol=1e-4)
+    
+    def test_eviction_and_unload(self):
+        """Тест вытеснения по LRU и полной выгрузки."""
+        cache = AdapterCache(self.model, capacity=1)
+        cache.load('a', self.paths['a'])
+        cache.activate('a')
+        cache.load('b', self.paths['b'])
+        # Загружаемый адаптер остаётся, давно использованный (даже активный) вытесняется
+        self.assertEqual(list(cache.loaded), ['b'])
+        self.assertIsNone(cache.active)
+        cache.activate('b')
+        self.assertFalse(torch.allclose(self.logits(cache.model), self.base_logits))
+        cache.load('a', self.paths['a'])
+        self.assertEqual(list(cache.loaded), ['a'])
+        cache.activate('a')
+        cache.activate(None)
+        cache.unload('a')
+        self.assertEqual(cache.loaded, {})
+        torch.testing.assert_close(self.logits(cache.model), self.base_logits)
+    
+    def test_missing_adapter(self):
+        """Тест ошибок для неизвестного адаптера."""
+        cache = AdapterCache(self.model)
+        with self.assertRaises(FileNotFoundError):
+            cache.load('x', self.temp_dir)
+        with self.assertRaises(KeyError):
+            cache.activate('x')
+
+
+if __name__ == '__main__':
+    unittest.main()
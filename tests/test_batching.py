@@ -0,0 +1,45 @@
+"""
+Тесты для динамического паддинга батчей.
+"""
+import unittest
+
+try:
+    import torch
+    from desktop.training.batching import DynamicPaddingCollator
+    from desktop.training.packing import IGNORE_INDEX
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и datasets')
+class TestDynamicPaddingCollator(unittest.TestCase):
+    """Тесты для DynamicPaddingCollator."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.features = [
+            {'input_ids': [5, 6, 7], 'labels': [5, 6, 7], 'length': 3},
+            {'input_ids': [8, 9, 10, 11, 12], 'labels': [8, 9, 10, 11, 12], 'length': 5},
+        ]
+    
+    def test_pads_to_batch_max(self):
+        """Тест паддинга до самого длинного образца и маскирования меток."""
+        collator = DynamicPaddingCollator(pad_token_id=0)
+        batch = collator(self.features)
+        self.assertEqual(set(batch), {'input_ids', 'attention_mask', 'labels'})
+        self.assertEqual(batch['input_ids'].shape, (2, 5))
+        self.assertEqual(batch['input_ids'][0].tolist(), [5, 6, 7, 0, 0])
+        self.assertEqual(batch['attention_mask'][0].tolist(), [1, 1, 1, 0, 0])
+        self.assertEqual(batch['labels'][0].tolist(), [5, 6, 7, IGNORE_INDEX, IGNORE_INDEX])
+        self.assertAlmostEqual(collator.efficiency, 8 / 10)
+    
+    def test_pad_to_multiple_of(self):
+        """Тест выравнивания ширины батча."""
+        batch = DynamicPaddingCollator(pad_token_id=0, pad_to_multiple_of=8)(self.features)
+        self.assertEqual(batch['input_ids'].shape, (2, 8))
+        self.assertTrue((batch['labels'][1, 5:] == IGNORE_INDEX).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Тесты для набора бенчмарков инференса.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+
+from benchmarks.results import compare_results, save_results, load_results, format_comparison
+
+try:
+    import torch
+    from benchmarks.tiny_model import build_tiny_model
+    from benchmarks.bench_inference import bench_case
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+def case(**values):
+    result = {'dtype': 'float32', 'batch_size': 1, 'seq_len': 32, 'prefill_tokens_per_second': 1000.0,
+              'decode_ms_per_token': 10.0, 'peak_rss_mb': 500.0, 'decode_allocations': 100}
+    result.update(values)
+    return result
+
+
+class TestBenchmarkResults(unittest.TestCase):
+    """Тесты для сравнения результатов с базовым прогоном."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_compare_directions(self):
+        """Тест: падение скорости и рост задержки — регрессии, ускорение — нет."""
+        baseline = {'results': [case(), case(batch_size=4)]}
+        current = {'results': [
+            case(prefill_tokens_per_second=850.0, decode_ms_per_token=9.0),
+            case(batch_size=4, decode_ms_per_token=12.0, peak_rss_mb=505.0),
+            case(seq_len=256),
+        ]}
+        rows = compare_results(current, baseline, tolerance=0.1)
+        regressions = {(row['batch_size'], row['metric']) for row in rows if row['regression']}
+        self.assertEqual(regressions, {(1, 'prefill_tokens_per_second'), (4, 'decode_ms_per_token')})
+        # Случай без пары в базовом прогоне не сравнивается
+        self.assertFalse(any(row['seq_len'] == 256 for row in rows))
+        self.assertIn('⚠', format_comparison(rows))
+    
+    def test_save_and_load(self):
+        """Тест сохранения результатов в JSON."""
+        path = os.path.join(self.temp_dir, 'results', 'run.json')
+        payload = {'meta': {'torch': 'x'}, 'results': [case()]}
+        save_results(payload, path)
+        self.assertEqual(load_results(path), payload)
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestBenchmarkRun(unittest.TestCase):
+    """Тесты для прогона бенчмарка на уменьшенной модели."""
+    
+    def test_tiny_model_topology(self):
+        """Тест топологии уменьшенной модели: MoE, общие эксперты, GQA."""
+        model = build_tiny_model()
+        config = model.config
+        self.assertLess(config.num_key_value_heads, config.num_attention_heads)
+        self.assertEqual(len(model.model.layers[1].mlp.experts), config.n_routed_experts)
+        self.assertIsNotNone(model.model.layers[1].mlp.shared_experts)
+    
+    def test_bench_case(self):
+        """Тест метрик одного случая."""
+        result = bench_case(build_tiny_model(num_hidden_layers=2), batch_size=2, seq_len=8, decode_steps=2, repeats=1)
+        self.assertGreater(result['prefill_tokens_per_second'], 0)
+        self.assertGreater(result['decode_ms_per_token'], 0)
+        self.assertGreater(result['peak_rss_mb'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
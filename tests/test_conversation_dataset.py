@@ -0,0 +1,84 @@
+"""
+Тесты для загрузки датасета диалогов.
+"""
+import unittest
+import tempfile
+import shutil
+import json
+import os
+
+try:
+    from desktop.training.dataset import ConversationDataset
+    DATASETS_AVAILABLE = True
+except ImportError:
+    DATASETS_AVAILABLE = False
+
+
+@unittest.skipUnless(DATASETS_AVAILABLE, 'требуется datasets')
+class TestConversationDataset(unittest.TestCase):
+    """Тесты для ConversationDataset."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.first = os.path.join(self.temp_dir, 'first.jsonl')
+        self.second = os.path.join(self.temp_dir, 'second.jsonl')
+        self.write(self.first, [
+            {'instruction': 'Привет', 'output': 'Здравствуйте'},
+            {'instruction': 'Сколько будет 2+2?', 'input': '', 'output': '4', 'tags': ['math'], 'extra': 1},
+        ])
+        self.write(self.second, [{'instruction': 'Пока', 'output': 'До свидания'}])
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def write(self, path, records):
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n\n')
+    
+    def test_load_normalizes_records(self):
+        """Тест нормализации полей и объединения файлов."""
+        dataset = ConversationDataset(self.first, [self.second], cache_dir=self.cache_dir).load()
+        self.assertEqual(len(dataset), 3)
+        self.assertEqual(dataset.column_names, ['instruction', 'input', 'output', 'tags'])
+        self.assertEqual(dataset[0]['input'], '')
+        self.assertEqual(dataset[0]['tags'], [])
+        self.assertEqual(dataset[1]['tags'], ['math'])
+        self.assertEqual(dataset[2]['output'], 'До свидания')
+    
+    def test_cache_reused_and_invalidated(self):
+        """Тест повторного использования Arrow-кэша и его сброса при изменении файла."""
+        loader = ConversationDataset(self.first, cache_dir=self.cache_dir)
+        loader.load()
+        cache_path = loader.cache_path(loader.dataset_paths[0])
+        mtime = os.stat(cache_path).st_mtime_ns
+        loader.load()
+        self.assertEqual(os.stat(cache_path).st_mtime_ns, mtime)
+
+        self.write(self.first, [{'instruction': 'Новый', 'output': 'Ответ'}])
+        os.utime(self.first, ns=(mtime + 10**9, mtime + 10**9))
+        self.assertNotEqual(loader.cache_path(loader.dataset_paths[0]), cache_path)
+        self.assertEqual(len(loader.load()), 1)
+    
+    def test_max_samples(self):
+        """Тест ограничения числа образцов по всем файлам."""
+        dataset = ConversationDataset(self.first, [self.second], max_samples=2, cache_dir=self.cache_dir).load()
+        self.assertEqual(len(dataset), 2)
+    
+    def test_streaming_matches_cached(self):
+        """Тест совпадения потокового чтения с кэшированным."""
+        cached = ConversationDataset(self.first, [self.second], cache_dir=self.cache_dir).load()
+        streamed = list(ConversationDataset(self.first, [self.second], streaming=True).load())
+        self.assertEqual(streamed, cached.to_list())
+    
+    def test_missing_file(self):
+        """Тест ошибки для несуществующего файла."""
+        with self.assertRaises(FileNotFoundError):
+            ConversationDataset(os.path.join(self.temp_dir, 'missing.jsonl')).load()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Тесты для выноса экспертов на диск и их предзагрузки.
+"""
+import unittest
+import tempfile
+import shutil
+import copy
+import os
+
+try:
+    import torch
+    from safetensors.torch import save_file
+    from desktop.core.expert_offload import ExpertStore, convert_to_offloaded
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch, transformers и safetensors')
+class TestExpertOffload(unittest.TestCase):
+    """Тесты для ExpertStore и ExpertPrefetcher."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.model = build_tiny_model()
+        state = {name: tensor.contiguous() for name, tensor in self.model.state_dict().items()}
+        save_file(state, os.path.join(self.temp_dir, 'model.safetensors'))
+        self.input_ids = torch.randint(1, 128, (1, 12), generator=torch.Generator().manual_seed(4))
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_matches_resident_model(self):
+        """Тест совпадения логитов и генерации с моделью целиком в памяти."""
+        offloaded = copy.deepcopy(self.model)
+        store = ExpertStore(self.temp_dir, torch.float32, capacity=2)
+        prefetcher = convert_to_offloaded(offloaded, store, prefetch=True)
+        try:
+            with torch.no_grad():
+                expected = self.model(input_ids=self.input_ids).logits
+                actual = offloaded(input_ids=self.input_ids).logits
+                expected_ids = self.model.generate(input_ids=self.input_ids, max_new_tokens=4, do_sample=False, pad_token_id=0)
+                actual_ids = offloaded.generate(input_ids=self.input_ids, max_new_tokens=4, do_sample=False, pad_token_id=0)
+            torch.testing.assert_close(actual, expected, atol=1e-5, rtol=1e-5)
+            self.assertTrue(torch.equal(actual_ids, expected_ids))
+
+            stats = prefetcher.stats()
+            self.assertIsNotNone(stats['accuracy'])
+            self.assertGreater(stats['prefetch_loads'], 0)
+            self.assertLessEqual(stats['resident_experts'], 2)
+        finally:
+            prefetcher.close()
+    
+    def test_on_demand_without_prefetch(self):
+        """Тест чтения по требованию и учёта простоя без предзагрузки."""
+        store = ExpertStore(self.temp_dir, torch.float32, capacity=4)
+        weights = store.get(1, 3)
+        self.assertEqual(set(weights), {'gate_proj', 'up_proj', 'down_proj'})
+        torch.testing.assert_close(weights['down_proj'], self.model.model.layers[1].mlp.experts[3].down_proj.weight)
+        self.assertEqual(store.on_demand_loads, 1)
+        self.assertGreater(store.stall_seconds, 0.0)
+
+        store.get(1, 3)
+        self.assertEqual(store.hits, 1)
+        store.close()
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения давно не использованных экспертов."""
+        store = ExpertStore(self.temp_dir, torch.float32, capacity=2)
+        store.get(1, 0)
+        store.get(1, 1)
+        store.get(1, 0)
+        store.get(1, 2)
+        self.assertTrue(store.is_resident(1, 0))
+        self.assertFalse(store.is_resident(1, 1))
+        self.assertTrue(store.is_resident(1, 2))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Тесты для параллелизма по экспертам.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+
+try:
+    import torch
+    import torch.distributed as dist
+    import torch.multiprocessing as mp
+    from desktop.core.parallel.tensor_parallel import init_process_group
+    from desktop.core.parallel.expert_parallel import convert_to_expert_parallel, expert_range
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+WORLD_SIZE = 2
+
+
+def expert_parallel_worker(rank, init_file, input_ids, result_dir):
+    init_process_group(rank, WORLD_SIZE, init_method=f'file://{init_file}')
+    model = convert_to_expert_parallel(build_tiny_model(), rank, WORLD_SIZE)
+    own_ids = input_ids[rank:rank + 1]
+    with torch.no_grad():
+        logits = model(input_ids=own_ids).logits
+        generated = model.generate(
+            input_ids=own_ids, max_new_tokens=4, do_sample=False, pad_token_id=0, synced_gpus=True
+        )
+    torch.save({'logits': logits, 'generated': generated}, os.path.join(result_dir, f'rank{rank}.pt'))
+    dist.destroy_process_group()
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestExpertParallel(unittest.TestCase):
+    """Каждый процесс обрабатывает свои токены, эксперты распределены между процессами."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_matches_single_process(self):
+        """Тест совпадения с однопроцессной моделью для токенов каждого процесса."""
+        input_ids = torch.randint(1, 128, (WORLD_SIZE, 10), generator=torch.Generator().manual_seed(2))
+        model = build_tiny_model()
+
+        init_file = os.path.join(self.temp_dir, 'init')
+        mp.spawn(expert_parallel_worker, args=(init_file, input_ids, self.temp_dir), nprocs=WORLD_SIZE, join=True)
+
+        for rank in range(WORLD_SIZE):
+            result = torch.load(os.path.join(self.temp_dir, f'rank{rank}.pt'))
+            own_ids = input_ids[rank:rank + 1]
+            with torch.no_grad():
+                expected_logits = model(input_ids=own_ids).logits
+                expected_generated = model.generate(input_ids=own_ids, max_new_tokens=4, do_sample=False, pad_token_id=0)
+            torch.testing.assert_close(result['logits'], expected_logits, atol=1e-4, rtol=1e-4)
+            self.assertTrue(torch.equal(result['generated'], expected_generated))
+    
+    def test_expert_range(self):
+        """Тест распределения экспертов по процессам."""
+        self.assertEqual(list(expert_range(64, 1, 4)), list(range(16, 32)))
+        with self.assertRaises(ValueError):
+            expert_range(64, 0, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Тесты для гистограмм задержек.
+"""
+import random
+import unittest
+
+from desktop.utils.histogram import HdrHistogram, WindowedHistogram, summarize
+
+
+class TestHdrHistogram(unittest.TestCase):
+    """Тесты для HdrHistogram."""
+    
+    def test_percentiles_within_relative_error(self):
+        """Тест точности перцентилей относительно точного расчёта."""
+        rng = random.Random(0)
+        values = [rng.lognormvariate(0, 1.5) for _ in range(5000)]
+        histogram = HdrHistogram(unit=0.001, max_value=3600.0)
+        for value in values:
+            histogram.record(value)
+        ordered = sorted(values)
+        for q in (50, 90, 99):
+            exact = ordered[-(-q * len(ordered) // 100) - 1]
+            self.assertAlmostEqual(histogram.percentile(q), exact, delta=exact * 0.02 + 0.001)
+        self.assertEqual(histogram.percentile(100), max(values))
+    
+    def test_fixed_memory_and_clamping(self):
+        """Тест фиксированного размера и значений выше max_value."""
+        histogram = HdrHistogram(unit=0.001, max_value=10.0)
+        size = len(histogram.counts)
+        for value in (0.0, 5.0, 1000.0):
+            histogram.record(value)
+        self.assertEqual(len(histogram.counts), size)
+        self.assertEqual(histogram.total, 3)
+        self.assertEqual(histogram.percentile(100), 1000.0)
+        self.assertLessEqual(histogram.percentile(90), 1000.0)
+    
+    def test_serialization_roundtrip(self):
+        """Тест сохранения и загрузки."""
+        histogram = HdrHistogram()
+        for value in (0.1, 0.2, 3.5):
+            histogram.record(value)
+        restored = HdrHistogram()
+        restored.load_dict(histogram.to_dict())
+        self.assertEqual(restored.counts, histogram.counts)
+        self.assertEqual(restored.total, 3)
+        self.assertEqual((restored.min, restored.max), (0.1, 3.5))
+    
+    def test_empty_summary(self):
+        """Тест сводки пустой гистограммы."""
+        self.assertEqual(summarize(HdrHistogram()), {'count': 0, 'p50': None, 'p90': None, 'p99': None})
+
+
+class TestWindowedHistogram(unittest.TestCase):
+    """Тесты для WindowedHistogram."""
+    
+    def test_sliding_window(self):
+        """Тест вытеснения старых срезов из окна."""
+        histogram = WindowedHistogram(slice_seconds=60, slices=5)
+        histogram.record(100.0, now=0)
+        for i in range(10):
+            histogram.record(1.0, now=600 + i)
+        recent = histogram.window(120, now=610)
+        self.assertEqual(recent.total, 10)
+        self.assertAlmostEqual(recent.percentile(99), 1.0, delta=0.02)
+        self.assertEqual(histogram.window(None).total, 11)
+        self.assertEqual(histogram.window(None).percentile(100), 100.0)
+    
+    def test_restore_drops_expired_slices(self):
+        """Тест загрузки: устаревшие срезы отбрасываются, накопленное сохраняется."""
+        histogram = WindowedHistogram(slice_seconds=60, slices=5)
+        histogram.record(2.0, now=0)
+        histogram.record(3.0, now=1000)
+        restored = WindowedHistogram(slice_seconds=60, slices=5)
+        restored.load_dict(histogram.to_dict(), now=1010)
+        self.assertEqual(restored.window(300, now=1010).total, 1)
+        self.assertEqual(restored.window(None).total, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Тесты для выгрузки истории чатов в датасет.
+"""
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from desktop.training.history_export import MinHashDeduplicator, export_history_dataset
+
+
+def message(session, role, content, timestamp, tags=None):
+    return {'id': f'{session}-{timestamp}', 'session_id': session, 'role': role, 'content': content,
+            'tags': tags or [], 'timestamp': timestamp}
+
+
+class TestHistoryExport(unittest.TestCase):
+    """Тесты для export_history_dataset и MinHashDeduplicator."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.history_dir = os.path.join(self.temp_dir, 'data')
+        os.makedirs(os.path.join(self.history_dir, 'archives'))
+        long_answer = ' '.join(f'слово{i}' for i in range(60))
+        archive = [
+            message('s1', 'user', 'Как настроить LoRA?', '2024-01-10T10:00:00', ['training']),
+            message('s1', 'assistant', 'Задайте lora_r и lora_alpha.', '2024-01-10T10:00:05'),
+            message('s1', 'user', 'Что такое MoE?', '2024-01-10T10:01:00'),
+            message('s1', 'assistant', long_answer, '2024-01-10T10:01:05'),
+            # Вопрос без ответа в архиве: ответ лежит уже в текущей истории
+            message('s2', 'user', 'Сколько экспертов?', '2024-03-01T09:00:00', ['training']),
+        ]
+        current = [
+            message('s2', 'assistant', '64 эксперта, top-6.', '2024-03-01T09:00:03'),
+            message('s2', 'user', '  как настроить   LoRA? ', '2024-03-01T09:02:00', ['training']),
+            message('s2', 'assistant', 'Задайте lora_r и lora_alpha.', '2024-03-01T09:02:04'),
+            message('s2', 'user', 'Что такое MoE, ещё раз?', '2024-03-01T09:03:00'),
+            message('s2', 'assistant', long_answer + ' конец', '2024-03-01T09:03:05'),
+        ]
+        with open(os.path.join(self.history_dir, 'archives', 'chat-20240110-100200.json'), 'w', encoding='utf-8') as f:
+            json.dump(archive, f, ensure_ascii=False)
+        with open(os.path.join(self.history_dir, 'chat_history.json'), 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False)
+        self.output_dir = os.path.join(self.temp_dir, 'dataset')
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir)
+    
+    def read_records(self, manifest):
+        records = []
+        for path in manifest['dataset_paths']:
+            with open(path, 'r', encoding='utf-8') as f:
+                records.extend(json.loads(line) for line in f)
+        return records
+    
+    def test_pairs_and_dedup(self):
+        """Тест пар через границу файлов, точных и почти точных дубликатов."""
+        manifest = export_history_dataset(self.history_dir, self.output_dir, shard_size=2)
+        records = self.read_records(manifest)
+        self.assertEqual([r['instruction'] for r in records],
+                         ['Как настроить LoRA?', 'Что такое MoE?', 'Сколько экспертов?'])
+        self.assertEqual(records[2]['output'], '64 эксперта, top-6.')
+        self.assertEqual(set(records[0]), {'instruction', 'input', 'output', 'tags'})
+        self.assertEqual(manifest['stats']['exact_duplicates'], 1)
+        self.assertEqual(manifest['stats']['near_duplicates'], 1)
+        self.assertEqual(len(manifest['dataset_paths']), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'manifest.json')))
+    
+    def test_filters(self):
+        """Тест фильтров по тегам и дате."""
+        manifest = export_history_dataset(self.history_dir, self.output_dir, tags=['training'],
+                                          start=datetime(2024, 2, 1))
+        records = self.read_records(manifest)
+        self.assertEqual([r['instruction'] for r in records], ['Сколько экспертов?', '  как настроить   LoRA? '])
+        self.assertEqual(manifest['stats']['filtered'], 3)
+    
+    def test_minhash_similarity(self):
+        """Тест оценки сходства MinHash."""
+        dedup = MinHashDeduplicator(num_perm=128, bands=32)
+        words = [f'w{i}' for i in range(200)]
+        base = dedup.signature(' '.join(words))
+        close = dedup.signature(' '.join(words[:-2] + ['x', 'y']))
+        other = dedup.signature(' '.join(f'z{i}' for i in range(200)))
+        self.assertGreater(dedup.similarity(base, close), 0.85)
+        self.assertLess(dedup.similarity(base, other), 0.1)
+    
+    def test_max_records_caps_index(self):
+        """Тест ограничения индекса дубликатов."""
+        dedup = MinHashDeduplicator(max_records=2)
+        texts = [' '.join(f'{prefix}{i}' for i in range(50)) for prefix in 'abc']
+        for text in texts:
+            self.assertFalse(dedup.is_duplicate(text))
+        self.assertEqual(dedup.records, 2)
+        self.assertEqual(len(dedup._signatures), 2 * dedup.num_perm)
+        # Запомненные записи по-прежнему находятся, незапомненная — нет
+        self.assertTrue(dedup.is_duplicate(texts[0]))
+        self.assertTrue(dedup.is_duplicate(' '.join(f'b{i}' for i in range(49)) + ' x'))
+        self.assertFalse(dedup.is_duplicate(texts[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Тесты для сборщика метрик.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from desktop.utils.metrics import MetricsCollector
+
+
+class TestMetricsCollector(unittest.TestCase):
+    """Тесты для MetricsCollector."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.metrics = MetricsCollector(max_history=3)
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_stages_attached_to_record(self):
+        """Тест сохранения стадий в записи запроса."""
+        self.metrics.record_response(1.5, stages={'tokenize': 0.01, 'prefill': 0.4})
+        record = self.metrics.request_history[-1]
+        self.assertEqual(record['stages'], {'tokenize': 0.01, 'prefill': 0.4})
+        self.metrics.record_response(0.5, success=False, error='ошибка')
+        self.assertEqual(self.metrics.request_history[-1]['stages'], {})
+    
+    def test_stage_aggregation(self):
+        """Тест агрегации стадий по последним запросам."""
+        for value in (0.1, 0.2, 0.3, 0.5):
+            self.metrics.record_response(1.0, stages={'prefill': value, 'new_tokens': 10})
+        stages = self.metrics.get_stats()['stages']
+        self.assertAlmostEqual(stages['prefill']['avg'], 0.3333, places=4)
+        self.assertEqual(stages['prefill']['max'], 0.5)
+        self.assertEqual(stages['prefill']['last'], 0.5)
+        self.assertEqual(stages['new_tokens']['avg'], 10)
+    
+    def test_reset_clears_stages(self):
+        """Тест сброса стадий."""
+        self.metrics.record_response(1.0, stages={'decode': 0.7})
+        self.metrics.reset()
+        self.assertEqual(self.metrics.get_stats()['stages'], {})
+
+    
+    def test_history_is_bounded(self):
+        """Тест ограничения истории запросов."""
+        for i in range(5):
+            self.metrics.record_response(float(i))
+        self.assertEqual(len(self.metrics.request_history), 3)
+        self.assertEqual(self.metrics.request_history[0]['response_time'], 2.0)
+    
+    def test_percentiles(self):
+        """Тест перцентилей задержки, TTFT и токенов в секунду."""
+        for i in range(100):
+            self.metrics.record_response(1.0, stages={'ttft': 0.2, 'new_tokens': 50})
+        self.metrics.record_response(300.0, stages={'ttft': 0.2, 'new_tokens': 50})
+        self.metrics.record_response(1000.0, success=False, error='таймаут')
+        percentiles = self.metrics.get_stats()['percentiles']
+        latency = percentiles['latency']['5m']
+        self.assertEqual(latency['count'], 101)
+        self.assertAlmostEqual(latency['p50'], 1.0, delta=0.02)
+        self.assertAlmostEqual(latency['p99'], 1.0, delta=0.02)
+        self.assertEqual(percentiles['latency']['all']['count'], 101)
+        self.assertAlmostEqual(percentiles['ttft']['1h']['p90'], 0.2, delta=0.01)
+        self.assertAlmostEqual(percentiles['tokens_per_second']['all']['p50'], 50.0, delta=1.0)
+    
+    def test_counters_persist_across_restarts(self):
+        """Тест сохранения счётчиков и гистограмм между запусками."""
+        path = os.path.join(self.temp_dir, 'metrics', 'metrics.json')
+        first = MetricsCollector(storage_path=path)
+        first.record_response(2.0, stages={'ttft': 0.5, 'new_tokens': 10})
+        first.record_response(1.0, success=False, error='ошибка')
+        first.record_cache_hit('memory')
+        first.record_cache_miss()
+        first.save()
+        
+        second = MetricsCollector(storage_path=path)
+        stats = second.get_stats()
+        self.assertEqual(stats['successful'], 1)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['cache_hits_by_tier'], {'memory': 1})
+        self.assertEqual(stats['cache_misses'], 1)
+        self.assertEqual(stats['percentiles']['latency']['all']['count'], 1)
+        self.assertAlmostEqual(stats['percentiles']['latency']['5m']['p50'], 2.0, delta=0.04)
+    
+    def test_maybe_save_respects_interval(self):
+        """Тест периодического сохранения."""
+        path = os.path.join(self.temp_dir, 'metrics.json')
+        metrics = MetricsCollector(storage_path=path)
+        metrics.record_response(1.0)
+        metrics.maybe_save(interval=3600)
+        self.assertFalse(os.path.exists(path))
+        metrics.maybe_save(interval=0)
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Тесты для менеджера модели.
+"""
+import unittest
+import tempfile
+import shutil
+
+try:
+    import torch
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+from desktop.core.model_manager import ModelManager, ModelState
+
+
+class TestModelManagerState(unittest.TestCase):
+    """Тесты жизненного цикла ModelManager."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_missing_model_is_degraded(self):
+        """Тест перехода в degraded без модели."""
+        manager = ModelManager(self.temp_dir, {}, runtime_config={'warmup': True})
+        self.assertTrue(manager.is_fallback)
+        self.assertEqual(manager.state, ModelState.DEGRADED)
+        self.assertEqual(manager.get_metadata()['state'], 'degraded')
+        self.assertIsNone(manager.get_fingerprint())
+    
+    def test_fallback_generation_still_answers(self):
+        """Тест ответа в fallback режиме."""
+        manager = ModelManager(self.temp_dir, {})
+        response = manager.generate('Пользователь: привет\nАссистент:')
+        self.assertIn('привет', response)
+
+
+class _Closable:
+    def __init__(self):
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestModelManagerInstall(unittest.TestCase):
+    """Тесты подключения загруженной модели."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = ModelManager(self.temp_dir, {}, runtime_config={'adapter_cache_size': 2})
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_install_from_fallback(self):
+        """Тест подключения модели после старта в fallback."""
+        self.assertTrue(self.manager.is_fallback)
+        model = build_tiny_model()
+        self.manager.install_model(model, torch.device('cpu'))
+        self.assertFalse(self.manager.is_fallback)
+        self.assertIs(self.manager.model, model)
+        self.assertIs(self.manager.adapters.base_model, model)
+        self.assertEqual(self.manager.adapters.capacity, 2)
+    
+    def test_reinstall_drops_old_model_state(self):
+        """Тест сброса адаптеров, пакетных LoRA и предзагрузчика прежней модели."""
+        self.manager.install_model(build_tiny_model(), torch.device('cpu'), expert_prefetcher=_Closable())
+        prefetcher = self.manager.expert_prefetcher
+        multi_lora = self.manager.multi_lora = _Closable()
+        model = build_tiny_model()
+        self.manager.install_model(model, torch.device('cpu'))
+        self.assertTrue(prefetcher.closed)
+        self.assertTrue(multi_lora.closed)
+        self.assertIsNone(self.manager.multi_lora)
+        self.assertIsNone(self.manager.expert_prefetcher)
+        self.assertIs(self.manager.adapters.model, model)
+
+
+if __name__ == '__main__':
+    unittest.main()
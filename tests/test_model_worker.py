@@ -0,0 +1,108 @@
+"""
+Тесты для процесса модели.
+"""
+import unittest
+import multiprocessing
+import queue
+import tempfile
+import shutil
+import threading
+import time
+
+from desktop.core.model_manager import ModelState
+from desktop.core.model_worker import RemoteModelManager
+
+
+class TestRemoteModelManager(unittest.TestCase):
+    """Тесты RemoteModelManager с моделью в fallback режиме."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = RemoteModelManager(self.temp_dir, {}, runtime_config={
+            'heartbeat_interval': 0.1,
+            'heartbeat_timeout': 30.0,
+            'max_worker_restarts': 1
+        })
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        self.manager.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _wait_for_state(self, state, timeout=30.0):
+        deadline = time.time() + timeout
+        while self.manager.state != state and time.time() < deadline:
+            time.sleep(0.05)
+        return self.manager.state == state
+    
+    def test_generate_in_worker(self):
+        """Тест генерации в отдельном процессе."""
+        self.assertTrue(self._wait_for_state(ModelState.DEGRADED))
+        self.assertTrue(self.manager.is_fallback)
+        response = self.manager.generate('Пользователь: привет\nАссистент:')
+        self.assertIn('привет', response)
+        self.assertIsNone(self.manager.last_generation_error)
+        self.assertTrue(self.manager.get_metadata()['out_of_process'])
+    
+    def test_cancel_before_generate_is_kept(self):
+        """Тест: отмена до начала генерации не теряется."""
+        self.assertTrue(self._wait_for_state(ModelState.DEGRADED))
+        stop_event = threading.Event()
+        stop_event.set()
+        sent = []
+        send = self.manager._send
+        self.manager._send = lambda *message: sent.append(message) or send(*message)
+        self.manager.generate('Пользователь: привет\nАссистент:', stop_event=stop_event)
+        self.assertEqual(self.manager.last_generation_error, 'генерация отменена')
+        self.assertFalse([message for message in sent if message[0] == 'generate'])
+    
+    def test_worker_restarts_after_crash(self):
+        """Тест перезапуска процесса после падения."""
+        self.assertTrue(self._wait_for_state(ModelState.DEGRADED))
+        first_pid = self.manager._process.pid
+        self.manager._process.kill()
+        deadline = time.time() + 30.0
+        while time.time() < deadline:
+            process = self.manager._process
+            if process is not None and process.pid != first_pid and self.manager.state == ModelState.DEGRADED:
+                break
+            time.sleep(0.05)
+        self.assertNotEqual(self.manager._process.pid, first_pid)
+        response = self.manager.generate('Пользователь: снова\nАссистент:')
+        self.assertIn('снова', response)
+    
+    def test_reader_survives_failing_callback(self):
+        """Тест: ошибка в on_runtime_tuned не останавливает поток чтения."""
+        def failing_callback(tuned):
+            raise RuntimeError('сбой сохранения настроек')
+        
+        self.manager.on_runtime_tuned = failing_callback
+        pending = queue.Queue()
+        self.manager._pending['request'] = pending
+        reader_conn, writer_conn = multiprocessing.Pipe()
+        reader = threading.Thread(target=self.manager._reader_loop, args=(reader_conn,))
+        reader.start()
+        writer_conn.send(('runtime_tuned', {'num_threads': 2}))
+        writer_conn.send(('result', 'request', 42))
+        writer_conn.close()
+        reader.join(timeout=10)
+        self.assertEqual(pending.get(timeout=1), ('result', 'request', 42))
+        self.assertEqual(self.manager.runtime_config['num_threads'], 2)
+    
+    def test_restart_keeps_switched_adapter(self):
+        """Тест: после смены адаптера перезапущенный процесс получает новый адаптер."""
+        self.assertTrue(self._wait_for_state(ModelState.DEGRADED))
+        adapter = {'name': 'support', 'path': '/adapters/support', 'merge': False}
+        status = {'state': ModelState.READY.value}
+        self.manager._request = lambda message: ('result', message[1], {'ok': True, 'status': status, 'adapter': adapter})
+        self.assertTrue(self.manager.set_adapter('support', '/adapters/support'))
+        self.assertEqual(self.manager.runtime_config['adapter'], adapter)
+        
+        self.manager._request = lambda message: ('result', message[1], {'ok': True, 'status': status, 'adapter': None})
+        self.assertTrue(self.manager.unload_adapter('support'))
+        self.assertIsNone(self.manager.runtime_config['adapter'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Тесты для обучающего пути MoE.
+"""
+import unittest
+
+try:
+    import torch
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+def reference_moe_train(moe, hidden_states, flat_topk_idx, topk_weight):
+    # Прежняя реализация: копия каждого токена на каждого эксперта и маски по экспертам
+    hidden_states = hidden_states.repeat_interleave(moe.num_experts_per_tok, dim=0)
+    y = torch.empty_like(hidden_states)
+    for i, expert in enumerate(moe.experts):
+        y[flat_topk_idx == i] = expert(hidden_states[flat_topk_idx == i])
+    y = (y.view(*topk_weight.shape, -1) * topk_weight.unsqueeze(-1)).sum(dim=1)
+    return y.to(hidden_states.dtype)
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestMoETrain(unittest.TestCase):
+    """Сравнение сортирующего moe_train с поэкспертным циклом по маскам."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.moe = build_tiny_model().model.layers[1].mlp
+        self.moe.train()
+        self.hidden = torch.randn(3, 7, 64, generator=torch.Generator().manual_seed(5))
+    
+    def run_path(self, fn):
+        self.moe.zero_grad()
+        hidden = self.hidden.clone().requires_grad_(True)
+        topk_idx, topk_weight, _ = self.moe.gate(hidden)
+        flat = hidden.view(-1, hidden.shape[-1])
+        y = fn(flat, topk_idx.view(-1), topk_weight)
+        (y * torch.linspace(-1, 1, y.numel()).view_as(y)).sum().backward()
+        grads = {name: param.grad.clone() for name, param in self.moe.named_parameters() if param.grad is not None}
+        return y.detach(), hidden.grad.clone(), grads
+    
+    def test_matches_reference(self):
+        """Тест совпадения выхода и градиентов по входу, роутеру и экспертам."""
+        expected_y, expected_input_grad, expected_grads = self.run_path(
+            lambda x, idx, w: reference_moe_train(self.moe, x, idx, w)
+        )
+        y, input_grad, grads = self.run_path(self.moe.moe_train)
+
+        torch.testing.assert_close(y, expected_y, atol=1e-5, rtol=1e-5)
+        torch.testing.assert_close(input_grad, expected_input_grad, atol=1e-5, rtol=1e-5)
+        self.assertIn('gate.weight', grads)
+        for name, grad in expected_grads.items():
+            if name in grads:
+                torch.testing.assert_close(grads[name], grad, atol=1e-5, rtol=1e-5)
+            else:
+                # Эксперт без токенов не вызывается — в эталоне его градиент нулевой
+                self.assertEqual(grad.abs().sum().item(), 0.0)
+    
+    def test_forward_in_training_mode(self):
+        """Тест полного прохода модели с обратным распространением."""
+        model = build_tiny_model()
+        model.train()
+        input_ids = torch.randint(1, 128, (2, 9), generator=torch.Generator().manual_seed(6))
+        loss = model(input_ids=input_ids, labels=input_ids).loss
+        loss.backward()
+        self.assertTrue(torch.isfinite(loss))
+        self.assertIsNotNone(model.model.layers[1].mlp.gate.weight.grad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Тесты для пакетной генерации с разными LoRA-адаптерами.
+"""
+import unittest
+import shutil
+import tempfile
+
+try:
+    import torch
+    from peft import LoraConfig, PeftModel, get_peft_model
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+    from desktop.core.multi_lora import MultiLoraRuntime
+    from desktop.core.model_manager import ModelManager
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch, transformers и peft')
+class TestMultiLoraRuntime(unittest.TestCase):
+    """Тесты для MultiLoraRuntime."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        # Разные ранги и целевые слои, чтобы проверить дополнение нулями
+        self.paths = {
+            'a': self.save_adapter('a', 1, r=4, targets=['q_proj', 'v_proj']),
+            'b': self.save_adapter('b', 2, r=8, targets=['q_proj', 'o_proj']),
+        }
+        self.input_ids = torch.randint(0, 128, (3, 6), generator=torch.Generator().manual_seed(0))
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir)
+    
+    def save_adapter(self, name, seed, r, targets):
+        base = build_tiny_model()
+        torch.manual_seed(seed)
+        config = LoraConfig(r=r, lora_alpha=16, target_modules=targets, init_lora_weights=False)
+        path = f'{self.temp_dir}/{name}'
+        get_peft_model(base, config).save_pretrained(path)
+        return path
+    
+    def reference_logits(self, name, input_ids):
+        model = build_tiny_model()
+        if name is not None:
+            model = PeftModel.from_pretrained(model, self.paths[name])
+            model.eval()
+        with torch.no_grad():
+            return model(input_ids=input_ids).logits
+    
+    def test_mixed_batch_matches_single_adapters(self):
+        """Тест: строка батча совпадает с отдельным прогоном своего адаптера."""
+        model = build_tiny_model()
+        runtime = MultiLoraRuntime(model)
+        for name, path in self.paths.items():
+            runtime.load(name, path)
+        names = ['a', None, 'b']
+        with runtime.use(names), torch.no_grad():
+            logits = model(input_ids=self.input_ids).logits
+        for row, name in enumerate(names):
+            expected = self.reference_logits(name, self.input_ids[row:row + 1])
+            torch.testing.assert_close(logits[row:row + 1], expected, atol=1e-5, rtol=1e-4)
+        # Вне use хуки ничего не добавляют
+        with torch.no_grad():
+            torch.testing.assert_close(model(input_ids=self.input_ids).logits, self.reference_logits(None, self.input_ids))
+    
+    def test_capacity_and_unknown_adapter(self):
+        """Тест вытеснения по LRU и ошибки для незагруженного адаптера."""
+        runtime = MultiLoraRuntime(build_tiny_model(), capacity=1)
+        runtime.load('a', self.paths['a'])
+        runtime.load('b', self.paths['b'])
+        self.assertEqual(list(runtime.loaded), ['b'])
+        with self.assertRaises(KeyError):
+            with runtime.use(['a']):
+                pass
+    
+    def test_ensure_keeps_batch_adapters(self):
+        """Тест: загрузка адаптеров батча не вытесняет уже загруженные адаптеры того же батча."""
+        self.paths['c'] = self.save_adapter('c', 3, r=2, targets=['q_proj'])
+        runtime = MultiLoraRuntime(build_tiny_model(), capacity=2)
+        runtime.load('a', self.paths['a'])
+        runtime.load('b', self.paths['b'])
+        runtime.ensure(['a', 'c'], self.paths)
+        self.assertEqual(sorted(runtime.loaded), ['a', 'c'])
+        with runtime.use(['a', 'c']):
+            pass
+        with self.assertRaises(ValueError):
+            runtime.ensure(['a', 'b', 'c'], self.paths)
+        with self.assertRaises(KeyError):
+            runtime.ensure(['d'], self.paths)
+    
+    def test_request_adapter_on_model_manager(self):
+        """Тест: адаптер одного запроса включается только на время запроса."""
+        manager = ModelManager(self.temp_dir, {})
+        manager.install_model(build_tiny_model(), torch.device('cpu'))
+        input_ids = self.input_ids[:1]
+        with torch.no_grad():
+            with manager._request_adapters(['a'], self.paths):
+                adapted = manager.model(input_ids=input_ids).logits
+            base = manager.model(input_ids=input_ids).logits
+        torch.testing.assert_close(adapted, self.reference_logits('a', input_ids), atol=1e-5, rtol=1e-4)
+        torch.testing.assert_close(base, self.reference_logits(None, input_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
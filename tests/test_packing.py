@@ -0,0 +1,80 @@
+"""
+Тесты для упаковки образцов при дообучении.
+"""
+import unittest
+
+try:
+    import torch
+    from datasets import Dataset
+    from desktop.training.packing import pack_sequences, pack_dataset, PackedSequenceCollator, IGNORE_INDEX
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch, transformers и datasets')
+class TestPacking(unittest.TestCase):
+    """Тесты для pack_dataset и PackedSequenceCollator."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        generator = torch.Generator().manual_seed(7)
+        self.samples = [torch.randint(1, 128, (length,), generator=generator).tolist() for length in (5, 9, 3, 12, 7)]
+        self.dataset = Dataset.from_list([{'input_ids': ids, 'labels': ids} for ids in self.samples])
+    
+    def test_pack_sequences_respects_capacity(self):
+        """Тест того, что пакеты не длиннее ограничения и содержат все образцы."""
+        lengths = [5, 9, 3, 12, 7, 1, 16]
+        packs = pack_sequences(lengths, 16)
+        self.assertEqual(sorted(index for pack in packs for index in pack), list(range(len(lengths))))
+        for pack in packs:
+            self.assertLessEqual(sum(lengths[index] for index in pack), 16)
+        self.assertEqual(len(packs), 4)
+        with self.assertRaises(ValueError):
+            pack_sequences([17], 16)
+    
+    def test_pack_dataset_stats(self):
+        """Тест статистики эффективности упаковки."""
+        packed, stats = pack_dataset(self.dataset, 16)
+        self.assertEqual(stats['tokens'], 36)
+        self.assertEqual(stats['samples'], 5)
+        self.assertEqual(stats['packs'], len(packed))
+        self.assertGreater(stats['efficiency'], stats['unpacked_efficiency'])
+    
+    def test_collator_boundaries(self):
+        """Тест позиций, меток и маски на границах образцов."""
+        collator = PackedSequenceCollator(pad_token_id=0)
+        batch = collator([
+            {'input_ids': [1, 2, 3, 4, 5], 'labels': [1, 2, 3, 4, 5], 'seq_lens': [2, 3]},
+            {'input_ids': [6, 7], 'labels': [6, 7], 'seq_lens': [2]},
+        ])
+        self.assertEqual(batch['position_ids'][0].tolist(), [0, 1, 0, 1, 2])
+        self.assertEqual(batch['labels'][0].tolist(), [IGNORE_INDEX, 2, IGNORE_INDEX, 4, 5])
+        self.assertEqual(batch['labels'][1].tolist(), [IGNORE_INDEX, 7, IGNORE_INDEX, IGNORE_INDEX, IGNORE_INDEX])
+        mask = batch['attention_mask'][0, 0] == 0
+        self.assertTrue(mask[3, 2])
+        self.assertFalse(mask[3, 1])
+        self.assertFalse(mask[1, 2])
+        self.assertAlmostEqual(collator.efficiency, 7 / 10)
+    
+    def test_packed_logits_match_separate(self):
+        """Тест того, что образцы в пакете не видят друг друга."""
+        model = build_tiny_model()
+        first, second = self.samples[0], self.samples[1]
+        batch = PackedSequenceCollator(pad_token_id=0)([
+            {'input_ids': first + second, 'labels': first + second, 'seq_lens': [len(first), len(second)]}
+        ])
+        with torch.no_grad():
+            packed = model(
+                input_ids=batch['input_ids'],
+                attention_mask=batch['attention_mask'],
+                position_ids=batch['position_ids']
+            ).logits[0]
+            expected_first = model(input_ids=torch.tensor([first])).logits[0]
+            expected_second = model(input_ids=torch.tensor([second])).logits[0]
+        torch.testing.assert_close(packed[:len(first)], expected_first, atol=1e-5, rtol=1e-5)
+        torch.testing.assert_close(packed[len(first):], expected_second, atol=1e-5, rtol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Тесты для потоковой оценки перплексии.
+"""
+import unittest
+import math
+
+try:
+    import torch
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+    from desktop.training.perplexity import StreamingPerplexity
+except ImportError:
+    TORCH_AVAILABLE = False
+
+
+def reference_nll(model, tokens, window, stride):
+    # Пересчёт каждого токена с нуля по тому же контексту, что видит скользящее окно
+    keep = window - stride
+    nll = 0.0
+    for p in range(1, len(tokens)):
+        chunk_start = (p // stride) * stride
+        context_start = max(0, chunk_start - keep) if p > chunk_start else max(0, chunk_start - stride - keep)
+        input_ids = torch.tensor([tokens[context_start:p]])
+        position_ids = torch.arange(context_start, p)[None]
+        with torch.no_grad():
+            logits = model(input_ids=input_ids, position_ids=position_ids).logits[0, -1]
+        nll -= torch.log_softmax(logits.float(), dim=-1)[tokens[p]].item()
+    return nll
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestStreamingPerplexity(unittest.TestCase):
+    """Тесты для StreamingPerplexity."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.model = build_tiny_model()
+        generator = torch.Generator().manual_seed(3)
+        self.docs = [
+            (torch.randint(1, 128, (length,), generator=generator).tolist(), tags)
+            for length, tags in ((23, ['code']), (9, ['chat']), (2, []), (17, ['code', 'chat']))
+        ]
+    
+    def documents(self):
+        # Токены документа приходят блоками произвольного размера
+        for tokens, tags in self.docs:
+            yield iter([tokens[:5], tokens[5:]]), tags
+    
+    def test_matches_reference(self):
+        """Тест совпадения с пересчётом без кэша при разных размерах батча."""
+        window, stride = 8, 3
+        expected = {}
+        for tokens, tags in self.docs:
+            nll = reference_nll(self.model, tokens, window, stride)
+            for tag in (tags or ['untagged']) + ['all']:
+                total = expected.setdefault(tag, [0.0, 0])
+                total[0] += nll
+                total[1] += len(tokens) - 1
+        for batch_size in (1, 3):
+            result = StreamingPerplexity(self.model, window=window, stride=stride, batch_size=batch_size).evaluate(self.documents())
+            self.assertEqual(result['documents'], 4)
+            self.assertEqual(result['tokens'], expected['all'][1])
+            self.assertAlmostEqual(result['perplexity'], math.exp(expected['all'][0] / expected['all'][1]), places=4)
+            for tag in ('code', 'chat', 'untagged'):
+                nll, tokens = expected[tag]
+                self.assertEqual(result['domains'][tag]['tokens'], tokens)
+                self.assertAlmostEqual(result['domains'][tag]['perplexity'], math.exp(nll / tokens), places=4)
+    
+    def test_without_overlap(self):
+        """Тест окна без перекрытия (stride == window, контекст не переносится)."""
+        result = StreamingPerplexity(self.model, window=4, stride=4, batch_size=2).evaluate(self.documents())
+        total = sum(reference_nll(self.model, tokens, 4, 4) for tokens, _ in self.docs)
+        self.assertAlmostEqual(result['nll'], total / result['tokens'], places=4)
+    
+    def test_invalid_stride(self):
+        """Тест проверки параметров окна."""
+        with self.assertRaises(ValueError):
+            StreamingPerplexity(self.model, window=4, stride=8)
+
+
+if __name__ == '__main__':
+    unittest.main()
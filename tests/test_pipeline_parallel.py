@@ -0,0 +1,70 @@
+"""
+Тесты для конвейерного параллелизма.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+
+try:
+    import torch
+    import torch.distributed as dist
+    import torch.multiprocessing as mp
+    from desktop.core.parallel.tensor_parallel import init_process_group
+    from desktop.core.parallel.pipeline import PipelineStage, prune_to_stage
+    from tests.test_tensor_parallel import build_tiny_model, TORCH_AVAILABLE
+except ImportError:
+    TORCH_AVAILABLE = False
+
+BOUNDS = [(0, 1), (1, 2)]
+MAX_NEW_TOKENS = 5
+
+
+def pipeline_worker(rank, init_file, micro_batches, result_path):
+    init_process_group(rank, len(BOUNDS), init_method=f'file://{init_file}')
+    start, end = BOUNDS[rank]
+    model = prune_to_stage(build_tiny_model(), start, end, rank == 0, rank == len(BOUNDS) - 1)
+    stage = PipelineStage(model, rank, BOUNDS)
+    generated = stage.generate(micro_batches, MAX_NEW_TOKENS)
+    if stage.is_last:
+        torch.save(generated, result_path)
+    dist.destroy_process_group()
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestPipelineParallel(unittest.TestCase):
+    """Сравнение конвейера из двух стадий с однопроцессной жадной генерацией."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_matches_single_process(self):
+        """Тест совпадения токенов для нескольких микробатчей."""
+        generator = torch.Generator().manual_seed(3)
+        micro_batches = []
+        for length in (6, 9, 4):
+            input_ids = torch.randint(1, 128, (1, length), generator=generator)
+            micro_batches.append({'input_ids': input_ids, 'attention_mask': torch.ones_like(input_ids)})
+
+        result_path = os.path.join(self.temp_dir, 'result.pt')
+        init_file = os.path.join(self.temp_dir, 'init')
+        mp.spawn(pipeline_worker, args=(init_file, micro_batches, result_path), nprocs=len(BOUNDS), join=True)
+        generated = torch.load(result_path)
+
+        model = build_tiny_model()
+        for batch, tokens in zip(micro_batches, generated):
+            with torch.no_grad():
+                expected = model.generate(
+                    **batch, max_new_tokens=MAX_NEW_TOKENS, min_new_tokens=MAX_NEW_TOKENS,
+                    do_sample=False, pad_token_id=0
+                )
+            self.assertTrue(torch.equal(tokens, expected[:, batch['input_ids'].shape[1]:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Тесты для балансировки стадий конвейера.
+"""
+import unittest
+from types import SimpleNamespace
+
+from desktop.core.parallel.schedule import balance_stages, estimate_layer_costs
+
+
+class TestBalanceStages(unittest.TestCase):
+    """Тесты для balance_stages."""
+    
+    def test_uniform_layers_split_evenly(self):
+        """Тест равномерного разбиения одинаковых слоёв."""
+        self.assertEqual(balance_stages([1.0] * 8, 4), [(0, 2), (2, 4), (4, 6), (6, 8)])
+    
+    def test_heavy_layer_gets_own_stage(self):
+        """Тест выделения тяжёлого слоя в отдельную стадию."""
+        bounds = balance_stages([6.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0], 2)
+        self.assertEqual(bounds, [(0, 1), (1, 7)])
+    
+    def test_extra_costs_shift_boundaries(self):
+        """Тест учёта lm_head в последней стадии."""
+        bounds = balance_stages([1.0] * 6, 2, last_extra=2.0)
+        self.assertEqual(bounds, [(0, 4), (4, 6)])
+    
+    def test_covers_all_layers(self):
+        """Тест непрерывности и полноты разбиения."""
+        costs = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0, 5.0, 3.0]
+        bounds = balance_stages(costs, 3)
+        self.assertEqual(bounds[0][0], 0)
+        self.assertEqual(bounds[-1][1], len(costs))
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(end, start)
+        self.assertLessEqual(max(sum(costs[s:e]) for s, e in bounds), 14.0)
+    
+    def test_invalid_stage_count(self):
+        """Тест ошибки при числе стадий больше числа слоёв."""
+        with self.assertRaises(ValueError):
+            balance_stages([1.0, 1.0], 3)
+    
+    def test_dense_first_layer_estimated_separately(self):
+        """Тест оценки: плотный первый слой считается отдельно от MoE-слоёв."""
+        config = SimpleNamespace(
+            hidden_size=2048, num_attention_heads=16, num_key_value_heads=8, head_dim=128,
+            intermediate_size=14336, moe_intermediate_size=1792, num_hidden_layers=28,
+            n_routed_experts=64, num_experts_per_tok=6, n_shared_experts=2,
+            first_k_dense_replace=1, moe_layer_freq=1, vocab_size=128256
+        )
+        costs, _, last_extra = estimate_layer_costs(config)
+        self.assertEqual(len(costs), 28)
+        self.assertNotEqual(costs[0], costs[1])
+        self.assertEqual(len(set(costs[1:])), 1)
+        self.assertGreater(last_extra, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
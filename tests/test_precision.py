@@ -0,0 +1,48 @@
+"""
+Тесты для выбора точности вычислений.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+import json
+
+from desktop.core.precision import select_dtypes, cpu_supports_bf16
+
+
+class TestPrecision(unittest.TestCase):
+    """Тесты для select_dtypes."""
+
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_bf16_cpu(self):
+        """Тест выбора bfloat16 при наличии AVX512-BF16."""
+        flags = {'avx512f', 'avx512_bf16'}
+        self.assertTrue(cpu_supports_bf16(flags))
+        self.assertEqual(select_dtypes('auto', 'cpu', flags=flags), ('bfloat16', 'bfloat16'))
+
+    def test_fp32_compute_without_bf16(self):
+        """Тест вычислений в float32 поверх формата чекпоинта."""
+        with open(os.path.join(self.temp_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump({'torch_dtype': 'float16'}, f)
+        flags = {'avx2'}
+        self.assertFalse(cpu_supports_bf16(flags))
+        self.assertEqual(select_dtypes('auto', 'cpu', self.temp_dir, flags), ('float16', 'float32'))
+        self.assertEqual(select_dtypes('auto', 'cpu', flags=flags), ('bfloat16', 'float32'))
+
+    def test_override(self):
+        """Тест явного выбора типа в настройках."""
+        flags = {'amx_bf16'}
+        self.assertEqual(select_dtypes('float32', 'cpu', flags=flags), ('float32', 'float32'))
+        self.assertEqual(select_dtypes('mixed', 'cpu', flags=flags), ('bfloat16', 'float32'))
+        self.assertEqual(select_dtypes('unknown', 'cuda', flags=flags), ('float16', 'float16'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Тесты для отчётов об обучении.
+"""
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from desktop.training.reports.report_builder import ReportBuilder
+
+
+class TestReportBuilder(unittest.TestCase):
+    """Тесты для ReportBuilder."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_throughput_section(self):
+        """Тест сохранения производительности в JSON и Markdown."""
+        throughput = {
+            'summary': {'tokens_per_second': 1200.5, 'forward_seconds': 0.4, 'peak_rss_gb': 12.3},
+            'history': [
+                {'step': 10, 'tokens_per_second': 1100.0, 'forward_seconds': 0.41, 'peak_rss_gb': 12.1},
+                {'step': 20, 'tokens_per_second': 1301.0, 'forward_seconds': 0.39, 'peak_rss_gb': 12.3},
+            ],
+        }
+        meta = ReportBuilder(self.temp_dir).save({'perplexity': 5.0}, {'max_steps': 20}, throughput=throughput)
+        with open(meta['json'], 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        self.assertEqual(payload['throughput'], throughput)
+        with open(meta['markdown'], 'r', encoding='utf-8') as f:
+            markdown = f.read()
+        self.assertIn('## Производительность', markdown)
+        self.assertIn('tokens_per_second: 1200.5', markdown)
+    
+    def test_without_throughput(self):
+        """Тест отчёта без данных о производительности."""
+        meta = ReportBuilder(self.temp_dir).save({'perplexity': 5.0}, {'max_steps': 20})
+        with open(meta['json'], 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        self.assertNotIn('throughput', payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
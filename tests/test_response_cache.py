@@ -0,0 +1,81 @@
+"""
+Тесты для кэша ответов.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+from unittest import mock
+
+from desktop.core.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Тесты для класса ResponseCache."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'cache', 'responses.db')
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_key_uses_normalized_prompt(self):
+        """Тест нормализации промпта в ключе."""
+        params = {'do_sample': False, 'max_new_tokens': 200}
+        first = ResponseCache.make_key('Привет,   МИР ', 'system', params, 'model')
+        second = ResponseCache.make_key('привет, мир', 'system', params, 'model')
+        self.assertEqual(first, second)
+    
+    def test_key_depends_on_params_and_model(self):
+        """Тест зависимости ключа от параметров и модели."""
+        base = ResponseCache.make_key('вопрос', 'system', {'max_new_tokens': 200}, 'model-a')
+        self.assertNotEqual(base, ResponseCache.make_key('вопрос', 'system', {'max_new_tokens': 100}, 'model-a'))
+        self.assertNotEqual(base, ResponseCache.make_key('вопрос', 'system', {'max_new_tokens': 200}, 'model-b'))
+        self.assertNotEqual(base, ResponseCache.make_key('вопрос', 'other', {'max_new_tokens': 200}, 'model-a'))
+    
+    def test_memory_lru_eviction(self):
+        """Тест вытеснения из LRU в памяти."""
+        cache = ResponseCache(memory_items=2)
+        cache.put('a', '1')
+        cache.put('b', '2')
+        cache.get('a')
+        cache.put('c', '3')
+        self.assertEqual(cache.get('a'), ('1', 'memory'))
+        self.assertEqual(cache.get('b'), (None, None))
+    
+    def test_disk_tier_survives_restart(self):
+        """Тест чтения ответа с диска после перезапуска."""
+        cache = ResponseCache(db_path=self.db_path)
+        cache.put('key', 'ответ')
+        cache.close()
+        restored = ResponseCache(db_path=self.db_path)
+        self.assertEqual(restored.get('key'), ('ответ', 'disk'))
+        self.assertEqual(restored.get('key'), ('ответ', 'memory'))
+        restored.close()
+    
+    def test_ttl_expiration(self):
+        """Тест истечения срока жизни записей."""
+        cache = ResponseCache(db_path=self.db_path, ttl_seconds=10)
+        with mock.patch('desktop.core.response_cache.time.time', return_value=1000.0):
+            cache.put('key', 'ответ')
+        with mock.patch('desktop.core.response_cache.time.time', return_value=1011.0):
+            self.assertEqual(cache.get('key'), (None, None))
+        self.assertEqual(cache.stats()['disk_entries'], 0)
+        cache.close()
+    
+    def test_disk_max_entries(self):
+        """Тест ограничения количества записей на диске."""
+        cache = ResponseCache(db_path=self.db_path, memory_items=0, max_entries=2)
+        for index in range(5):
+            cache.put(f'key-{index}', str(index))
+        self.assertEqual(cache.stats()['disk_entries'], 2)
+        self.assertEqual(cache.get('key-4'), ('4', 'disk'))
+        self.assertEqual(cache.get('key-0'), (None, None))
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
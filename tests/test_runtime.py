@@ -0,0 +1,72 @@
+"""
+Тесты для настройки потоков инференса.
+"""
+import unittest
+
+from desktop.core.runtime import InferenceRuntime, StageTimer, _parse_cpulist, _thread_candidates
+
+
+def make_topology(numa_nodes, primary_cpus=None):
+    available = sorted(cpu for node in numa_nodes for cpu in node)
+    return {
+        'logical_cores': len(available),
+        'physical_cores': len(primary_cpus or available),
+        'available_cpus': available,
+        'primary_cpus': primary_cpus or available,
+        'numa_nodes': numa_nodes,
+        'platform': 'Linux',
+    }
+
+
+class TestRuntime(unittest.TestCase):
+    """Тесты для InferenceRuntime."""
+
+    def test_parse_cpulist(self):
+        """Тест разбора списка ядер из sysfs."""
+        self.assertEqual(_parse_cpulist('0-3,8,10-11\n'), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(_parse_cpulist(''), [])
+
+    def test_reserves_ui_cores_and_skips_smt_siblings(self):
+        """Тест резервирования ядер под UI и пропуска SMT-соседей."""
+        topology = make_topology([list(range(8))], primary_cpus=[0, 2, 4, 6])
+        runtime = InferenceRuntime({'reserve_ui_cores': 1}, topology)
+        self.assertEqual(runtime.ui_cpus, [0])
+        self.assertEqual(runtime.inference_cpus, [2, 4, 6])
+        self.assertEqual(runtime.num_threads, 3)
+
+    def test_largest_numa_node_by_default(self):
+        """Тест выбора NUMA-узла."""
+        topology = make_topology([[0, 1], [2, 3, 4, 5]])
+        runtime = InferenceRuntime({'reserve_ui_cores': 0}, topology)
+        self.assertEqual(runtime.inference_cpus, [2, 3, 4, 5])
+        runtime = InferenceRuntime({'reserve_ui_cores': 0, 'numa_node': 0}, topology)
+        self.assertEqual(runtime.inference_cpus, [0, 1])
+
+    def test_phase_threads_fall_back_to_num_threads(self):
+        """Тест числа потоков для prefill и decode."""
+        topology = make_topology([list(range(4))])
+        runtime = InferenceRuntime({'num_threads': 2, 'decode_threads': 1}, topology)
+        self.assertEqual(runtime.prefill_threads, 2)
+        self.assertEqual(runtime.decode_threads, 1)
+
+    def test_thread_candidates(self):
+        """Тест кандидатов для автонастройки."""
+        self.assertEqual(_thread_candidates(8), [8, 6, 4, 2])
+        self.assertEqual(_thread_candidates(1), [1])
+
+    def test_stage_timer(self):
+        """Тест разбиения generate на prefill и шаги decode."""
+        timer = StageTimer()
+        self.assertEqual(timer.stages(), {})
+        timer.start()
+        timer.started = 10.0
+        timer.stamps = [10.5, 10.7, 10.9]
+        stages = timer.stages()
+        self.assertAlmostEqual(stages['prefill'], 0.5)
+        self.assertAlmostEqual(stages['decode'], 0.4)
+        self.assertAlmostEqual(stages['decode_per_token'], 0.2)
+        self.assertEqual(stages['new_tokens'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Тесты для семантического кэша.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+
+from desktop.core.semantic_cache import SemanticCache, NUMPY_AVAILABLE
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, 'numpy не установлен')
+class TestSemanticCache(unittest.TestCase):
+    """Тесты для класса SemanticCache."""
+    
+    def test_near_duplicate_hit(self):
+        """Тест попадания для близкого эмбеддинга."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0, 0.0], 'ctx', 'вопрос', 'ответ')
+        response, similarity = cache.lookup([0.95, 0.05, 0.0], 'ctx')
+        self.assertEqual(response, 'ответ')
+        self.assertGreater(similarity, 0.9)
+    
+    def test_threshold_and_context(self):
+        """Тест порога похожести и разделения по контексту."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0, 0.0], 'ctx', 'вопрос', 'ответ')
+        self.assertIsNone(cache.lookup([0.0, 1.0, 0.0], 'ctx')[0])
+        self.assertIsNone(cache.lookup([1.0, 0.0, 0.0], 'other')[0])
+    
+    def test_max_entries(self):
+        """Тест ограничения размера индекса."""
+        cache = SemanticCache(threshold=0.99, max_entries=2)
+        cache.add([1.0, 0.0, 0.0], 'ctx', 'a', '1')
+        cache.add([0.0, 1.0, 0.0], 'ctx', 'b', '2')
+        cache.add([0.0, 0.0, 1.0], 'ctx', 'c', '3')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup([1.0, 0.0, 0.0], 'ctx')[0])
+    
+    def test_ring_buffer_survives_save(self):
+        """Тест кольцевой вставки и сохранения записей от старых к новым."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'semantic.npz')
+            cache = SemanticCache(threshold=0.99, max_entries=3, path=path)
+            vectors = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]]
+            for index, vector in enumerate(vectors):
+                cache.add(vector, 'ctx', f'q{index}', str(index))
+            self.assertEqual(cache._vectors.shape, (3, 4))
+            self.assertEqual(cache.lookup(vectors[3], 'ctx')[0], '3')
+            self.assertIsNone(cache.lookup(vectors[0], 'ctx')[0])
+            cache.save()
+            
+            restored = SemanticCache(threshold=0.99, max_entries=2, path=path)
+            self.assertEqual(len(restored), 2)
+            self.assertEqual(restored.lookup(vectors[2], 'ctx')[0], '2')
+            self.assertIsNone(restored.lookup(vectors[1], 'ctx')[0])
+            restored.add(vectors[0], 'ctx', 'q0', '0')
+            self.assertIsNone(restored.lookup(vectors[2], 'ctx')[0])
+            self.assertEqual(restored.lookup(vectors[3], 'ctx')[0], '3')
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Тесты для тензорного параллелизма.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+
+try:
+    import torch
+    import torch.distributed as dist
+    import torch.multiprocessing as mp
+    from models.configuration_deepseek import DeepseekConfig
+    from models.modelling_deepseek import DeepseekForCausalLM
+    from desktop.core.parallel.tensor_parallel import init_process_group, shard_model, check_divisible
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+WORLD_SIZE = 2
+
+
+def build_tiny_model():
+    torch.manual_seed(0)
+    config = DeepseekConfig(
+        vocab_size=128,
+        hidden_size=64,
+        intermediate_size=128,
+        moe_intermediate_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        n_shared_experts=1,
+        n_routed_experts=4,
+        num_experts_per_tok=2,
+        first_k_dense_replace=1,
+        max_position_embeddings=64,
+        pad_token_id=0,
+        attn_implementation='eager'
+    )
+    model = DeepseekForCausalLM(config)
+    model.eval()
+    return model
+
+
+def run_forward(model, input_ids):
+    with torch.no_grad():
+        logits = model(input_ids=input_ids).logits
+        generated = model.generate(input_ids=input_ids, max_new_tokens=4, do_sample=False, pad_token_id=0)
+    return logits, generated
+
+
+def tensor_parallel_worker(rank, init_file, input_ids, result_path):
+    init_process_group(rank, WORLD_SIZE, init_method=f'file://{init_file}')
+    model = shard_model(build_tiny_model(), rank, WORLD_SIZE)
+    logits, generated = run_forward(model, input_ids)
+    if rank == 0:
+        torch.save({'logits': logits, 'generated': generated}, result_path)
+    dist.destroy_process_group()
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, 'требуются torch и transformers')
+class TestTensorParallel(unittest.TestCase):
+    """Сравнение с однопроцессным выходом на маленькой случайной модели."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_matches_single_process(self):
+        """Тест совпадения логитов и жадной генерации."""
+        input_ids = torch.randint(1, 128, (1, 12), generator=torch.Generator().manual_seed(1))
+        expected_logits, expected_generated = run_forward(build_tiny_model(), input_ids)
+
+        result_path = os.path.join(self.temp_dir, 'result.pt')
+        init_file = os.path.join(self.temp_dir, 'init')
+        mp.spawn(tensor_parallel_worker, args=(init_file, input_ids, result_path), nprocs=WORLD_SIZE, join=True)
+        result = torch.load(result_path)
+
+        torch.testing.assert_close(result['logits'], expected_logits, atol=1e-4, rtol=1e-4)
+        self.assertTrue(torch.equal(result['generated'], expected_generated))
+    
+    def test_rejects_indivisible_sizes(self):
+        """Тест проверки делимости размеров."""
+        with self.assertRaises(ValueError):
+            check_divisible(build_tiny_model().config, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
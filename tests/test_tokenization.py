@@ -0,0 +1,85 @@
+"""
+Тесты для пакетной токенизации с кэшем.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+
+try:
+    from datasets import Dataset
+    from desktop.training.tokenization import tokenize_dataset, tokenizer_fingerprint, PROMPT_TEMPLATE
+    DATASETS_AVAILABLE = True
+except ImportError:
+    DATASETS_AVAILABLE = False
+
+
+class CharTokenizer:
+    """Посимвольный токенизатор с интерфейсом вызова как у transformers."""
+
+    def __init__(self, name_or_path=''):
+        self.name_or_path = name_or_path
+        self.calls = 0
+
+    def __len__(self):
+        return 65536
+
+    def __call__(self, texts, truncation=False, max_length=None):
+        self.calls += 1
+        ids = [[ord(char) for char in text][:max_length] for text in texts]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(row) for row in ids]}
+
+
+@unittest.skipUnless(DATASETS_AVAILABLE, 'требуется datasets')
+class TestTokenization(unittest.TestCase):
+    """Тесты для tokenize_dataset."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        records = [
+            {'instruction': f'Вопрос {index}', 'input': '', 'output': 'Ответ' * (index % 5), 'tags': []}
+            for index in range(40)
+        ]
+        self.dataset = Dataset.from_list(records)
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_tokenizes_with_template(self):
+        """Тест шаблона, меток и длины."""
+        tokenized = tokenize_dataset(self.dataset, CharTokenizer(), 64, cache_dir=self.cache_dir, num_proc=1)
+        expected = PROMPT_TEMPLATE.format(instruction='Вопрос 1', input='', output='Ответ')
+        self.assertEqual(tokenized[1]['input_ids'], [ord(char) for char in expected])
+        self.assertEqual(tokenized[1]['labels'], tokenized[1]['input_ids'])
+        self.assertEqual(tokenized[1]['length'], len(expected))
+        self.assertNotIn('instruction', tokenized.column_names)
+        self.assertTrue(all(length <= 64 for length in tokenized['length']))
+    
+    def test_cache_reused(self):
+        """Тест того, что повторный запуск не токенизирует заново."""
+        tokenize_dataset(self.dataset, CharTokenizer(), 64, cache_dir=self.cache_dir, num_proc=1)
+        tokenizer = CharTokenizer()
+        cached = tokenize_dataset(self.dataset, tokenizer, 64, cache_dir=self.cache_dir, num_proc=1)
+        self.assertEqual(tokenizer.calls, 0)
+        self.assertEqual(len(cached), 40)
+
+        changed = tokenize_dataset(self.dataset, tokenizer, 32, cache_dir=self.cache_dir, num_proc=1)
+        self.assertGreater(tokenizer.calls, 0)
+        self.assertTrue(all(length <= 32 for length in changed['length']))
+    
+    def test_fingerprint_depends_on_tokenizer_files(self):
+        """Тест зависимости отпечатка от содержимого файлов токенизатора."""
+        path = os.path.join(self.temp_dir, 'tokenizer.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"version": 1}')
+        before = tokenizer_fingerprint(CharTokenizer(self.temp_dir))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"version": 2}')
+        self.assertNotEqual(tokenizer_fingerprint(CharTokenizer(self.temp_dir)), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
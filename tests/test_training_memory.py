@@ -0,0 +1,103 @@
+"""
+Тесты для профиля памяти дообучения.
+"""
+import unittest
+import json
+import os
+import re
+from types import SimpleNamespace
+
+from desktop.training.memory import (
+    LORA_TARGETS, resolve_memory_settings, count_parameters, estimate_training_memory, format_memory_plan,
+    active_parameters_per_token, training_flops_per_token
+)
+
+MODEL_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'models', 'config.json')
+
+
+class TestTrainingMemory(unittest.TestCase):
+    """Тесты для resolve_memory_settings и estimate_training_memory."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        with open(MODEL_CONFIG, 'r', encoding='utf-8') as f:
+            self.model_config = SimpleNamespace(**json.load(f))
+    
+    def make_config(self, **overrides):
+        values = {
+            'memory_profile': 'default',
+            'gradient_checkpointing': None,
+            'quantization': None,
+            'lora_target': 'attention',
+            'lora_target_modules': None,
+        }
+        values.update(overrides)
+        return SimpleNamespace(**values)
+    
+    def test_profile_and_overrides(self):
+        """Тест профиля memory_efficient и явных переопределений."""
+        settings = resolve_memory_settings(self.make_config(memory_profile='memory_efficient'), cuda_available=True)
+        self.assertTrue(settings['gradient_checkpointing'])
+        self.assertEqual(settings['quantization'], '4bit')
+
+        settings = resolve_memory_settings(
+            self.make_config(memory_profile='memory_efficient', quantization='8bit'), cuda_available=True
+        )
+        self.assertEqual(settings['quantization'], '8bit')
+        settings = resolve_memory_settings(self.make_config(memory_profile='memory_efficient', quantization='none'))
+        self.assertIsNone(settings['quantization'])
+
+        with self.assertRaises(ValueError):
+            resolve_memory_settings(self.make_config(memory_profile='tiny'))
+        with self.assertRaises(ValueError):
+            resolve_memory_settings(self.make_config(quantization='2bit'))
+    
+    def test_quantization_requires_cuda(self):
+        """Тест: без CUDA квантизация профиля снимается, а явная — ошибка."""
+        settings = resolve_memory_settings(self.make_config(memory_profile='memory_efficient'), cuda_available=False)
+        self.assertIsNone(settings['quantization'])
+        self.assertTrue(settings['gradient_checkpointing'])
+        self.assertEqual(len(settings['notes']), 1)
+        with self.assertRaises(ValueError):
+            resolve_memory_settings(self.make_config(quantization='4bit'), cuda_available=False)
+    
+    def test_lora_targets(self):
+        """Тест того, что цели LoRA не задевают маршрутизируемых экспертов."""
+        attention = LORA_TARGETS['attention']
+        shared = LORA_TARGETS['attention_shared_experts']
+        self.assertTrue(re.fullmatch(attention, 'base_model.model.model.layers.3.self_attn.q_proj'))
+        self.assertFalse(re.fullmatch(attention, 'model.layers.3.mlp.shared_experts.up_proj'))
+        self.assertTrue(re.fullmatch(shared, 'model.layers.3.mlp.shared_experts.up_proj'))
+        self.assertFalse(re.fullmatch(shared, 'model.layers.3.mlp.experts.5.up_proj'))
+        self.assertFalse(re.fullmatch(shared, 'model.layers.0.mlp.up_proj'))
+    
+    def test_estimate(self):
+        """Тест оценки: около 20B параметров, квантизация и чекпоинтинг уменьшают пик."""
+        counts = count_parameters(self.model_config)
+        self.assertAlmostEqual(sum(counts.values()) / 1e9, 20.6, delta=0.5)
+
+        default = estimate_training_memory(
+            self.model_config, resolve_memory_settings(self.make_config()), 8, 2, 1024
+        )
+        efficient_settings = resolve_memory_settings(
+            self.make_config(memory_profile='memory_efficient'), cuda_available=True
+        )
+        efficient = estimate_training_memory(self.model_config, efficient_settings, 8, 2, 1024)
+        self.assertLess(efficient['weights_gb'], default['weights_gb'] / 3)
+        self.assertLess(efficient['activations_gb'], default['activations_gb'])
+        self.assertLess(efficient['peak_gb'], 64)
+        self.assertIn('помещается', format_memory_plan(efficient, efficient_settings, 64))
+    
+    def test_flops_per_token(self):
+        """Тест активных параметров MoE и FLOPs на токен для MFU."""
+        active = active_parameters_per_token(self.model_config)
+        total = sum(count_parameters(self.model_config).values())
+        # Активны top-k из всех маршрутизируемых экспертов: около 3B из ~20B
+        self.assertLess(active, total / 4)
+        self.assertGreater(active, 1e9)
+        self.assertEqual(training_flops_per_token(self.model_config), 4 * active)
+        self.assertEqual(training_flops_per_token(self.model_config, gradient_checkpointing=True), 6 * active)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Тесты для статуса обучения.
+"""
+import unittest
+import tempfile
+import shutil
+import json
+import os
+from unittest.mock import patch
+
+from desktop.training.status import TrainingStatusWriter
+
+
+class TestTrainingStatusWriter(unittest.TestCase):
+    """Тесты для TrainingStatusWriter."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.status_file = os.path.join(self.temp_dir, 'reports', 'training_status.json')
+        self.writer = TrainingStatusWriter(self.status_file)
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def read(self):
+        with open(self.status_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def test_progress_keeps_status(self):
+        """Тест того, что прогресс дополняет текущий статус."""
+        self.writer.update('running', message='Обучение запущено')
+        self.writer.progress(step=10, max_steps=100, loss=1.5)
+        self.writer.progress(step=20, max_steps=100, loss=1.2)
+        payload = self.read()
+        self.assertEqual(payload['status'], 'running')
+        self.assertEqual(payload['message'], 'Обучение запущено')
+        self.assertEqual(payload['progress']['step'], 20)
+
+        with open(self.writer.progress_file, 'r', encoding='utf-8') as f:
+            steps = [json.loads(line)['step'] for line in f]
+        self.assertEqual(steps, [10, 20])
+
+        self.writer.update('completed', metrics={'perplexity': 3.0})
+        self.assertNotIn('progress', self.read())
+    
+    def test_failed_write_keeps_previous_file(self):
+        """Тест атомарности: сбой записи не портит прежний статус."""
+        self.writer.update('running', message='шаг 1')
+        with patch('desktop.training.status.json.dump', side_effect=RuntimeError('диск заполнен')):
+            with self.assertRaises(RuntimeError):
+                self.writer.update('running', message='шаг 2')
+        self.assertEqual(self.read()['message'], 'шаг 1')
+        self.assertEqual(os.listdir(os.path.dirname(self.status_file)), ['training_status.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Тесты для репозитория пользователей.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+
+from desktop.database.db import Database
+from desktop.database.repositories.user_repository import UserRepository
+
+
+class TestUserRepository(unittest.TestCase):
+    """Тесты для UserRepository."""
+    
+    def setUp(self):
+        """Настройка тестового окружения."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.temp_dir, 'app.db'))
+        self.repository = UserRepository(self.db)
+    
+    def tearDown(self):
+        """Очистка после тестов."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def test_resolve_adapter(self):
+        """Тест выбора адаптера: личный важнее адаптера роли."""
+        analyst = self.repository.add_user('Аналитик', 'a@example.com', 'Org', 'analyst')
+        user = self.repository.add_user('Пользователь', 'u@example.com', 'Org', 'user')
+        role_defaults = {'analyst': 'reports'}
+        self.assertEqual(self.repository.resolve_adapter(analyst, role_defaults), 'reports')
+        self.assertIsNone(self.repository.resolve_adapter(user, role_defaults))
+        self.repository.set_adapter(user, 'support')
+        self.assertEqual(self.repository.resolve_adapter(user, role_defaults), 'support')
+        self.assertEqual(self.repository.get_user(user)['adapter'], 'support')
+        self.assertIsNone(self.repository.resolve_adapter(None, role_defaults))
+    
+    def test_existing_table_gets_adapter_column(self):
+        """Тест миграции таблицы без колонки adapter."""
+        self.db.execute("DROP TABLE users", commit=True)
+        self.db.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, full_name TEXT NOT NULL, "
+            "email TEXT NOT NULL UNIQUE, organization TEXT NOT NULL, role TEXT NOT NULL DEFAULT 'user', "
+            "created_at TEXT NOT NULL)",
+            commit=True
+        )
+        repository = UserRepository(self.db)
+        user_id = repository.add_user('Пользователь', 'u@example.com', 'Org', 'user')
+        self.assertIsNone(repository.get_user(user_id)['adapter'])
+
+
+if __name__ == '__main__':
+    unittest.main()